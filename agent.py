@@ -2,14 +2,31 @@
 
 """Agent that interacts with the host program"""
 
+import os
 import csv
 import sys
+import json
+import time
+import socket
+import heapq
 import random
+import cProfile
 from argparse import ArgumentParser
 
-from environments import CartPoleEnv
+from environments import (EasyEnv, BatchEasyEnv, CartPoleEnv, BatchedCartPoleEnv,
+                          CartPoleSimEnv, BatchCartPoleSimEnv, TRANSPORTS, sample_start_state)
 from linear_model import LinearModel
-from optimizers import CrossEntropyMethod
+from mlp_model import MLPModel
+from optimizers import CrossEntropyMethod, ArrayCrossEntropyMethod, CMAES, EvolutionStrategy
+from parallel import EvaluationPool
+from distributed import Coordinator, RemoteEvaluationPool, parse_address
+from host_pool import HostPool, HOST
+from cache import EvaluationCache, MAX_ENTRIES, param_seed
+from metrics import MetricsWriter, make_record
+from results import ResultsStore, trial_of
+from profiling import Profiler
+from checkpoint import (CHECKPOINT_EVERY, save_checkpoint, load_checkpoint,
+                        get_random_state, set_random_state)
 
 EPISODES = 100
 SAMPLING_RATE = 100
@@ -17,6 +34,34 @@ TOP_SAMPLES = 0.1
 PRINT_STEP = 100
 RANDOM_SEED = 42
 STEP_SIZE = 500
+WORKERS = 0
+HIDDEN = '8'
+MODELS = ('linear', 'mlp')
+ENGINES = {
+    'list': CrossEntropyMethod,
+    'array': ArrayCrossEntropyMethod,
+}
+OPTIMIZERS = ('cem', 'cmaes', 'es')
+SIGMA = {'cmaes': 1.0, 'es': 0.3}
+LEARNING_RATE = 1.0
+# Options stored as the hyperparameters of a run in the results store
+HYPERPARAMETERS = ('n', 'p', 'step_size', 'episodes', 'env', 'optimizer', 'sigma', 'learning_rate',
+                   'model', 'hidden', 'engine', 'adaptive', 'full_covariance', 'smoothing',
+                   'extra_noise', 'noise_decay', 'min_variance', 'crn', 'seed_episodes')
+ENVIRONMENTS = {
+    'host': CartPoleEnv,
+    'sim': CartPoleSimEnv,
+    'batch': CartPoleSimEnv,
+    'host-batch': CartPoleEnv,
+    'host-pool': HostPool,
+    'easy': EasyEnv,
+    'easy-batch': EasyEnv,
+}
+BATCH_ENVIRONMENTS = {
+    'batch': BatchCartPoleSimEnv,
+    'host-batch': BatchedCartPoleEnv,
+    'easy-batch': BatchEasyEnv,
+}
 
 def build_parser():
     parser = ArgumentParser()
@@ -41,23 +86,405 @@ def build_parser():
     parser.add_argument('-r', '--random-seed',
                         dest='random_seed', help='sets the random seed',
                         type=int, default=RANDOM_SEED)
+    parser.add_argument('--env',
+                        dest='env', help='environment to run the agent in',
+                        choices=sorted(ENVIRONMENTS), default='host')
+    parser.add_argument('--transport',
+                        dest='transport', help='transport of the host program',
+                        choices=TRANSPORTS, default='text')
+    parser.add_argument('--hosts',
+                        dest='hosts', help='no. of host programs run concurrently with --env host-pool',
+                        type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--host-program',
+                        dest='host_program', help='host program started by --env host-pool',
+                        default=HOST)
+    parser.add_argument('-w', '--workers',
+                        dest='workers', help='no. of worker processes to evaluate the samples (0 to evaluate them in-process)',
+                        type=int, default=WORKERS)
+    parser.add_argument('--model',
+                        dest='model', help='policy of the agent',
+                        choices=MODELS, default='linear')
+    parser.add_argument('--hidden',
+                        dest='hidden', help='comma-separated no. of units of the hidden layers of --model mlp',
+                        default=HIDDEN)
+    parser.add_argument('--optimizer',
+                        dest='optimizer', help='optimizer of the policy parameters',
+                        choices=OPTIMIZERS, default='cem')
+    parser.add_argument('--sigma',
+                        dest='sigma', help='initial step size of cmaes (default {cmaes}) or perturbation size of es (default {es})'.format(**SIGMA),
+                        type=float, required=False)
+    parser.add_argument('--learning-rate',
+                        dest='learning_rate', help='learning rate of es',
+                        type=float, default=LEARNING_RATE)
+    parser.add_argument('--listen',
+                        dest='listen', help='evaluate the samples on the distributed.py workers connecting to this HOST:PORT, requires --env sim',
+                        required=False)
+    parser.add_argument('--engine',
+                        dest='engine', help='storage of the CEM samples',
+                        choices=sorted(ENGINES), default='list')
+    parser.add_argument('--adaptive',
+                        dest='adaptive', help='fit the CEM sampling variance to the elites',
+                        action='store_true', default=False)
+    parser.add_argument('--full-covariance',
+                        dest='full_covariance', help='fit a full covariance matrix (implies --adaptive)',
+                        action='store_true', default=False)
+    parser.add_argument('--smoothing',
+                        dest='smoothing', help='weight of the elites in the new CEM distribution',
+                        type=float, default=1.0)
+    parser.add_argument('--extra-noise',
+                        dest='extra_noise', help='extra sampling variance at the first episode',
+                        type=float, default=0.0)
+    parser.add_argument('--noise-decay',
+                        dest='noise_decay', help='decrease of the extra sampling variance per episode',
+                        type=float, default=0.0)
+    parser.add_argument('--min-variance',
+                        dest='min_variance', help='floor of the CEM sampling variance',
+                        type=float, default=0.0)
+    parser.add_argument('--cache',
+                        dest='cache', help='no. of episode rewards to cache (0 to disable), requires --env sim',
+                        type=int, default=0)
+    parser.add_argument('--cache-file',
+                        dest='cache_file', help='SQLite file to persist the cached rewards in (implies --cache {})'.format(MAX_ENTRIES),
+                        required=False)
+    parser.add_argument('--seed-episodes',
+                        dest='seed_episodes', help='seed every episode by its parameters, as --workers and --cache do, requires --env sim',
+                        action='store_true', default=False)
+    parser.add_argument('--crn',
+                        dest='crn', help='evaluate all samples on the same K start states per episode (0 to disable), requires --env sim or batch',
+                        type=int, default=0)
+    parser.add_argument('-m', '--metrics-file',
+                        dest='metrics_file', help='file to stream per-episode metrics to (.csv or .jsonl)',
+                        required=False)
+    parser.add_argument('--results',
+                        dest='results', help='SQLite results store to write the per-episode metrics to (see results.py)',
+                        required=False)
+    parser.add_argument('--checkpoint',
+                        dest='checkpoint', help='file to periodically save the state of the run to',
+                        required=False)
+    parser.add_argument('--checkpoint-every',
+                        dest='checkpoint_every', help='no. of episodes between two checkpoints',
+                        type=int, default=CHECKPOINT_EVERY)
+    parser.add_argument('--resume',
+                        dest='resume', help='continue from --checkpoint if it exists',
+                        action='store_true', default=False)
+    parser.add_argument('--profile',
+                        dest='profile', help='print the time spent in each stage of the agent loop',
+                        action='store_true', default=False)
+    parser.add_argument('--profile-output',
+                        dest='profile_output', help='file to write the cProfile statistics of the run to',
+                        required=False)
+    parser.add_argument('--trace',
+                        dest='trace', help='file to write the stage timings to, in the Chrome trace format',
+                        required=False)
+    parser.add_argument('--early-abort',
+                        dest='early_abort', help='abort the rollouts that cannot reach the elites (serial evaluation only)',
+                        action='store_true', default=False)
+    parser.add_argument('--serve',
+                        dest='serve', help='serve runs on this Unix socket instead of running once',
+                        required=False)
     return parser
 
-def noisy_evaluation(model, env, steps, noisy_params):
+def make_optimizer(options):
+    """Creates the optimizer from the options"""
+    sigma = options.sigma or SIGMA.get(options.optimizer)
+    if options.optimizer == 'cmaes':
+        return CMAES(N=options.n, sigma=sigma)
+    if options.optimizer == 'es':
+        return EvolutionStrategy(N=options.n, sigma=sigma, learning_rate=options.learning_rate)
+    return ENGINES[options.engine](N=options.n, p=options.p,
+                                   adaptive=options.adaptive or options.full_covariance,
+                                   smoothing=options.smoothing,
+                                   extra_noise=options.extra_noise,
+                                   noise_decay=options.noise_decay,
+                                   min_variance=options.min_variance,
+                                   full_covariance=options.full_covariance)
+
+def parse_hidden(hidden):
+    """Returns the no. of units of each hidden layer of a comma-separated
+    string, empty for no hidden layer"""
+    return tuple(int(v) for v in hidden.split(',') if v.strip())
+
+def make_model(model, dims, hidden=HIDDEN):
+    """Creates the policy of the agent
+
+    Parameters
+    ----------
+    model : str
+        :code:`'linear'` or :code:`'mlp'`
+    dims : int
+        number of dimensions of the observations
+    hidden : str (default is '8')
+        comma-separated no. of units of the hidden layers of the MLP
+
+    Returns
+    -------
+    LinearModel or MLPModel
+        the policy, with random parameters
+    """
+    if model == 'mlp':
+        return MLPModel(dims, hidden=parse_hidden(hidden))
+    return LinearModel(dims=dims)
+
+def cache_namespace(options):
+    """Returns the environment and model architecture of the cached
+    rewards of a run, like :code:`'sim/linear'` or :code:`'sim/mlp-8,8'`"""
+    model = options.model
+    if model == 'mlp':
+        model = 'mlp-' + ','.join(str(h) for h in parse_hidden(options.hidden))
+    return '{}/{}'.format(options.env, model)
+
+def make_envs(options, n=None):
+    """Creates the environment and, for the batch environments, the batch
+    environment used to evaluate the n samples (:code:`options.n` if
+    None)"""
+    if n is None:
+        n = options.n
+    kwargs = {}
+    if options.env.startswith('host'):
+        kwargs['transport'] = options.transport
+    if options.env == 'host-pool':
+        kwargs.update(m=options.hosts, host=options.host_program,
+                      policy=lambda dims: make_model(options.model, dims, options.hidden))
+
+    env = ENVIRONMENTS[options.env](**kwargs)
+    batch_env = None
+    if options.env in BATCH_ENVIRONMENTS:
+        batch_env = BATCH_ENVIRONMENTS[options.env](n, **kwargs)
+
+    return env, batch_env
+
+def reuse_envs(options, envs, n=None):
+    """Returns the environments of options for n samples, creating them
+    only if envs has none for the same environment, transport, sample
+    size, hosts and policy (the host pool evaluates with its own models)
+
+    Host programs negotiate their transport once, so all the runs of a
+    host program must use the same transport.
+    """
+    if n is None:
+        n = options.n
+    key = (options.env, options.transport, n, options.hosts, options.host_program,
+           options.model, options.hidden)
+    if key not in envs:
+        for other in envs:
+            if options.env in ('host', 'host-batch') and other[0] in ('host', 'host-batch') \
+                    and other[1] != options.transport:
+                raise ValueError('the host program already uses the {} transport'.format(other[1]))
+        envs[key] = make_envs(options, n)
+    return envs[key]
+
+def make_profiler(options, env, batch_env, model, optimizer, pool):
+    """Creates a profiler timing the environments, model, optimizer and
+    workers of the run, or returns None without --profile or --trace"""
+    if not options.profile and not options.trace:
+        return None
+
+    profiler = Profiler(trace=options.trace is not None)
+    for obj, name, stage in ((env, 'reset', 'env.reset'),
+                             (env, 'step', 'env.step'),
+                             (env, 'reset_into', 'env.reset'),
+                             (env, 'step_into', 'env.step'),
+                             (batch_env, 'reset', 'batch_env.reset'),
+                             (batch_env, 'step', 'batch_env.step'),
+                             (model, 'action', 'model.action'),
+                             (model, 'paired_action', 'model.paired_action'),
+                             (optimizer, 'sample_parameters', 'cem.sample'),
+                             (optimizer, 'get_elite_parameters', 'cem.elite'),
+                             (optimizer, 'get_parameter_mean', 'cem.update'),
+                             (optimizer, 'ask', 'optimizer.ask'),
+                             (optimizer, 'tell', 'optimizer.tell'),
+                             (pool, 'evaluate', 'pool.evaluate'),
+                             (env, 'evaluate', 'env.evaluate')):
+        profiler.instrument(obj, name, stage)
+    return profiler
+
+def trial_name(options):
+    """Returns the name and configuration of a run in the results store
+
+    A run with an output file is named after it, like the trials of
+    :code:`multiagent.py`. Otherwise, it is named after the
+    hyperparameters that differ from their defaults and its seed.
+    """
+    if options.output_file:
+        name, config, seed = trial_of(options.output_file)
+        return name, config
+    defaults = build_parser().parse_args([])
+    config = '_'.join('{}-{}'.format(k, getattr(options, k)) for k in HYPERPARAMETERS
+                      if getattr(options, k) != getattr(defaults, k))
+    return '{}-{}'.format(config, options.random_seed) if config else str(options.random_seed), config
+
+def noisy_evaluation(model, env, steps, noisy_params, cache=None, seed=None):
     """Runs an episode based on the noisy parameters sampled by CEM
     and returns the reward"""
     model = update_model(model, noisy_params)
-    reward = run_episode(model, env, steps=steps)
+    reward = run_episode(model, env, steps=steps, cache=cache, seed=seed)
     return reward
 
+def evaluate_samples(model, env, steps, noisy_params, seeds, pool=None, cache=None):
+    """Evaluates the noisy parameters with their seeds, only simulating
+    the ones that are not cached, and returns the reward of each"""
+    if cache is None:
+        if pool is not None:
+            return pool.evaluate(noisy_params, seeds)
+        return [noisy_evaluation(model, env, steps, w, seed=seed)
+                for w, seed in zip(noisy_params, seeds)]
+
+    # Repeated parameters are looked up and simulated once
+    keys = [cache.key(w, seed, steps) for w, seed in zip(noisy_params, seeds)]
+    first = {}
+    for i, k in enumerate(keys):
+        first.setdefault(k, i)
+    found = {k: cache.get(k) for k in first}
+    misses = [first[k] for k, r in found.items() if r is None]
+
+    if pool is not None:
+        computed = pool.evaluate([noisy_params[i] for i in misses],
+                                 [seeds[i] for i in misses])
+    else:
+        computed = [noisy_evaluation(model, env, steps, noisy_params[i], seed=seeds[i])
+                    for i in misses]
+
+    for i, reward in zip(misses, computed):
+        found[keys[i]] = reward
+        cache.put(keys[i], reward)
+
+    return [found[k] for k in keys]
+
+def abortable_evaluation(model, env, steps, noisy_params, k, seeds=None):
+    """Runs the noisy parameters in order, aborting the rollouts that
+    cannot reach the elite set, and returns the reward of each
+
+    With :code:`r` the largest reward of a step, a rollout is aborted
+    as soon as its reward plus :code:`r` times its remaining steps is at
+    most the k-th best reward of the earlier rollouts: its final reward
+    cannot beat them, and it loses ties since the elites are sorted
+    stably. The elites are then the same as with full rollouts, and the
+    aborted rollouts keep their partial reward, which is below them.
+
+    Parameters
+    ----------
+    k : int
+        no. of elite parameters
+    seeds : list (default is None)
+        the seed of the environment for each rollout
+
+    Returns
+    -------
+    list
+        the (partial) reward of each parameter vector
+    int
+        no. of steps of the budget left unplayed by aborted rollouts
+    """
+    bound = env.reward_range[1]
+    assert bound >= 0, 'Rollouts can only be aborted with non-negative reward bounds'
+    elite = []
+    rewards = []
+    steps_saved = 0
+
+    for i, w in enumerate(noisy_params):
+        cutoff = elite[0] if 0 < k == len(elite) else None
+        model = update_model(model, w)
+        episode_reward = 0
+        left = steps
+
+        if cutoff is None or steps * bound > cutoff:
+            if seeds is not None:
+                env.seed(seeds[i])
+            obs = env.reset()
+            for s in range(steps):
+                obs, reward, done = env.step(model.action(obs))
+                episode_reward += reward
+                left -= 1
+
+                if done:
+                    left = 0
+                    break
+                if cutoff is not None and episode_reward + left * bound <= cutoff:
+                    break
+
+        steps_saved += left
+        rewards.append(episode_reward)
+        if k > 0:
+            if len(elite) < k:
+                heapq.heappush(elite, episode_reward)
+            else:
+                heapq.heappushpop(elite, episode_reward)
+
+    return rewards, steps_saved
+
+def crn_evaluation(model, env, steps, noisy_params, states):
+    """Runs every noisy parameter vector from the same start states (common
+    random numbers) and returns the mean reward of each"""
+    return [sum(run_episode(update_model(model, w), env, steps, state=state)
+                for state in states) / len(states)
+            for w in noisy_params]
+
+def batch_evaluation(model, batch_env, steps, noisy_params, states=None):
+    """Runs one episode per noisy parameter vector in a batch environment
+    and returns the reward of each"""
+    obs = batch_env.reset() if states is None else batch_env.reset(states=states)
+
+    for s in range(steps):
+        actions = model.paired_action(obs, noisy_params)
+        obs, _, _ = batch_env.step(actions)
+
+        if batch_env.all_done():
+            break
+
+    return list(batch_env.total_rewards)
+
+def batch_crn_evaluation(model, batch_env, steps, noisy_params, states):
+    """Runs every noisy parameter vector from the same start states in a
+    batch environment and returns the mean reward of each"""
+    totals = [0] * len(noisy_params)
+    for state in states:
+        rewards = batch_evaluation(model, batch_env, steps, noisy_params,
+                                   states=[state] * len(noisy_params))
+        totals = [t + r for t, r in zip(totals, rewards)]
+    return [t / len(states) for t in totals]
+
+class SeededEvaluator(object):
+    """Evaluates noisy parameters in its own simulator, seeding it before
+    each episode so the reward only depends on the parameters and seed"""
+
+    def __init__(self, env_name, steps, model='linear', hidden=HIDDEN):
+        self.env = ENVIRONMENTS[env_name]()
+        self.model = make_model(model, self.env.obs_dim(), hidden)
+        self.steps = steps
+
+    def __call__(self, noisy_params, seed, states=None):
+        if states is not None:
+            return crn_evaluation(self.model, self.env, self.steps, [noisy_params], states)[0]
+        self.env.seed(seed)
+        return noisy_evaluation(self.model, self.env, self.steps, noisy_params)
+
 def update_model(model, parameters):
     """Updates the model using the parameters"""
     model.params = parameters
     return model
 
-def run_episode(model, env, steps, print_step=False):
-    """Runs an episode for a number of steps and returns the total reward"""
-    obs = env.reset()
+def run_episode(model, env, steps, print_step=False, cache=None, seed=None, state=None):
+    """Runs an episode for a number of steps and returns the total reward
+
+    If a seed is given, the environment is seeded before the episode,
+    and the reward is looked up in and stored to the cache, if any. If a
+    state is given, the episode starts from it. Unless steps are printed,
+    environments with :code:`step_into` are run by :code:`run_episode_into`.
+    """
+    if seed is not None:
+        if cache is not None:
+            key = cache.key(model.params, seed, steps)
+            reward = cache.get(key)
+            if reward is None:
+                reward = run_episode(model, env, steps, print_step, seed=seed)
+                cache.put(key, reward)
+            return reward
+        env.seed(seed)
+
+    if not print_step and hasattr(env, 'step_into'):
+        return run_episode_into(model, env, steps, state)
+
+    obs = env.reset() if state is None else env.reset(state=state)
     episode_reward = 0
 
     for s in range(steps):
@@ -75,48 +502,270 @@ def run_episode(model, env, steps, print_step=False):
 
     return episode_reward
 
-def main():
-    # Build parser
-    parser = build_parser()
-    options = parser.parse_args()
+def run_episode_into(model, env, steps, state=None):
+    """Runs an episode with :code:`reset_into` and :code:`step_into`,
+    the observation being overwritten in one buffer instead of a new one
+    per step, and returns the total reward
+
+    The buffer is the one the environment is fastest with: an array for
+    the host program, whose binary frames are copied into it, and a
+    list for the simulators, whose floats are then read by the model
+    without being boxed again.
+    """
+    obs = env.observation_buffer()
+    if state is None:
+        env.reset_into(obs)
+    else:
+        env.reset_into(obs, state=state)
+
+    action, step_into = model.action, env.step_into
+    episode_reward = 0
+
+    for s in range(steps):
+        episode_reward += step_into(action(obs), obs)
+
+        if env.done:
+            break
+
+    return episode_reward
+
+def parse_options(parser, args=None):
+    """Parses and checks the options of a run
+
+    Parameters
+    ----------
+    parser : ArgumentParser
+        the parser returned by :code:`build_parser`
+    args : list (default is None)
+        the arguments to parse. If None, the command-line arguments.
+
+    Returns
+    -------
+    Namespace
+        the options of the run
+    """
+    options = parser.parse_args(args)
+    if options.cache_file and not options.cache:
+        options.cache = MAX_ENTRIES
+    if options.workers > 0 and options.env != 'sim':
+        parser.error('--workers requires --env sim')
+    if options.listen and (options.env != 'sim' or options.workers > 0):
+        parser.error('--listen requires --env sim, without --workers')
+    if options.listen:
+        try:
+            parse_address(options.listen)
+        except ValueError:
+            parser.error('--listen must be HOST:PORT')
+    if options.cache > 0 and options.env != 'sim':
+        parser.error('--cache requires --env sim')
+    if options.seed_episodes and options.env != 'sim':
+        parser.error('--seed-episodes requires --env sim')
+    if options.crn > 0 and options.env not in ('sim', 'batch'):
+        parser.error('--crn requires --env sim or batch')
+    if options.crn > 0 and options.cache > 0:
+        parser.error('--crn cannot be used with --cache')
+    try:
+        parse_hidden(options.hidden)
+    except ValueError:
+        parser.error('--hidden must be comma-separated integers')
+    if options.resume and not options.checkpoint:
+        parser.error('--resume requires --checkpoint')
+    if options.early_abort and (options.env not in ('host', 'sim') or options.workers > 0
+                                or options.cache > 0 or options.crn > 0):
+        parser.error('--early-abort requires --env host or sim, without --workers, --cache or --crn')
+    if options.early_abort and options.optimizer == 'es':
+        parser.error('--early-abort requires --optimizer cem or cmaes, es ranks every sample')
+    if options.optimizer != 'cem' and (options.engine != 'list' or options.adaptive or options.full_covariance):
+        parser.error('--engine, --adaptive and --full-covariance require --optimizer cem')
+    if options.optimizer == 'es' and options.n < 2:
+        parser.error('--optimizer es requires at least 2 samples')
+    return options
+
+def run(options, envs=None, progress=None):
+    """Runs the agent with the given options
+
+    Parameters
+    ----------
+    options : Namespace
+        the options returned by :code:`parse_options`
+    envs : dict (default is None)
+        environments kept between runs, by options. If None, the
+        environments are created for this run and terminated after it.
+    progress : callable (default is None)
+        called with the episode number and win ratio of each episode
 
+    Returns
+    -------
+    list
+        the win ratio of each episode
+    int
+        no. of episodes that reached the step size
+    """
     # Set random seed
     random.seed(options.random_seed)
 
-    # Get CEM methods
-    cem = CrossEntropyMethod(N=options.n, p=options.p)
-    # Create environment object
-    env = CartPoleEnv()
-    # Create linear model
-    model = LinearModel(dims=env.obs_dim())
+    # Get optimizer
+    optimizer = make_optimizer(options)
+    # Create environment objects, the batch ones being sized with the
+    # samples of the optimizer (es rounds N down to an even number)
+    if envs is None:
+        env, batch_env = make_envs(options, optimizer.N)
+    else:
+        env, batch_env = reuse_envs(options, envs, optimizer.N)
+    # Create worker processes, each with its own simulator, or wait for
+    # remote workers
+    pool = None
+    evaluator = (options.env, options.step_size, options.model, options.hidden)
+    if options.workers > 0:
+        pool = EvaluationPool(options.workers, SeededEvaluator, evaluator)
+    elif options.listen:
+        pool = RemoteEvaluationPool(Coordinator(parse_address(options.listen)), evaluator)
+        sys.stderr.write('Listening for workers on {}:{}\n'.format(*pool.coordinator.address))
+    # Create evaluation cache; episodes are then seeded by their
+    # parameters so that their reward only depends on the parameters
+    # and step size
+    cache = None
+    if options.cache > 0:
+        cache = EvaluationCache(max_entries=options.cache, path=options.cache_file,
+                                namespace=cache_namespace(options))
+    # Episodes evaluated by workers or cached are seeded by their
+    # parameters; --seed-episodes seeds the in-process ones the same way,
+    # so that a serial run gives the results of a run with workers
+    seeded = pool is not None or cache is not None or options.seed_episodes
+    # Create policy
+    model = make_model(options.model, env.obs_dim(), options.hidden)
 
     # Initialize parameters
     params = model.params
 
     # Episode scores
     win_ratio_list = []
-
     successful_episodes = 0
-    for i_episode in range(options.episodes):
+    first_episode = 0
+
+    # Restore the state of the run, dropping the metrics written after
+    # the checkpoint since these episodes are run again
+    state = load_checkpoint(options.checkpoint) if options.resume else None
+    append_metrics = False
+    if state is not None:
+        first_episode = state['episode']
+        params = state['params']
+        update_model(model, params)
+        optimizer.set_state(state['optimizer'])
+        set_random_state(state['random'])
+        win_ratio_list = state['win_ratios']
+        successful_episodes = state['successful_episodes']
+        if options.metrics_file and state['metrics_offset'] is not None:
+            os.truncate(options.metrics_file, state['metrics_offset'])
+            append_metrics = True
+        sys.stderr.write('Resuming from episode {} of {}\n'.format(first_episode + 1, options.episodes))
+
+    metrics = None
+    if options.metrics_file:
+        metrics = MetricsWriter(options.metrics_file, append=append_metrics)
+    store = None
+    if options.results:
+        store = ResultsStore(options.results)
+        name, config = trial_name(options)
+        trial = store.add_trial(name, config, options.random_seed,
+                                {k: getattr(options, k) for k in HYPERPARAMETERS})
+        store.truncate(trial, first_episode)
+        # A trial resumed from the checkpoint of another one, like the
+        # rungs of successive halving, starts with its records
+        if state is not None and state.get('trial') not in (None, name):
+            store.copy_records(state['trial'], trial, first_episode)
+
+    # Instrument the run
+    profiler = make_profiler(options, env, batch_env, model, optimizer, pool)
+    profile = None
+    if options.profile_output:
+        profile = cProfile.Profile()
+        profile.enable()
+
+    for i_episode in range(first_episode, options.episodes):
         sys.stderr.write('\n###### Episode {} of {} ###### \n'.format(i_episode+1, options.episodes))
+        start = time.perf_counter()
 
         # Sample N parameter vectors
-        noisy_params = cem.sample_parameters(params)
+        noisy_params = optimizer.ask(params)
+        sampled = time.perf_counter()
         # Evaluate the sampled vectors
-        rewards = [noisy_evaluation(model, env, options.step_size, i) for i in noisy_params]
-        # Get elite parameters based on reward
-        elite_params = cem.get_elite_parameters(noisy_params,rewards)
-        # Update parameters
-        params = cem.get_parameter_mean(elite_params)
-        episode_reward = run_episode(model=update_model(model,params), env=env, steps=options.step_size, print_step=options.print_step)
+        steps_saved = 0
+        if options.early_abort:
+            seeds = [param_seed(w) for w in noisy_params] if seeded else None
+            rewards, steps_saved = abortable_evaluation(model, env, options.step_size, noisy_params,
+                                                        optimizer.elite_count(), seeds)
+            sys.stderr.write('Steps saved: {} of {}\n'.format(steps_saved, len(noisy_params) * options.step_size))
+        elif options.crn > 0:
+            states = [sample_start_state() for i in range(options.crn)]
+            if pool is not None:
+                rewards = pool.evaluate(noisy_params, [None] * len(noisy_params), states)
+            elif batch_env is not None:
+                rewards = batch_crn_evaluation(model, batch_env, options.step_size, noisy_params, states)
+            else:
+                rewards = crn_evaluation(model, env, options.step_size, noisy_params, states)
+        elif seeded:
+            seeds = [param_seed(w) for w in noisy_params]
+            rewards = evaluate_samples(model, env, options.step_size, noisy_params,
+                                       seeds, pool=pool, cache=cache)
+        elif options.env == 'host-pool':
+            rewards = env.evaluate(noisy_params, options.step_size)
+        elif batch_env is not None:
+            rewards = batch_evaluation(model, batch_env, options.step_size, noisy_params)
+        else:
+            rewards = [noisy_evaluation(model, env, options.step_size, i) for i in noisy_params]
+        if profiler is not None:
+            profiler.add('evaluate', time.perf_counter() - sampled, sampled)
+        # Update parameters based on reward
+        params = optimizer.tell(noisy_params, rewards)
+        seed = param_seed(params) if seeded else None
+        episode_reward = run_episode(model=update_model(model,params), env=env, steps=options.step_size, print_step=options.print_step, cache=cache, seed=seed)
         win_ratio = episode_reward / options.step_size
         sys.stderr.write('Episode reward: {} ({:.2f}%)\n'.format(episode_reward, win_ratio))
         # Save win_ratio
         win_ratio_list.append(win_ratio)
+        if progress is not None:
+            progress(i_episode + 1, win_ratio)
+        if metrics is not None or store is not None:
+            elite_rewards = heapq.nlargest(optimizer.elite_count(), rewards)
+            evaluations = len(rewards) * max(options.crn, 1) + 1
+            record = make_record(i_episode + 1, rewards, elite_rewards, win_ratio,
+                                 time.perf_counter() - start, evaluations, params,
+                                 steps_saved)
+            if metrics is not None:
+                metrics.write(record)
+            if store is not None:
+                store.add_records(trial, [record])
 
         if episode_reward >= options.step_size:
             successful_episodes += 1
 
+        # Save the state of the run
+        done = i_episode + 1
+        if options.checkpoint and (done % options.checkpoint_every == 0 or done == options.episodes):
+            save_checkpoint(options.checkpoint, {
+                'episode': done,
+                'params': list(params),
+                'optimizer': optimizer.get_state(),
+                'random': get_random_state(),
+                'win_ratios': win_ratio_list,
+                'successful_episodes': successful_episodes,
+                'metrics_offset': metrics.offset() if metrics is not None else None,
+                'trial': name if store is not None else None,
+            })
+        if profiler is not None:
+            profiler.add('iteration', time.perf_counter() - start, start)
+
+    if profile is not None:
+        profile.disable()
+        profile.dump_stats(options.profile_output)
+    if profiler is not None:
+        profiler.restore()
+        if options.profile:
+            profiler.report()
+        if options.trace:
+            profiler.write_trace(options.trace)
+
     sys.stderr.write('\nFinal params: {}'.format(model.params))
     sys.stderr.write('\nRun finished. {} out of {} episodes ({:.2f}%) have a reward of atleast {}\n'.format(successful_episodes, options.episodes, successful_episodes / options.episodes, options.step_size))
 
@@ -128,8 +777,95 @@ def main():
             wr.writerow(win_ratio_list)
         sys.stderr.write('Done!\n')
 
+    if metrics is not None:
+        metrics.close()
+    if store is not None:
+        store.close()
+
+    # Report and persist the cache
+    if cache is not None:
+        sys.stderr.write('Cache: {} hits, {} misses ({:.2f}% hit rate)\n'.format(cache.hits, cache.misses, 100 * cache.hit_rate()))
+        cache.close()
+
+    # Stop the worker processes
+    if pool is not None:
+        pool.close()
+
     # Terminate the host program
-    env.terminate()
+    if envs is None:
+        env.terminate()
+
+    return win_ratio_list, successful_episodes
+
+def serve(address):
+    """Runs the agent as a server of runs on a Unix socket
+
+    Each line received is a JSON request: :code:`{"args": [...]}` runs
+    the agent with these command-line arguments, replying with one line
+    :code:`{"episode": i, "win_ratio": w}` per episode and a last line
+    with the :code:`win_ratios`, :code:`successful_episodes` and
+    :code:`seconds` of the run, or an :code:`error`.
+    :code:`{"quit": true}` stops the server. Environments are kept
+    between runs, so runs pay neither the interpreter startup nor the
+    creation of their environments.
+
+    Parameters
+    ----------
+    address : str
+        path of the Unix socket to listen on
+    """
+    parser = build_parser()
+    envs = {}
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(address)
+    listener.listen(1)
+
+    try:
+        running = True
+        while running:
+            conn, _ = listener.accept()
+            with conn, conn.makefile('rw') as f:
+                def reply(message):
+                    f.write(json.dumps(message) + '\n')
+                    f.flush()
+
+                for line in f:
+                    request = json.loads(line)
+                    if request.get('quit'):
+                        running = False
+                        break
+
+                    start = time.perf_counter()
+                    try:
+                        options = parse_options(parser, request['args'])
+                        if options.serve:
+                            raise ValueError('--serve cannot be requested')
+                        win_ratios, successful_episodes = run(
+                            options, envs,
+                            lambda i, w: reply({'episode': i, 'win_ratio': w}))
+                    except SystemExit:
+                        reply({'error': 'invalid arguments: {}'.format(' '.join(request['args']))})
+                        continue
+                    except Exception as e:
+                        reply({'error': '{}: {}'.format(type(e).__name__, e)})
+                        continue
+                    reply({'win_ratios': win_ratios,
+                           'successful_episodes': successful_episodes,
+                           'seconds': time.perf_counter() - start})
+    finally:
+        listener.close()
+        os.unlink(address)
+        for env, batch_env in envs.values():
+            env.terminate()
+
+def main():
+    # Build parser
+    parser = build_parser()
+    options = parse_options(parser)
+    if options.serve:
+        serve(options.serve)
+    else:
+        run(options)
 
 if __name__ == '__main__':
     main()
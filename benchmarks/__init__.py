@@ -0,0 +1 @@
+"""Benchmarks for pfn2017rl"""
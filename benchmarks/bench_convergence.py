@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+"""Compares the evaluations needed by CEM variants to solve CartPole
+
+A run is solved when the mean parameters reach the full step budget,
+and its cost counts every episode, samples and mean evaluation alike.
+To run the benchmark, simply write the following:
+
+    python3 -m benchmarks.bench_convergence
+"""
+
+import sys
+import random
+from argparse import ArgumentParser
+
+from agent import noisy_evaluation, crn_evaluation, run_episode, update_model
+from environments import CartPoleSimEnv, sample_start_state
+from linear_model import LinearModel
+from optimizers import CrossEntropyMethod
+
+SAMPLING_RATE = 20
+TOP_SAMPLES = 0.2
+STEP_SIZE = 500
+MAX_ITERATIONS = 50
+SEEDS = '1,2,3,4,5,6,7,8,9,10'
+
+# CEM variants, as keyword arguments of CrossEntropyMethod
+VARIANTS = [
+    ('fixed', {}),
+    ('adaptive', {'adaptive': True, 'min_variance': 0.01}),
+    ('adaptive+noise', {'adaptive': True, 'extra_noise': 1.0, 'noise_decay': 0.1, 'min_variance': 0.01}),
+    ('smoothed', {'adaptive': True, 'smoothing': 0.7, 'min_variance': 0.01}),
+    ('full-covariance', {'full_covariance': True, 'adaptive': True, 'min_variance': 0.01}),
+]
+
+def build_parser():
+    parser = ArgumentParser()
+    parser.add_argument('-n', '--sampling-size',
+                        dest='n', help='no. of samples to generate',
+                        type=int, default=SAMPLING_RATE)
+    parser.add_argument('-p', '--top-samples',
+                        dest='p', help='no. of top samples to take',
+                        type=float, default=TOP_SAMPLES)
+    parser.add_argument('-z', '--step-size',
+                        dest='step_size', help='no. of steps for each episode',
+                        type=int, default=STEP_SIZE)
+    parser.add_argument('-i', '--max-iterations',
+                        dest='max_iterations', help='no. of CEM iterations before giving up',
+                        type=int, default=MAX_ITERATIONS)
+    parser.add_argument('-r', '--random-seeds',
+                        dest='seeds', help='comma-separated random seeds, one run per seed',
+                        default=SEEDS)
+    return parser
+
+def evaluations_to_solve(cem, steps, max_iterations, seed, crn=0):
+    """Runs CEM until the mean parameters solve the environment
+
+    With :code:`crn`, the samples of each iteration are evaluated on the
+    same :code:`crn` start states.
+
+    Returns
+    -------
+    int
+        no. of episodes evaluated, or None if not solved
+    """
+    random.seed(seed)
+    env = CartPoleSimEnv()
+    model = LinearModel(dims=env.obs_dim())
+    params = model.params
+    evaluations = 0
+
+    for i in range(max_iterations):
+        noisy_params = cem.sample_parameters(params)
+        if crn:
+            states = [sample_start_state() for k in range(crn)]
+            rewards = crn_evaluation(model, env, steps, noisy_params, states)
+        else:
+            rewards = [noisy_evaluation(model, env, steps, w) for w in noisy_params]
+        params = cem.get_parameter_mean(cem.get_elite_parameters(noisy_params, rewards))
+        evaluations += len(rewards) * max(crn, 1) + 1
+        if run_episode(update_model(model, params), env, steps) >= steps:
+            return evaluations
+
+    return None
+
+def main():
+    # Build parser
+    parser = build_parser()
+    options = parser.parse_args()
+    seeds = [int(s) for s in options.seeds.split(',')]
+
+    sys.stdout.write('{:<16} {:>7} {:>16}\n'.format('variant', 'solved', 'mean evaluations'))
+    for name, kwargs in VARIANTS:
+        results = [evaluations_to_solve(CrossEntropyMethod(N=options.n, p=options.p, **kwargs),
+                                        options.step_size, options.max_iterations, seed)
+                   for seed in seeds]
+        solved = [r for r in results if r is not None]
+        mean = sum(solved) / len(solved) if solved else float('nan')
+        sys.stdout.write('{:<16} {:>3}/{:<3} {:>16.1f}\n'.format(name, len(solved), len(seeds), mean))
+
+if __name__ == '__main__':
+    main()
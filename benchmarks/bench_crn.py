@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+"""Compares the evaluations needed to solve CartPole with and without
+common random numbers
+
+With common random numbers, all the samples of an iteration are
+evaluated on the same K start states, which makes their ranking less
+noisy at smaller N. To run the benchmark, simply write the following:
+
+    python3 -m benchmarks.bench_crn
+"""
+
+import sys
+from argparse import ArgumentParser
+
+from benchmarks.bench_convergence import evaluations_to_solve
+from optimizers import CrossEntropyMethod
+
+SAMPLE_SIZES = '10,20,50,100'
+CRN = '0,1,3'
+TOP_SAMPLES = 0.2
+STEP_SIZE = 500
+MAX_ITERATIONS = 50
+SEEDS = '1,2,3,4,5,6,7,8,9,10'
+
+def build_parser():
+    parser = ArgumentParser()
+    parser.add_argument('-n', '--sampling-sizes',
+                        dest='n', help='comma-separated no. of samples',
+                        default=SAMPLE_SIZES)
+    parser.add_argument('-k', '--crn',
+                        dest='crn', help='comma-separated no. of common start states (0 for independent ones)',
+                        default=CRN)
+    parser.add_argument('-p', '--top-samples',
+                        dest='p', help='no. of top samples to take',
+                        type=float, default=TOP_SAMPLES)
+    parser.add_argument('-z', '--step-size',
+                        dest='step_size', help='no. of steps for each episode',
+                        type=int, default=STEP_SIZE)
+    parser.add_argument('-i', '--max-iterations',
+                        dest='max_iterations', help='no. of CEM iterations before giving up',
+                        type=int, default=MAX_ITERATIONS)
+    parser.add_argument('-r', '--random-seeds',
+                        dest='seeds', help='comma-separated random seeds, one run per seed',
+                        default=SEEDS)
+    return parser
+
+def main():
+    # Build parser
+    parser = build_parser()
+    options = parser.parse_args()
+    seeds = [int(s) for s in options.seeds.split(',')]
+
+    sys.stdout.write('{:>5} {:>4} {:>7} {:>16}\n'.format('N', 'crn', 'solved', 'mean evaluations'))
+    for n in [int(v) for v in options.n.split(',')]:
+        for crn in [int(v) for v in options.crn.split(',')]:
+            results = [evaluations_to_solve(CrossEntropyMethod(N=n, p=options.p), options.step_size,
+                                            options.max_iterations, seed, crn=crn)
+                       for seed in seeds]
+            solved = [r for r in results if r is not None]
+            mean = sum(solved) / len(solved) if solved else float('nan')
+            sys.stdout.write('{:>5} {:>4} {:>3}/{:<3} {:>16.1f}\n'.format(n, crn, len(solved), len(seeds), mean))
+
+if __name__ == '__main__':
+    main()
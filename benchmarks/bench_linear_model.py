@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+"""Compares the cost of LinearModel.action per million actions
+
+To run the benchmark, simply write the following:
+
+    python3 -m benchmarks.bench_linear_model
+"""
+
+import sys
+import random
+import timeit
+from argparse import ArgumentParser
+
+from linear_model import LinearModel
+
+ACTIONS = 1000000
+DIMS = 4
+BATCH_SIZE = 1000
+
+def build_parser():
+    parser = ArgumentParser()
+    parser.add_argument('-a', '--actions',
+                        dest='actions', help='no. of actions to compute',
+                        type=int, default=ACTIONS)
+    parser.add_argument('-d', '--dims',
+                        dest='dims', help='no. of dimensions of the observations',
+                        type=int, default=DIMS)
+    parser.add_argument('-b', '--batch-size',
+                        dest='batch_size', help='no. of observations per batch',
+                        type=int, default=BATCH_SIZE)
+    return parser
+
+def legacy_action(params, obs):
+    """The original implementation of LinearModel.action"""
+    assert len(params) == len(obs), "Length of two lists aren't the same, {} != {}".format(len(params), len(obs))
+    inner_prod = sum([x*y for x,y in zip(params,obs)])
+    sign = lambda k: (k>0) - (k<=0)
+    return sign(inner_prod)
+
+def main():
+    # Build parser
+    parser = build_parser()
+    options = parser.parse_args()
+
+    model = LinearModel(options.dims)
+    obs = [[random.uniform(-1, 1) for i in range(options.dims)]
+           for j in range(options.batch_size)]
+    rounds = max(1, options.actions // options.batch_size)
+    n_actions = rounds * options.batch_size
+    params = model.params
+
+    def run_legacy():
+        for o in obs:
+            legacy_action(params, o)
+
+    def run_scalar():
+        action = model.action
+        for o in obs:
+            action(o)
+
+    def run_batch():
+        model.batch_action(obs)
+
+    for name, fn in [('legacy action', run_legacy),
+                     ('action', run_scalar),
+                     ('batch_action', run_batch)]:
+        seconds = timeit.timeit(fn, number=rounds)
+        sys.stdout.write('{:<14} {:.3f}s per million actions\n'.format(name, seconds * 1e6 / n_actions))
+
+if __name__ == '__main__':
+    main()
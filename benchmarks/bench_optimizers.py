@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+"""Compares the list-based and array-based cross entropy methods
+
+Each engine samples an N x dims population, selects the elites and
+computes their mean. To run the benchmark, simply write the following:
+
+    python3 -m benchmarks.bench_optimizers
+
+Sizes above --max-elements are skipped, as pure-Python sampling of
+100k x 1k parameters takes minutes per engine.
+"""
+
+import sys
+import random
+import time
+from argparse import ArgumentParser
+
+from optimizers import CrossEntropyMethod, ArrayCrossEntropyMethod
+
+SAMPLE_SIZES = '100,1000,10000,100000'
+DIMS = '4,100,1000'
+TOP_SAMPLES = 0.1
+MAX_ELEMENTS = 10000000
+
+def build_parser():
+    parser = ArgumentParser()
+    parser.add_argument('-n', '--sampling-sizes',
+                        dest='n', help='comma-separated no. of samples',
+                        default=SAMPLE_SIZES)
+    parser.add_argument('-d', '--dims',
+                        dest='dims', help='comma-separated no. of dimensions',
+                        default=DIMS)
+    parser.add_argument('-p', '--top-samples',
+                        dest='p', help='no. of top samples to take',
+                        type=float, default=TOP_SAMPLES)
+    parser.add_argument('-m', '--max-elements',
+                        dest='max_elements', help='skip sizes with more than N x dims elements',
+                        type=int, default=MAX_ELEMENTS)
+    return parser
+
+def time_engine(cem, params, rewards):
+    """Returns the seconds spent sampling, selecting and averaging"""
+    start = time.perf_counter()
+    samples = cem.sample_parameters(params)
+    sampled = time.perf_counter()
+    elites = cem.get_elite_parameters(samples, rewards)
+    selected = time.perf_counter()
+    cem.get_parameter_mean(elites)
+    averaged = time.perf_counter()
+    return sampled - start, selected - sampled, averaged - selected
+
+def main():
+    # Build parser
+    parser = build_parser()
+    options = parser.parse_args()
+
+    sys.stdout.write('{:>7} {:>5} {:<6} {:>10} {:>10} {:>10}\n'.format('N', 'dims', 'engine', 'sample', 'select', 'mean'))
+    for n in [int(v) for v in options.n.split(',')]:
+        for dims in [int(v) for v in options.dims.split(',')]:
+            if n * dims > options.max_elements:
+                continue
+            params = [random.uniform(-1, 1) for i in range(dims)]
+            rewards = [random.random() for i in range(n)]
+            for name, engine in [('list', CrossEntropyMethod), ('array', ArrayCrossEntropyMethod)]:
+                timings = time_engine(engine(N=n, p=options.p), params, rewards)
+                sys.stdout.write('{:>7} {:>5} {:<6} {:>9.4f}s {:>9.4f}s {:>9.4f}s\n'.format(n, dims, name, *timings))
+
+if __name__ == '__main__':
+    main()
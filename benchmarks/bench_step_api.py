@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+
+"""Compares the allocations and steps per second of step and step_into
+
+:code:`step` builds a new observation list and a tuple at every step,
+while :code:`step_into` overwrites a buffer given by the caller. The
+bytes allocated by one step are its peak of memory traced by
+:code:`tracemalloc` (objects taken from the free lists of the
+interpreter, like small tuples and floats, are not traced), measured
+around the call to the environment and around the action of
+:code:`LinearModel`. To run the benchmark, simply write the
+following:
+
+    python3 -m benchmarks.bench_step_api
+"""
+
+import sys
+import random
+import timeit
+import tracemalloc
+from array import array
+from argparse import ArgumentParser
+
+from environments import EasyEnv, CartPoleSimEnv
+from linear_model import LinearModel
+
+STEPS = 100000
+ALLOCATION_STEPS = 2000
+REPEAT = 5
+STEP_SIZE = 500
+RANDOM_SEED = 42
+
+# Environments, with the parameters of the policy
+ENVIRONMENTS = [
+    ('easy', EasyEnv, [1.0]),
+    ('sim', CartPoleSimEnv, [0.1, 0.5, 1.0, 1.0]),
+]
+
+def build_parser():
+    parser = ArgumentParser()
+    parser.add_argument('-s', '--steps',
+                        dest='steps', help='no. of steps to time',
+                        type=int, default=STEPS)
+    parser.add_argument('-a', '--allocation-steps',
+                        dest='allocation_steps', help='no. of steps to trace the allocations of',
+                        type=int, default=ALLOCATION_STEPS)
+    parser.add_argument('-r', '--repeat',
+                        dest='repeat', help='no. of timings, the best one being kept',
+                        type=int, default=REPEAT)
+    return parser
+
+def play_step(model, env, steps, buf=None):
+    """Plays episodes of at most :code:`STEP_SIZE` steps with :code:`step`
+    until a number of steps, like the original :code:`run_episode`"""
+    action, step = model.action, env.step
+    n = 0
+    while n < steps:
+        obs = env.reset()
+        for s in range(min(STEP_SIZE, steps - n)):
+            obs, reward, done = step(action(obs))
+            n += 1
+            if done:
+                break
+
+def play_step_into(model, env, steps, buf):
+    """Plays episodes with :code:`step_into`, like :code:`run_episode_into`"""
+    action, step_into = model.action, env.step_into
+    n = 0
+    while n < steps:
+        env.reset_into(buf)
+        for s in range(min(STEP_SIZE, steps - n)):
+            step_into(action(buf), buf)
+            n += 1
+            if env.done:
+                break
+
+# Ways of stepping, with the observation buffer they need
+VARIANTS = [
+    ('step', play_step, lambda dims: None),
+    ('step_into list', play_step_into, lambda dims: [0.0] * dims),
+    ('step_into array', play_step_into, lambda dims: array('d', [0.0]) * dims),
+]
+
+def traced(fn, *args):
+    """Calls a function and returns its result and the peak bytes it
+    allocated"""
+    tracemalloc.reset_peak()
+    start = tracemalloc.get_traced_memory()
+    result = fn(*args)
+    end = tracemalloc.get_traced_memory()
+    return result, end[1] - start[0]
+
+def allocated_bytes(model, env, steps, buf):
+    """Returns the mean peak bytes allocated by the call to the
+    environment and by the action of the model, over a number of steps"""
+    env_bytes = action_bytes = overhead = 0
+    n = 0
+
+    tracemalloc.start()
+    while n < steps:
+        if buf is None:
+            obs = env.reset()
+        else:
+            env.reset_into(buf)
+            obs = buf
+        done = False
+        while n < steps and not done:
+            overhead += traced(int)[1]
+            action, allocated = traced(model.action, obs)
+            action_bytes += allocated
+            if buf is None:
+                (obs, reward, done), allocated = traced(env.step, action)
+            else:
+                reward, allocated = traced(env.step_into, action, buf)
+                done = env.done
+            env_bytes += allocated
+            n += 1
+    tracemalloc.stop()
+
+    return (env_bytes - overhead) / steps, (action_bytes - overhead) / steps
+
+def main():
+    # Build parser
+    parser = build_parser()
+    options = parser.parse_args()
+
+    sys.stdout.write('{:<6} {:<16} {:>15} {:>18} {:>12}\n'.format(
+        'env', 'api', 'step bytes/step', 'action bytes/step', 'steps/s'))
+    for env_name, env_class, params in ENVIRONMENTS:
+        model = LinearModel(len(params))
+        model.params = params
+        for name, play, make_buffer in VARIANTS:
+            env = env_class()
+            buf = make_buffer(env.obs_dim())
+
+            random.seed(RANDOM_SEED)
+            env_bytes, action_bytes = allocated_bytes(model, env, options.allocation_steps, buf)
+
+            def run():
+                random.seed(RANDOM_SEED)
+                play(model, env, options.steps, buf)
+
+            seconds = min(timeit.repeat(run, number=1, repeat=options.repeat))
+            sys.stdout.write('{:<6} {:<16} {:>15.1f} {:>18.1f} {:>12.0f}\n'.format(
+                env_name, name, env_bytes, action_bytes, options.steps / seconds))
+
+if __name__ == '__main__':
+    main()
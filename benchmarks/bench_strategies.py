@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+
+"""Compares the evaluations needed by each optimizer to solve CartPole
+and EasyEnv
+
+A run is solved when the parameters returned by :code:`tell` play a
+whole episode perfectly: the full step budget of CartPole, or the sign
+of every observation of EasyEnv. Its cost counts every episode, samples
+and check alike. To run the benchmark, simply write the following:
+
+    python3 -m benchmarks.bench_strategies
+
+With --hidden, the policy is an MLP with these hidden layers instead of
+the linear model.
+"""
+
+import sys
+import random
+from argparse import ArgumentParser
+
+from agent import noisy_evaluation, run_episode, update_model, make_model, SIGMA, LEARNING_RATE
+from environments import EasyEnv, BatchEasyEnv, CartPoleSimEnv
+from optimizers import CrossEntropyMethod, CMAES, EvolutionStrategy
+
+SAMPLING_RATE = 20
+TOP_SAMPLES = 0.2
+STEP_SIZE = 500
+MAX_ITERATIONS = 50
+SEEDS = '1,2,3,4,5,6,7,8,9,10'
+
+# Optimizers, built from the options
+OPTIMIZERS = [
+    ('cem', lambda options: CrossEntropyMethod(N=options.n, p=options.p)),
+    ('cmaes', lambda options: CMAES(N=options.n, sigma=SIGMA['cmaes'])),
+    ('es', lambda options: EvolutionStrategy(N=options.n, sigma=SIGMA['es'], learning_rate=LEARNING_RATE)),
+]
+
+def cartpole_solved(model, env, steps):
+    """Checks if the policy keeps the pole up for the whole step budget"""
+    return run_episode(model, env, steps) >= steps
+
+def easy_solved(model, env, steps):
+    """Checks if the policy takes the sign of every observation"""
+    obs = env.reset()
+    for s in range(steps):
+        action = model.action(obs)
+        if action != (1 if obs[0] > 0 else -1):
+            return False
+        obs, reward, done = env.step(action)
+        if done:
+            break
+    return True
+
+# Environments, with their step budget and solved check
+ENVIRONMENTS = [
+    ('cartpole', CartPoleSimEnv, STEP_SIZE, cartpole_solved),
+    ('easy', EasyEnv, BatchEasyEnv.EPISODE_STEPS, easy_solved),
+]
+
+def build_parser():
+    parser = ArgumentParser()
+    parser.add_argument('-n', '--sampling-size',
+                        dest='n', help='no. of samples to generate',
+                        type=int, default=SAMPLING_RATE)
+    parser.add_argument('-p', '--top-samples',
+                        dest='p', help='no. of top samples to take with cem',
+                        type=float, default=TOP_SAMPLES)
+    parser.add_argument('-i', '--max-iterations',
+                        dest='max_iterations', help='no. of iterations before giving up',
+                        type=int, default=MAX_ITERATIONS)
+    parser.add_argument('-r', '--random-seeds',
+                        dest='seeds', help='comma-separated random seeds, one run per seed',
+                        default=SEEDS)
+    parser.add_argument('--hidden',
+                        dest='hidden', help='comma-separated no. of units of the hidden layers of an MLP policy',
+                        required=False)
+    return parser
+
+def evaluations_to_solve(optimizer, env, model, steps, solved, max_iterations, seed):
+    """Runs the optimizer until its parameters solve the environment
+
+    Returns
+    -------
+    int
+        no. of episodes evaluated, or None if not solved
+    """
+    random.seed(seed)
+    params = model.params
+    evaluations = 0
+
+    for i in range(max_iterations):
+        noisy_params = optimizer.ask(params)
+        rewards = [noisy_evaluation(model, env, steps, w) for w in noisy_params]
+        params = optimizer.tell(noisy_params, rewards)
+        evaluations += len(rewards) + 1
+        if solved(update_model(model, params), env, steps):
+            return evaluations
+
+    return None
+
+def main():
+    # Build parser
+    parser = build_parser()
+    options = parser.parse_args()
+    seeds = [int(s) for s in options.seeds.split(',')]
+
+    sys.stdout.write('{:<10} {:<10} {:>7} {:>16}\n'.format('env', 'optimizer', 'solved', 'mean evaluations'))
+    for env_name, env_class, steps, solved in ENVIRONMENTS:
+        for name, make_optimizer in OPTIMIZERS:
+            results = []
+            for seed in seeds:
+                random.seed(seed)
+                env = env_class()
+                model = make_model('mlp' if options.hidden else 'linear', env.obs_dim(), options.hidden or '')
+                results.append(evaluations_to_solve(make_optimizer(options), env, model, steps,
+                                                    solved, options.max_iterations, seed))
+            done = [r for r in results if r is not None]
+            mean = sum(done) / len(done) if done else float('nan')
+            sys.stdout.write('{:<10} {:<10} {:>3}/{:<3} {:>16.1f}\n'.format(
+                env_name, name, len(done), len(seeds), mean))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+
+"""Measures the throughput of the environments, policy and optimizer
+
+Results are written as JSON and can be compared against a stored
+baseline, flagging the benchmarks that got slower by more than a
+threshold. To run the suite and compare it, simply write the following:
+
+    python3 -m benchmarks.suite run -o baseline.json
+    python3 -m benchmarks.suite run -o results.json
+    python3 -m benchmarks.suite compare baseline.json results.json
+
+The CartPoleEnv benchmarks run the agent side under the host program
+given by --host, and are skipped if it cannot be executed.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import platform
+import tempfile
+import subprocess
+from argparse import ArgumentParser
+
+from agent import batch_evaluation, noisy_evaluation, run_episode, update_model
+from environments import EasyEnv, BatchEasyEnv, CartPoleEnv, CartPoleSimEnv, TRANSPORTS
+from linear_model import LinearModel
+from optimizers import CrossEntropyMethod
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HOST = './cartpole.out'
+REPEAT = 3
+STEPS = 100000
+ACTIONS = 1000000
+SAMPLE_SIZES = '100,1000,10000'
+DIMS = '4,100'
+TOP_SAMPLES = 0.1
+ITERATIONS = 3
+THRESHOLD = 0.1
+
+def build_parser():
+    parser = ArgumentParser()
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    run = commands.add_parser('run', help='run the benchmarks and write their results')
+    run.add_argument('-o', '--output',
+                     dest='output', help='JSON file to write the results to',
+                     required=False)
+    run.add_argument('-r', '--repeat',
+                     dest='repeat', help='no. of runs per benchmark, the best one is kept',
+                     type=int, default=REPEAT)
+    run.add_argument('--quick',
+                     dest='quick', help='divide the work of every benchmark by 10',
+                     action='store_true', default=False)
+    run.add_argument('-n', '--sampling-sizes',
+                     dest='n', help='comma-separated no. of CEM samples',
+                     default=SAMPLE_SIZES)
+    run.add_argument('-d', '--dims',
+                     dest='dims', help='comma-separated no. of CEM dimensions',
+                     default=DIMS)
+    run.add_argument('--host',
+                     dest='host', help='host program for the CartPoleEnv benchmarks',
+                     default=HOST)
+
+    compare = commands.add_parser('compare', help='flag the regressions of results against a baseline')
+    compare.add_argument('baseline', help='JSON results of the baseline')
+    compare.add_argument('results', help='JSON results to check')
+    compare.add_argument('-t', '--threshold',
+                         dest='threshold', help='relative slowdown flagged as a regression',
+                         type=float, default=THRESHOLD)
+
+    host = commands.add_parser('host', help='(internal) step CartPoleEnv under the host program')
+    host.add_argument('-s', '--steps', dest='steps', type=int, default=STEPS)
+    host.add_argument('--transport', dest='transport', choices=TRANSPORTS, default='text')
+    host.add_argument('-o', '--output', dest='output', required=True)
+    return parser
+
+def best_of(repeat, fn):
+    """Returns the smallest of the seconds returned by repeat calls of fn"""
+    return min(fn() for i in range(repeat))
+
+def time_steps(env, steps):
+    """Returns the seconds spent stepping env for steps steps, resetting
+    it at the end of each episode"""
+    random.seed(0)
+    start = time.perf_counter()
+    env.reset()
+    for s in range(steps):
+        obs, reward, done = env.step(1 if s & 1 else -1)
+        if done:
+            env.reset()
+    return time.perf_counter() - start
+
+def time_batch_episodes(episodes):
+    """Returns the seconds spent evaluating one linear policy per episode
+    of BatchEasyEnv, stepping it like the agent does"""
+    random.seed(0)
+    env = BatchEasyEnv(episodes)
+    model = LinearModel(dims=env.obs_dim())
+    params = [[random.uniform(-1, 1)] for i in range(episodes)]
+    start = time.perf_counter()
+    batch_evaluation(model, env, BatchEasyEnv.EPISODE_STEPS, params)
+    return time.perf_counter() - start
+
+def time_actions(actions):
+    """Returns the seconds spent computing actions with LinearModel.action"""
+    random.seed(0)
+    model = LinearModel(4)
+    obs = [[random.uniform(-1, 1) for i in range(4)] for j in range(1000)]
+    action = model.action
+    start = time.perf_counter()
+    for i in range(max(1, actions // len(obs))):
+        for o in obs:
+            action(o)
+    return time.perf_counter() - start
+
+def time_cem(n, dims):
+    """Returns the seconds spent sampling, selecting and averaging"""
+    random.seed(0)
+    cem = CrossEntropyMethod(N=n, p=TOP_SAMPLES)
+    params = [random.uniform(-1, 1) for i in range(dims)]
+    rewards = [random.random() for i in range(n)]
+    start = time.perf_counter()
+    samples = cem.sample_parameters(params)
+    sampled = time.perf_counter()
+    elites = cem.get_elite_parameters(samples, rewards)
+    selected = time.perf_counter()
+    cem.get_parameter_mean(elites)
+    averaged = time.perf_counter()
+    return sampled - start, selected - sampled, averaged - selected
+
+def time_iterations(iterations, n=100, steps=500):
+    """Returns the mean seconds per CEM iteration of the agent loop on the
+    in-process simulator, starting from the same seed"""
+    random.seed(0)
+    env = CartPoleSimEnv()
+    model = LinearModel(dims=env.obs_dim())
+    cem = CrossEntropyMethod(N=n, p=TOP_SAMPLES)
+    params = model.params
+    start = time.perf_counter()
+    for i in range(iterations):
+        noisy_params = cem.sample_parameters(params)
+        rewards = [noisy_evaluation(model, env, steps, w) for w in noisy_params]
+        params = cem.get_parameter_mean(cem.get_elite_parameters(noisy_params, rewards))
+        run_episode(update_model(model, params), env, steps)
+    return (time.perf_counter() - start) / iterations
+
+def time_host(host, steps, transport):
+    """Returns the seconds spent stepping CartPoleEnv under the host
+    program, or None if it cannot be run"""
+    if not os.access(os.path.join(ROOT, host), os.X_OK):
+        return None
+    with tempfile.TemporaryDirectory() as tmpdir:
+        output = os.path.join(tmpdir, 'host.json')
+        agent = '{} -m benchmarks.suite host -s {} --transport {} -o {}'.format(
+            sys.executable, steps, transport, output)
+        try:
+            subprocess.check_call([host, agent], cwd=ROOT, timeout=600)
+            with open(output) as f:
+                return json.load(f)['seconds']
+        except (OSError, subprocess.SubprocessError, ValueError):
+            return None
+
+def result(value, unit, higher_is_better=True):
+    """Returns the JSON result of a benchmark"""
+    return {'value': value, 'unit': unit, 'higher_is_better': higher_is_better}
+
+def run(options):
+    """Runs every benchmark and returns the results by name"""
+    scale = 10 if options.quick else 1
+    repeat = options.repeat
+    steps = STEPS // scale
+    results = {}
+
+    seconds = best_of(repeat, lambda: time_steps(EasyEnv(), steps))
+    results['env.easy.steps_per_sec'] = result(steps / seconds, 'steps/s')
+    episodes = steps
+    seconds = best_of(repeat, lambda: time_batch_episodes(episodes))
+    results['env.easy_batch.episodes_per_sec'] = result(episodes / seconds, 'episodes/s')
+    seconds = best_of(repeat, lambda: time_steps(CartPoleSimEnv(), steps))
+    results['env.sim.steps_per_sec'] = result(steps / seconds, 'steps/s')
+    for transport in TRANSPORTS:
+        seconds = time_host(options.host, steps, transport)
+        if seconds is None:
+            sys.stderr.write('Skipping CartPoleEnv ({}): cannot run {}\n'.format(transport, options.host))
+            continue
+        results['env.host.{}.steps_per_sec'.format(transport)] = result(steps / seconds, 'steps/s')
+
+    actions = ACTIONS // scale
+    seconds = best_of(repeat, lambda: time_actions(actions))
+    results['model.action.actions_per_sec'] = result(actions / seconds, 'actions/s')
+
+    for n in [int(v) for v in options.n.split(',')]:
+        for dims in [int(v) for v in options.dims.split(',')]:
+            timings = [time_cem(n, dims) for i in range(repeat)]
+            for stage, seconds in zip(('sample', 'select', 'mean'), map(min, zip(*timings))):
+                name = 'cem.{}.n{}.d{}.seconds'.format(stage, n, dims)
+                results[name] = result(seconds, 's', higher_is_better=False)
+
+    iterations = max(1, ITERATIONS // scale)
+    seconds = best_of(repeat, lambda: time_iterations(iterations))
+    results['agent.iteration.sim.seconds'] = result(seconds, 's', higher_is_better=False)
+
+    return results
+
+def compare(baseline, results, threshold=THRESHOLD):
+    """Compares results against a baseline
+
+    Returns
+    -------
+    list of tuples
+        :code:`(name, baseline value, value, change, regression)` for
+        every benchmark in both, where change is the relative speedup
+        (negative when slower)
+    """
+    rows = []
+    for name in sorted(set(baseline) & set(results)):
+        old, new = baseline[name]['value'], results[name]['value']
+        if results[name]['higher_is_better']:
+            change = new / old - 1
+        else:
+            change = old / new - 1
+        rows.append((name, old, new, change, change < -threshold))
+    return rows
+
+def host_main(options):
+    """Steps CartPoleEnv under the host program and writes the seconds"""
+    env = CartPoleEnv(transport=options.transport)
+    seconds = time_steps(env, options.steps)
+    env.terminate()
+    with open(options.output, 'w') as f:
+        json.dump({'seconds': seconds}, f)
+
+def main():
+    # Build parser
+    parser = build_parser()
+    options = parser.parse_args()
+
+    if options.command == 'host':
+        host_main(options)
+        return
+
+    if options.command == 'run':
+        results = run(options)
+        for name, r in sorted(results.items()):
+            sys.stdout.write('{:<32} {:>14.6g} {}\n'.format(name, r['value'], r['unit']))
+        if options.output:
+            with open(options.output, 'w') as f:
+                json.dump({'python': platform.python_version(),
+                           'platform': platform.platform(),
+                           'timestamp': time.time(),
+                           'results': results}, f, indent=2, sort_keys=True)
+        return
+
+    with open(options.baseline) as f:
+        baseline = json.load(f)['results']
+    with open(options.results) as f:
+        results = json.load(f)['results']
+    rows = compare(baseline, results, options.threshold)
+    sys.stdout.write('{:<32} {:>12} {:>12} {:>8}\n'.format('benchmark', 'baseline', 'result', 'change'))
+    for name, old, new, change, regression in rows:
+        sys.stdout.write('{:<32} {:>12.6g} {:>12.6g} {:>+7.1f}%{}\n'.format(
+            name, old, new, 100 * change, '  REGRESSION' if regression else ''))
+    regressions = sum(row[4] for row in rows)
+    if regressions:
+        sys.stderr.write('{} of {} benchmarks regressed by more than {:.0f}%\n'.format(
+            regressions, len(rows), 100 * options.threshold))
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
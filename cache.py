@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+
+"""Contains the evaluation cache"""
+
+import sys
+import zlib
+import struct
+import sqlite3
+from collections import OrderedDict
+
+MAX_ENTRIES = 100000
+MAX_BYTES = 64 * 2**20
+DECIMALS = 9
+FLUSH_EVERY = 1000
+
+def quantize(params, decimals=DECIMALS):
+    """Returns the parameters rounded to a number of decimals, with -0.0
+    turned into 0.0"""
+    return tuple([round(x, decimals) + 0.0 for x in params])
+
+def param_seed(params, decimals=DECIMALS):
+    """Returns the seed of the episode of a parameter vector
+
+    The seed only depends on the rounded parameters, so parameters that
+    are evaluated again (a mean that stopped moving, samples of a
+    collapsed distribution, the trials of a sweep that share a cache
+    file) replay the same episode and hit the cache.
+
+    Returns
+    -------
+    int
+        a 32-bit seed
+    """
+    rounded = quantize(params, decimals)
+    return zlib.crc32(struct.pack('<{}d'.format(len(rounded)), *rounded))
+
+
+class EvaluationCache(object):
+    """Bounded LRU cache of episode rewards
+
+    Rewards are keyed by the environment and model, the quantized
+    parameter vector, the seed of the environment and the step budget,
+    which determine the episode of a seeded in-process simulator.
+    Optionally, rewards are also persisted in a SQLite file that several
+    processes can share.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES,
+                 decimals=DECIMALS, path=None, namespace=''):
+        """Initializes the cache
+
+        Parameters
+        ----------
+        max_entries : int (default is 100000)
+            maximum number of rewards kept in memory
+        max_bytes : int (default is 64 MiB)
+            maximum (estimated) memory used by the keys kept in memory
+        decimals : int (default is 9)
+            number of decimals the parameters are rounded to
+        path : str (default is None)
+            SQLite file to persist the rewards in. If None, the cache
+            only lives in memory.
+        namespace : str (default is '')
+            the environment and model architecture of the rewards, like
+            :code:`'sim/mlp-8'`, so a shared file does not mix them
+
+        Attributes
+        ----------
+        hits : int
+            number of lookups found in the cache
+        misses : int
+            number of lookups not found in the cache
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.decimals = decimals
+        self.namespace = namespace
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.pending = []
+        self.db = None
+        if path is not None:
+            self.db = sqlite3.connect(path, timeout=60)
+            self.db.execute('CREATE TABLE IF NOT EXISTS evaluations '
+                            '(key TEXT PRIMARY KEY, reward REAL)')
+            self.db.commit()
+
+    def key(self, params, seed, steps):
+        """Returns the key of an episode
+
+        Parameters
+        ----------
+        params : list
+            the parameters of the model
+        seed : int
+            the seed of the environment
+        steps : int
+            the step budget of the episode
+
+        Returns
+        -------
+        tuple
+            the hashable key of the episode
+        """
+        return (self.namespace, quantize(params, self.decimals), seed, steps)
+
+    def _size(self, key):
+        """Estimates the memory used by a key"""
+        return sys.getsizeof(key) + sys.getsizeof(key[1]) + 24 * len(key[1])
+
+    def get(self, key):
+        """Returns the reward of an episode, or None if not cached"""
+        reward = self.entries.get(key)
+        if reward is not None:
+            self.entries.move_to_end(key)
+        elif self.db is not None:
+            row = self.db.execute('SELECT reward FROM evaluations WHERE key = ?',
+                                  (repr(key),)).fetchone()
+            if row is not None:
+                reward = row[0]
+                self._store(key, reward)
+
+        if reward is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return reward
+
+    def put(self, key, reward):
+        """Stores the reward of an episode"""
+        self._store(key, reward)
+        if self.db is not None:
+            self.pending.append((repr(key), reward))
+            if len(self.pending) >= FLUSH_EVERY:
+                self.flush()
+
+    def _store(self, key, reward):
+        """Stores a reward in memory, evicting the least recently used"""
+        if key not in self.entries:
+            self.nbytes += self._size(key)
+        self.entries[key] = reward
+        self.entries.move_to_end(key)
+        while self.entries and (len(self.entries) > self.max_entries
+                                or self.nbytes > self.max_bytes):
+            old, _ = self.entries.popitem(last=False)
+            self.nbytes -= self._size(old)
+
+    def flush(self):
+        """Writes the pending rewards to the SQLite file"""
+        if self.db is not None and self.pending:
+            self.db.executemany('INSERT OR REPLACE INTO evaluations VALUES (?, ?)',
+                                self.pending)
+            self.db.commit()
+            self.pending = []
+
+    def close(self):
+        """Flushes the pending rewards and closes the SQLite file"""
+        self.flush()
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+    def hit_rate(self):
+        """Returns the fraction of lookups found in the cache"""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __len__(self):
+        return len(self.entries)
@@ -10,6 +10,8 @@
 #include <sstream>
 #include <iostream>
 #include <iomanip>
+#include <vector>
+#include <cstdint>
 
 #ifndef M_PI
     #define M_PI 3.14159265358979323846
@@ -26,8 +28,11 @@ void strip(std::string &s) {
     s = s.substr(0, s.size()-1);
 }
 
+// Warnings go to stdout, unless stdout is the command stream (stdio mode)
+std::ostream *warnings = &std::cout;
+
 void invalid(std::string command) {
-  std::cout << "[WARNING] Invalid command: " << command << std::endl;
+  *warnings << "[WARNING] Invalid command: " << command << std::endl;
 }
 
 constexpr double gravity = 9.8;
@@ -41,37 +46,96 @@ constexpr double tau = 0.02;
 constexpr double theta_threshold_radians = 12 * 2 * M_PI / 360;
 constexpr double x_threshold = 2.4;
 
-double x;
-double x_dot;
-double theta;
-double theta_dot;
+struct Cart {
+  double x;
+  double x_dot;
+  double theta;
+  double theta_dot;
+};
+
+// The cart of the single-cart protocol (r/s) and the lanes of the batch
+// protocol (b/R/S)
+Cart cart;
+std::vector<Cart> lanes;
+std::vector<bool> lanes_done;
 
-void reset() {
-  x         = (rand() % 1000 / 1000.0 - 0.5) * 2.0 * 1.20;
-  x_dot     = (rand() % 1000 / 1000.0 - 0.5) * 2.0 * 0.15;
-  theta     = (rand() % 1000 / 1000.0 - 0.5) * 2.0 * 0.15;
-  theta_dot = (rand() % 1000 / 1000.0 - 0.5) * 2.0 * 0.15;
+void reset(Cart &c) {
+  c.x         = (rand() % 1000 / 1000.0 - 0.5) * 2.0 * 1.20;
+  c.x_dot     = (rand() % 1000 / 1000.0 - 0.5) * 2.0 * 0.15;
+  c.theta     = (rand() % 1000 / 1000.0 - 0.5) * 2.0 * 0.15;
+  c.theta_dot = (rand() % 1000 / 1000.0 - 0.5) * 2.0 * 0.15;
 }
 
-void step(int action) {
+void step(Cart &c, int action) {
   double force = force_mag * action;
-  double costheta = cos(theta);
-  double sintheta = sin(theta);
-  double temp = (force + polemass_length * theta_dot * theta_dot * sintheta) / total_mass;
+  double costheta = cos(c.theta);
+  double sintheta = sin(c.theta);
+  double temp = (force + polemass_length * c.theta_dot * c.theta_dot * sintheta) / total_mass;
   double thetaacc = (gravity * sintheta - costheta* temp) / (length * (4.0/3.0 - masspole * costheta * costheta / total_mass));
   double xacc  = temp - polemass_length * thetaacc * costheta / total_mass;
 
-  x = x + tau * x_dot;
-  x_dot = x_dot + tau * xacc;
-  theta = theta + tau * theta_dot;
-  theta_dot = theta_dot + tau * thetaacc;
+  c.x = c.x + tau * c.x_dot;
+  c.x_dot = c.x_dot + tau * xacc;
+  c.theta = c.theta + tau * c.theta_dot;
+  c.theta_dot = c.theta_dot + tau * thetaacc;
+}
+
+bool done(const Cart &c) {
+  return c.x < -x_threshold
+    || c.x > x_threshold
+    || c.theta < -theta_threshold_radians
+    || c.theta > theta_threshold_radians;
+}
+
+std::string cartString(const Cart &c) {
+  return toString(c.x) + " " + toString(c.x_dot) + " " + toString(c.theta) + " " + toString(c.theta_dot);
+}
+
+// Binary transport ("m 1"): replies to r/s/R/S are frames of four
+// little-endian doubles (x, x_dot, theta, theta_dot) and a status byte
+// (1 if done, 0 otherwise), one frame per cart
+bool binary = false;
+
+void appendFrame(std::string &buf, const Cart &c, bool is_done) {
+  const double values[4] = {c.x, c.x_dot, c.theta, c.theta_dot};
+  for (double v : values) {
+    uint64_t bits;
+    std::memcpy(&bits, &v, sizeof bits);
+    for (int i = 0; i < 8; ++i) {
+      buf += static_cast<char>((bits >> (8 * i)) & 0xff);
+    }
+  }
+  buf += static_cast<char>(is_done ? 1 : 0);
+}
+
+std::string cartReply(const Cart &c, bool is_done) {
+  std::string result;
+  if (binary) {
+    appendFrame(result, c, is_done);
+  } else if (is_done) {
+    result = "done\n";
+  } else {
+    result = "obs "+cartString(c)+"\n";
+  }
+  return result;
 }
 
-bool done() {
-  return x < -x_threshold
-    || x > x_threshold
-    || theta < -theta_threshold_radians
-    || theta > theta_threshold_radians;
+// Reply of the batch protocol: "obs" followed by, for each lane, "1" if
+// it is done or "0" and its state otherwise
+std::string lanesString() {
+  std::string result;
+  if (binary) {
+    for (size_t i = 0; i < lanes.size(); ++i) {
+      appendFrame(result, lanes[i], lanes_done[i]);
+    }
+    return result;
+  }
+
+  result = "obs";
+  for (size_t i = 0; i < lanes.size(); ++i) {
+    result += lanes_done[i] ? " 1" : " 0 " + cartString(lanes[i]);
+  }
+  return result + "\n";
 }
 
 void interaction() {
@@ -82,14 +146,15 @@ void interaction() {
       invalid(line);
       return;
     }
-    if(line[0]!='r' && line[0]!='s' && line[0]!='q') {
+    if(line[0]!='r' && line[0]!='s' && line[0]!='q' && line[0]!='m'
+       && line[0]!='b' && line[0]!='R' && line[0]!='S') {
       invalid(line);
       return;
     }
 
     if(line[0] == 'r') {
-      reset();
-      reactive_write("obs "+toString(x) + " " + toString(x_dot) + " " + toString(theta) + " " + toString(theta_dot) + "\n");
+      reset(cart);
+      reactive_write(cartReply(cart, false));
       continue;
     } else if (line[0] == 's'){
       std::istringstream iss(line.substr(1));
@@ -100,12 +165,57 @@ void interaction() {
         return;
       }
 
-      step(action);
-      if (done()) {
-        reactive_write("done\n");
-      } else {
-        reactive_write("obs "+toString(x) + " " + toString(x_dot) + " " + toString(theta) + " " + toString(theta_dot) + "\n");
+      step(cart, action);
+      reactive_write(cartReply(cart, done(cart)));
+    } else if (line[0] == 'm') {
+      // Transport negotiation: "m 1" for binary frames, "m 0" for text
+      std::istringstream iss(line.substr(1));
+      int mode = -1;
+      iss >> mode;
+      if (mode != 0 && mode != 1) {
+        invalid(line);
+        return;
+      }
+
+      binary = mode == 1;
+      reactive_write("mode "+std::to_string(mode)+"\n");
+    } else if (line[0] == 'b') {
+      // Batch protocol negotiation: "b K" allocates K lanes
+      std::istringstream iss(line.substr(1));
+      int k = 0;
+      iss >> k;
+      if (k <= 0) {
+        invalid(line);
+        return;
+      }
+
+      lanes.assign(k, Cart());
+      lanes_done.assign(k, true);
+      reactive_write("batch "+std::to_string(k)+"\n");
+    } else if (line[0] == 'R') {
+      for (size_t i = 0; i < lanes.size(); ++i) {
+        reset(lanes[i]);
+        lanes_done[i] = false;
+      }
+      reactive_write(lanesString());
+    } else if (line[0] == 'S') {
+      // One action per lane, 0 for the lanes that are done
+      std::istringstream iss(line.substr(1));
+      std::vector<int> actions(lanes.size());
+      for (size_t i = 0; i < lanes.size(); ++i) {
+        if (!(iss >> actions[i]) || actions[i] < -1 || actions[i] > 1
+            || (actions[i] == 0) != lanes_done[i]) {
+          invalid(line);
+          return;
+        }
+      }
+
+      for (size_t i = 0; i < lanes.size(); ++i) {
+        if (lanes_done[i]) continue;
+        step(lanes[i], actions[i]);
+        lanes_done[i] = done(lanes[i]);
       }
+      reactive_write(lanesString());
     } else if (line[0] == 'q') {
       return;
     }
@@ -113,10 +223,27 @@ void interaction() {
 }
 
 int main(int argc,char **argv) {
-  srand(time(NULL));
-  reactive_start(argv[1]);
-  reset();
+  // Stdio mode ("cartpole.out" or "cartpole.out - [seed]"): commands are
+  // read from stdin and replies written to stdout, so another program
+  // can own the host through pipes
+  bool stdio = argc < 2 || std::string(argv[1]) == "-";
+  if (stdio && argc > 2) {
+    srand(std::strtoul(argv[2], nullptr, 10));
+  } else {
+    srand(time(NULL) ^ getpid());
+  }
+
+  if (stdio) {
+    warnings = &std::cerr;
+    __reactive_input = 1;
+    __reactive_output = 0;
+  } else {
+    reactive_start(argv[1]);
+  }
+  reset(cart);
   interaction();
-  reactive_end();
+  if (!stdio) {
+    reactive_end();
+  }
   return 0;
 }
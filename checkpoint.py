@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+
+"""Saves and restores the state of a CEM run"""
+
+import os
+import json
+import random
+import tempfile
+
+CHECKPOINT_EVERY = 10
+
+
+def save_checkpoint(path, state):
+    """Writes a checkpoint atomically
+
+    The state is written to a temporary file in the same directory,
+    fsync'ed and renamed over :code:`path`, so a run killed at any point
+    leaves either the previous or the new checkpoint, never a partial one.
+
+    Parameters
+    ----------
+    path : str
+        the checkpoint file
+    state : dict
+        the JSON-serializable state of the run
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix='.ckpt-')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+def load_checkpoint(path):
+    """Returns the state of a checkpoint, or None if it does not exist"""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def get_random_state(rng=random):
+    """Returns the state of a random number generator as JSON lists"""
+    version, internal, gauss_next = rng.getstate()
+    return [version, list(internal), gauss_next]
+
+def set_random_state(state, rng=random):
+    """Restores the state returned by :code:`get_random_state`"""
+    version, internal, gauss_next = state
+    rng.setstate((version, tuple(internal), gauss_next))
@@ -0,0 +1,585 @@
+# -*- coding: utf-8 -*-
+
+"""Distributes sample evaluations and sweep trials to workers over TCP
+
+A coordinator, started by :code:`agent.py --listen` or
+:code:`multiagent.py --listen`, hands out jobs to the workers that
+connect to it, on this machine or on others. To start 4 workers, simply
+write the following:
+
+    python3 distributed.py HOST:PORT -j 4
+
+Messages are JSON lines. A worker asks for jobs with :code:`{"pull":
+n}`, and the coordinator replies :code:`{"jobs": [...]}` as soon as
+there is work, or :code:`{"quit": true}` when it closes. The worker
+pushes the results of all the jobs it pulled in one :code:`{"results":
+[...]}` message, and sends :code:`{"heartbeat": true}` while it works.
+The jobs of a worker that disconnects or misses its heartbeats are
+queued again for the other workers.
+
+Workers run the agent arguments they are sent, so a worker must only
+reach trusted coordinators: the coordinator listens on 127.0.0.1 unless
+another host is given, and every connection starts with a handshake on
+a shared secret, the :code:`DISTRIBUTED_SECRET` environment variable.
+The coordinator sends :code:`{"challenge": nonce}` and closes the
+connection unless the worker replies :code:`{"auth": hmac}`, the
+HMAC-SHA256 of the nonce keyed by the secret.
+"""
+
+import os
+import sys
+import hmac
+import json
+import time
+import socket
+import hashlib
+import secrets
+import itertools
+import threading
+import multiprocessing
+from collections import deque
+from argparse import ArgumentParser
+
+PORT = 5555
+BATCH = 1
+HEARTBEAT = 5.0
+HEARTBEAT_TIMEOUT = 30.0
+CONNECT_TIMEOUT = 30.0
+HOST = '127.0.0.1'
+SECRET_ENV = 'DISTRIBUTED_SECRET'
+# Options of the agent whose files trials may only write under the
+# directory of the worker
+PATH_OPTIONS = ('output_file', 'metrics_file', 'results', 'checkpoint', 'cache_file',
+                'profile_output', 'trace')
+
+def build_parser():
+    parser = ArgumentParser()
+    parser.add_argument('address',
+                        help='HOST:PORT of the coordinator')
+    parser.add_argument('-j', '--jobs',
+                        dest='jobs', help='no. of worker processes',
+                        type=int, default=1)
+    parser.add_argument('-b', '--batch',
+                        dest='batch', help='no. of jobs pulled at once, their results being pushed together',
+                        type=int, default=BATCH)
+    parser.add_argument('--heartbeat',
+                        dest='heartbeat', help='seconds between two heartbeats while running jobs',
+                        type=float, default=HEARTBEAT)
+    parser.add_argument('--timeout',
+                        dest='timeout', help='seconds to wait for the coordinator to listen',
+                        type=float, default=CONNECT_TIMEOUT)
+    parser.add_argument('--root',
+                        dest='root', help='directory the trials may write their files in (default: the current one)',
+                        required=False)
+    return parser
+
+def parse_address(address):
+    """Returns the (host, port) of a HOST:PORT string, the host being
+    127.0.0.1 if it is empty (0.0.0.0 listens on every interface)"""
+    host, _, port = address.rpartition(':')
+    return host or HOST, int(port)
+
+def get_secret(secret=None):
+    """Returns the shared secret as bytes, from the environment if it is
+    not given, or None if there is none"""
+    if secret is None:
+        secret = os.environ.get(SECRET_ENV)
+    if secret is None:
+        return None
+    return secret.encode() if isinstance(secret, str) else secret
+
+def sign(secret, challenge):
+    """Returns the answer to the challenge of a coordinator"""
+    return hmac.new(secret, challenge.encode(), hashlib.sha256).hexdigest()
+
+def authenticate(f, secret):
+    """Answers the challenge read from the file of a connection to a
+    coordinator"""
+    message = json.loads(f.readline() or 'null')
+    if not isinstance(message, dict) or 'challenge' not in message:
+        raise OSError('the coordinator did not send a challenge')
+    f.write(json.dumps({'auth': sign(secret, message['challenge'])}) + '\n')
+    f.flush()
+
+
+class JobError(RuntimeError):
+    """Raised when a worker fails to run a job"""
+
+
+class Coordinator(object):
+    """Queue of jobs served to the workers connected over TCP"""
+
+    def __init__(self, address=(HOST, PORT), heartbeat_timeout=HEARTBEAT_TIMEOUT, secret=None):
+        """Starts listening for workers
+
+        Parameters
+        ----------
+        address : tuple (default is ('127.0.0.1', 5555))
+            the (host, port) to listen on, port 0 for any free port
+        heartbeat_timeout : float (default is 30.0)
+            seconds of silence after which the jobs of a worker are
+            queued again
+        secret : str (default is None)
+            the secret shared with the workers. If None, it is read from
+            :code:`DISTRIBUTED_SECRET`, or a random one is generated and
+            printed for the workers to set.
+
+        Attributes
+        ----------
+        address : tuple
+            the (host, port) the coordinator listens on
+        """
+        self.heartbeat_timeout = heartbeat_timeout
+        self.secret = get_secret(secret)
+        if self.secret is None:
+            self.secret = secrets.token_hex(16).encode()
+            sys.stderr.write('Workers must set {}={}\n'.format(SECRET_ENV, self.secret.decode()))
+        self.lock = threading.Condition()
+        self.pending = deque()
+        self.jobs = {}
+        self.ids = itertools.count()
+        self.workers = {}
+        self.closed = False
+
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind(address)
+        self.listener.listen()
+        self.address = self.listener.getsockname()[:2]
+        threading.Thread(target=self._accept, daemon=True).start()
+        threading.Thread(target=self._monitor, daemon=True).start()
+
+    def worker_count(self):
+        """Returns the no. of connected workers"""
+        with self.lock:
+            return len(self.workers)
+
+    def _accept(self):
+        """Serves each connecting worker in its own thread"""
+        while True:
+            try:
+                sock, _ = self.listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(sock,), daemon=True).start()
+
+    def _handshake(self, f):
+        """Returns True if the peer of a connection answers a challenge
+        with the shared secret"""
+        challenge = secrets.token_hex(16)
+        f.write(json.dumps({'challenge': challenge}) + '\n')
+        f.flush()
+        message = json.loads(f.readline() or 'null')
+        return (isinstance(message, dict) and isinstance(message.get('auth'), str)
+                and hmac.compare_digest(message['auth'], sign(self.secret, challenge)))
+
+    def _serve(self, sock):
+        """Answers the messages of a worker until it disconnects"""
+        f = sock.makefile('rw')
+        try:
+            sock.settimeout(self.heartbeat_timeout)
+            authenticated = self._handshake(f)
+            sock.settimeout(None)
+        except (OSError, ValueError):
+            authenticated = False
+        if not authenticated:
+            sys.stderr.write('Rejected a connection without the shared secret\n')
+            try:
+                f.close()
+            except OSError:
+                pass
+            sock.close()
+            return
+
+        worker = {'jobs': set(), 'last_seen': time.monotonic(), 'peer': sock.getpeername()}
+        with self.lock:
+            self.workers[sock] = worker
+        try:
+            for line in f:
+                message = json.loads(line)
+                with self.lock:
+                    worker['last_seen'] = time.monotonic()
+                if 'pull' in message:
+                    jobs = self._pull(worker, message['pull'])
+                    f.write(json.dumps({'quit': True} if jobs is None else {'jobs': jobs}) + '\n')
+                    f.flush()
+                    if jobs is None:
+                        break
+                elif 'results' in message:
+                    self._finish(worker, message['results'])
+        except (OSError, ValueError):
+            pass
+        finally:
+            with self.lock:
+                self._requeue(worker)
+                del self.workers[sock]
+            try:
+                f.close()
+            except OSError:
+                pass
+            sock.close()
+
+    def _pull(self, worker, n):
+        """Waits for jobs and assigns up to n of them to worker, or
+        returns None if the coordinator is closed"""
+        with self.lock:
+            while not self.pending and not self.closed:
+                self.lock.wait()
+            if self.closed:
+                return None
+            jobs = []
+            while self.pending and len(jobs) < n:
+                i = self.pending.popleft()
+                worker['jobs'].add(i)
+                jobs.append({'id': i, 'kind': self.jobs[i]['kind'], 'payload': self.jobs[i]['payload']})
+            worker['last_seen'] = time.monotonic()
+            return jobs
+
+    def _finish(self, worker, results):
+        """Records the results of the jobs of worker, ignoring the ones
+        that were queued again in the meantime"""
+        with self.lock:
+            for result in results:
+                i = result['id']
+                if i not in worker['jobs']:
+                    continue
+                worker['jobs'].remove(i)
+                job = self.jobs[i]
+                job['result'] = result.get('result')
+                job['error'] = result.get('error')
+                job['done'] = True
+            self.lock.notify_all()
+
+    def _requeue(self, worker):
+        """Puts the jobs of worker back at the front of the queue (with the
+        lock held)"""
+        if worker['jobs']:
+            self.pending.extendleft(sorted(worker['jobs'], reverse=True))
+            worker['jobs'].clear()
+            self.lock.notify_all()
+
+    def _monitor(self):
+        """Disconnects the workers that hold jobs without heartbeats"""
+        interval = min(1.0, self.heartbeat_timeout / 4)
+        while not self.closed:
+            time.sleep(interval)
+            now = time.monotonic()
+            with self.lock:
+                silent = [sock for sock, worker in self.workers.items()
+                          if worker['jobs'] and now - worker['last_seen'] > self.heartbeat_timeout]
+                for sock in silent:
+                    worker = self.workers[sock]
+                    sys.stderr.write('Worker {}:{} missed its heartbeats, queuing its {} jobs again\n'.format(
+                        worker['peer'][0], worker['peer'][1], len(worker['jobs'])))
+                    self._requeue(worker)
+            for sock in silent:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+    def map(self, kind, payloads):
+        """Runs one job per payload on the workers
+
+        Parameters
+        ----------
+        kind : str
+            :code:`'evaluate'` or :code:`'trial'`
+        payloads : list
+            the JSON payload of each job
+
+        Returns
+        -------
+        list
+            the result of each job, in the same order
+
+        Raises
+        ------
+        JobError
+            if a job failed or the coordinator was closed
+        """
+        with self.lock:
+            ids = []
+            for payload in payloads:
+                i = next(self.ids)
+                self.jobs[i] = {'kind': kind, 'payload': payload, 'done': False}
+                self.pending.append(i)
+                ids.append(i)
+            self.lock.notify_all()
+            while not self.closed and not all(self.jobs[i]['done'] for i in ids):
+                self.lock.wait()
+            jobs = [self.jobs.pop(i) for i in ids]
+
+        if not all(job['done'] for job in jobs):
+            raise JobError('coordinator closed')
+        for job in jobs:
+            if job['error'] is not None:
+                raise JobError(job['error'])
+        return [job['result'] for job in jobs]
+
+    def close(self):
+        """Stops listening and tells the workers to quit"""
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.lock.notify_all()
+        self.listener.close()
+
+
+class RemoteEvaluationPool(object):
+    """Evaluates samples on remote workers, like :code:`EvaluationPool`"""
+
+    def __init__(self, coordinator, args, chunksize=None):
+        """Initializes the pool
+
+        Parameters
+        ----------
+        coordinator : Coordinator
+            the coordinator the workers connect to
+        args : tuple
+            arguments of the :code:`agent.SeededEvaluator` of the workers
+        chunksize : int (default is None)
+            number of samples per job. If None, each connected worker
+            gets about four jobs per call to :code:`evaluate`.
+        """
+        self.coordinator = coordinator
+        self.args = list(args)
+        self.chunksize = chunksize
+
+    def evaluate(self, noisy_params, seeds, states=None):
+        """Evaluates the samples on the workers
+
+        Each sample is evaluated with its own seed, so the rewards do not
+        depend on which worker evaluates it or on the number of workers.
+
+        Returns
+        -------
+        list
+            the reward of each sample, in the same order
+        """
+        workers = max(1, self.coordinator.worker_count())
+        chunksize = self.chunksize or max(1, len(noisy_params) // (4 * workers))
+        params = [list(w) for w in noisy_params]
+        payloads = [{'evaluator': self.args, 'params': params[i:i + chunksize],
+                     'seeds': seeds[i:i + chunksize], 'states': states}
+                    for i in range(0, len(params), chunksize)]
+        return [r for rewards in self.coordinator.map('evaluate', payloads) for r in rewards]
+
+    def close(self):
+        """Stops the coordinator"""
+        self.coordinator.close()
+
+
+class RemoteAgent(object):
+    """Runs sweep trials on remote workers, like :code:`multiagent.AgentServer`"""
+
+    def __init__(self, coordinator):
+        self.coordinator = coordinator
+
+    def run(self, args):
+        """Runs the agent with args on a worker and returns its results
+
+        Returns
+        -------
+        dict
+            the :code:`win_ratios`, :code:`successful_episodes` and
+            :code:`seconds` of the run
+        """
+        return self.coordinator.map('trial', [args])[0]
+
+    def close(self):
+        """Stops the coordinator"""
+        self.coordinator.close()
+
+
+class Worker(object):
+    """Runs the jobs of a coordinator in its own environments
+
+    Trials seed and draw from the global :code:`random` module, so
+    workers must not share a process: run each one in its own, like
+    :code:`main` does with :code:`-j`. Trials cannot choose the host
+    program, and only write their files under :code:`root`.
+    """
+
+    def __init__(self, address, batch=BATCH, heartbeat=HEARTBEAT, timeout=CONNECT_TIMEOUT,
+                 secret=None, root=None):
+        """Connects to the coordinator
+
+        Parameters
+        ----------
+        address : tuple
+            the (host, port) of the coordinator
+        batch : int (default is 1)
+            no. of jobs pulled at once
+        heartbeat : float (default is 5.0)
+            seconds between two heartbeats while running jobs
+        timeout : float (default is 30.0)
+            seconds to wait for the coordinator to listen
+        secret : str (default is None)
+            the secret shared with the coordinator. If None, it is read
+            from :code:`DISTRIBUTED_SECRET`.
+        root : str (default is None)
+            the directory trials may write their files in. If None, the
+            current directory.
+        """
+        secret = get_secret(secret)
+        if secret is None:
+            raise ValueError('{} must be set to the secret of the coordinator'.format(SECRET_ENV))
+        # agent.py imports this module to start coordinators
+        import agent
+        self.agent = agent
+        self.parser = agent.build_parser()
+        self.envs = {}
+        self.evaluators = {}
+        self.batch = batch
+        self.heartbeat = heartbeat
+        self.root = os.path.realpath(root or os.getcwd())
+        self.lock = threading.Lock()
+
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                self.sock = socket.create_connection(address)
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.1)
+        self.f = self.sock.makefile('rw')
+        try:
+            authenticate(self.f, secret)
+        except (OSError, ValueError):
+            self.close()
+            raise
+
+    def send(self, message):
+        """Writes a message to the coordinator"""
+        with self.lock:
+            self.f.write(json.dumps(message) + '\n')
+            self.f.flush()
+
+    def _heartbeat(self, stop):
+        """Sends heartbeats until stop is set"""
+        while not stop.wait(self.heartbeat):
+            try:
+                self.send({'heartbeat': True})
+            except OSError:
+                return
+
+    def run(self):
+        """Runs jobs until the coordinator quits or disconnects
+
+        Returns
+        -------
+        int
+            no. of jobs run
+        """
+        count = 0
+        try:
+            while True:
+                self.send({'pull': self.batch})
+                line = self.f.readline()
+                if not line:
+                    break
+                message = json.loads(line)
+                if message.get('quit'):
+                    break
+
+                stop = threading.Event()
+                beat = threading.Thread(target=self._heartbeat, args=(stop,), daemon=True)
+                beat.start()
+                try:
+                    results = [self.execute(job) for job in message['jobs']]
+                finally:
+                    stop.set()
+                    beat.join()
+                self.send({'results': results})
+                count += len(results)
+        except OSError:
+            pass
+        finally:
+            self.close()
+        return count
+
+    def execute(self, job):
+        """Runs a job and returns its result message"""
+        try:
+            if job['kind'] == 'evaluate':
+                return {'id': job['id'], 'result': self.evaluate(**job['payload'])}
+            if job['kind'] == 'trial':
+                return {'id': job['id'], 'result': self.trial(job['payload'])}
+            raise ValueError('unknown job kind {}'.format(job['kind']))
+        except SystemExit:
+            return {'id': job['id'], 'error': 'invalid arguments: {}'.format(' '.join(job['payload']))}
+        except Exception as e:
+            return {'id': job['id'], 'error': '{}: {}'.format(type(e).__name__, e)}
+
+    def evaluate(self, evaluator, params, seeds, states=None):
+        """Returns the reward of each parameter vector with its seed"""
+        if evaluator[0] != 'sim':
+            raise ValueError('only --env sim samples can be evaluated')
+        key = tuple(evaluator)
+        if key not in self.evaluators:
+            self.evaluators[key] = self.agent.SeededEvaluator(*evaluator)
+        evaluate = self.evaluators[key]
+        return [evaluate(w, seed, states) for w, seed in zip(params, seeds)]
+
+    def trial(self, args):
+        """Runs the agent with args, keeping the environments between
+        trials like :code:`agent.serve`"""
+        options = self.agent.parse_options(self.parser, args)
+        if options.serve or options.listen:
+            raise ValueError('--serve and --listen cannot be requested')
+        if options.host_program != self.parser.get_default('host_program'):
+            raise ValueError('--host-program cannot be requested')
+        for name in PATH_OPTIONS:
+            path = getattr(options, name)
+            if path and os.path.commonpath([self.root, os.path.realpath(path)]) != self.root:
+                raise ValueError('{} is outside of {}'.format(path, self.root))
+        for path in (options.output_file, options.metrics_file, options.checkpoint):
+            if path and os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        start = time.perf_counter()
+        win_ratios, successful_episodes = self.agent.run(options, self.envs)
+        return {'win_ratios': win_ratios,
+                'successful_episodes': successful_episodes,
+                'seconds': time.perf_counter() - start}
+
+    def close(self):
+        """Disconnects and terminates the environments"""
+        try:
+            self.f.close()
+        except OSError:
+            pass
+        self.sock.close()
+        for env, batch_env in self.envs.values():
+            env.terminate()
+        self.envs = {}
+
+def run_worker(address, batch=BATCH, heartbeat=HEARTBEAT, timeout=CONNECT_TIMEOUT,
+               secret=None, root=None):
+    """Runs a worker until its coordinator quits and returns its no. of jobs"""
+    return Worker(address, batch, heartbeat, timeout, secret, root).run()
+
+def main():
+    # Build parser
+    parser = build_parser()
+    options = parser.parse_args()
+    address = parse_address(options.address)
+    if get_secret() is None:
+        parser.error('{} must be set to the secret of the coordinator'.format(SECRET_ENV))
+    args = (address, options.batch, options.heartbeat, options.timeout, None, options.root)
+
+    if options.jobs == 1:
+        run_worker(*args)
+        return
+    processes = [multiprocessing.Process(target=run_worker, args=args) for i in range(options.jobs)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,39 @@
 # -*- coding: utf-8 -*-
 
-"""Contains all environment classes EasyEnv and CartPoleEnv"""
+"""Contains all environment classes EasyEnv, BatchEasyEnv, CartPoleEnv,
+BatchedCartPoleEnv, CartPoleSimEnv and BatchCartPoleSimEnv"""
 
 import sys
+import math
 import random
+import struct
 import subprocess
+from array import array
+from operator import add, mul, gt
+from itertools import repeat, starmap
+
+# Physical constants of the host program (see cartpole.cc)
+GRAVITY = 9.8
+MASSCART = 1.0
+MASSPOLE = 0.1
+TOTAL_MASS = (MASSPOLE + MASSCART)
+LENGTH = 0.5
+POLEMASS_LENGTH = (MASSPOLE * LENGTH)
+FORCE_MAG = 10.0
+TAU = 0.02
+THETA_THRESHOLD_RADIANS = 12 * 2 * math.pi / 360
+X_THRESHOLD = 2.4
+
+# Half-widths of the reset distribution of x, x_dot, theta, theta_dot
+RESET_SCALES = (1.20, 0.15, 0.15, 0.15)
 
 
 class EasyEnv(object):
     """An environment where training the agent is very easy"""
 
+    # Bounds of the reward of one step
+    reward_range = (-1, 1)
+
     def __init__(self):
         """Initializes the environment
 
@@ -91,19 +115,294 @@ class EasyEnv(object):
 
         return (self.prev_obs, reward, done)
 
+    def observation_buffer(self):
+        """Returns a buffer for :code:`reset_into` and :code:`step_into`
+
+        A list, as the model reads its floats without boxing them again.
+        """
+        return [0.0]
+
+    def reset_into(self, buf):
+        """Resets the environment, writing the observation into a buffer
+
+        Like :code:`reset`, but the observation is written into
+        :code:`buf`, which then holds the observation of every
+        :code:`step_into` of the episode.
+
+        Parameters
+        ----------
+        buf : list, array or memoryview
+            a pre-allocated buffer of :code:`obs_dim()` floats
+        """
+        buf[0] = random.uniform(-1, 1)
+        self.prev_obs = buf
+        self.step_counter = 0
+        self.done = False
+
+    def step_into(self, action, buf):
+        """Applies an action, overwriting the observation in a buffer
+
+        Like :code:`step`, without building the observation list nor the
+        returned tuple: the stop signal is kept in :code:`done`.
+
+        Parameters
+        ----------
+        action : int
+            the action to be taken. Either -1 or 1.
+        buf : list, array or memoryview
+            the buffer given to :code:`reset_into`
+
+        Returns
+        -------
+        float
+            reward signal
+
+        Raises
+        ------
+        AssertionError
+            if input is not -1 or 1.
+        """
+        assert action in [-1, 1], 'Invalid input. Must be -1 or 1'
+
+        reward = action * self.prev_obs[0]
+        self.step_counter += 1
+
+        # Obtain next observation
+        buf[0] = random.uniform(-1, 1)
+        self.prev_obs = buf
+
+        # Check if episode is done
+        self.done = self.step_counter > 9
+
+        return reward
+
+    def terminate(self):
+        """Does nothing, there is no host program to terminate"""
+        pass
+
+class BatchEasyEnv(object):
+    """Runs N episodes of :code:`EasyEnv` at once
+
+    The 11 observations of every episode are drawn together at reset,
+    episode by episode, so the observations and rewards are the same as
+    the ones of N consecutive full-length episodes of :code:`EasyEnv`
+    (an episode of :code:`EasyEnv` cut short draws fewer observations,
+    so the next ones differ). Every episode ends after the same 10
+    steps. The observations of a step are returned as 1-tuples built
+    from one column of the block, without a list per episode.
+    """
+
+    # Bounds of the reward of one step
+    reward_range = (-1, 1)
+    # No. of steps of an episode
+    EPISODE_STEPS = 10
+
+    def __init__(self, n, seed=None):
+        """Initializes the environment
+
+        Parameters
+        ----------
+        n : int
+            number of episodes to run in parallel
+        seed : int (default is None)
+            seed of the environment's own random number generator. If
+            None, the global :code:`random` module is used.
+
+        Attributes
+        ----------
+        observations : array
+            the observations of each episode, episode by episode
+        total_rewards : array
+            the cumulative reward of each episode
+        """
+        self.n = n
+        self.observations = array('d')
+        self.total_rewards = array('d', bytes(8 * n))
+        self.step_counter = 0
+        self.seed(seed)
+
+    def seed(self, seed=None):
+        """Seeds the random number generator used by :code:`reset`
+
+        Parameters
+        ----------
+        seed : int (default is None)
+            the seed. If None, the global :code:`random` module is used.
+        """
+        self.rng = random if seed is None else random.Random(seed)
+
+    def _column(self, t):
+        """Returns the t-th observation of every episode"""
+        return self.observations[t::self.EPISODE_STEPS + 1]
+
+    def _draw(self):
+        """Draws the observations of all episodes
+
+        :code:`random.uniform(-1, 1)` is :code:`-1 + 2 * random()`, so the
+        block is built by mapping over :code:`random()` called once per
+        value, without a Python-level loop, and holds the values
+        :code:`EasyEnv` would draw.
+        """
+        size = self.n * (self.EPISODE_STEPS + 1)
+        self.observations = array('d', map(add, repeat(-1, size),
+                                           map(mul, repeat(2, size),
+                                               starmap(self.rng.random, repeat((), size)))))
+        self.step_counter = 0
+
+    def reset(self):
+        """Draws the observations of all episodes and returns the first one
+
+        Returns
+        -------
+        list of tuples
+            an N x 1 matrix of initial observations
+        """
+        self._draw()
+        self.total_rewards = array('d', bytes(8 * self.n))
+
+        return list(zip(self._column(0)))
+
+    def obs_dim(self):
+        """Returns the number of dimensions of the observation vector
+
+        Returns
+        -------
+        int
+            always returns 1
+        """
+        return 1
+
+    def all_done(self):
+        """Returns True if the episodes are done"""
+        return self.step_counter >= self.EPISODE_STEPS
+
+    def step(self, actions):
+        """Applies one action to each episode
+
+        Parameters
+        ----------
+        actions : list
+            the action of each episode, either -1 or 1
+
+        Returns
+        -------
+        list of tuples
+            the new observation of each episode
+        list
+            reward signal of each episode, :code:`action * prev_obs`
+        list
+            stop signal of each episode
+        """
+        assert not self.all_done(), 'The episodes are done, call reset'
+        assert set(actions) <= {-1, 1}, 'Invalid input. Must be -1 or 1'
+
+        rewards = list(map(mul, actions, self._column(self.step_counter)))
+        self.total_rewards = array('d', map(add, self.total_rewards, rewards))
+        self.step_counter += 1
+
+        done = self.all_done()
+        return (list(zip(self._column(self.step_counter))), rewards, [done] * self.n)
+
+    def terminate(self):
+        """Does nothing, there is no host program to terminate"""
+        pass
+
+# Binary frame of the host program: four little-endian doubles and a
+# status byte (1 if the episode is done, 0 otherwise)
+FRAME = struct.Struct('<4dB')
+TRANSPORTS = ('text', 'binary')
+
+def negotiate_transport(transport):
+    """Switches the host program to the given transport
+
+    Parameters
+    ----------
+    transport : str
+        either :code:`'text'` or :code:`'binary'`
+
+    Raises
+    ------
+    RuntimeError
+        if the host program does not support the binary transport
+    """
+    mode = TRANSPORTS.index(transport)
+    print('m {}'.format(mode))
+    sys.stdout.flush()
+    try:
+        feedback = input().split()
+    except EOFError:
+        feedback = []
+    if feedback != ['mode', str(mode)]:
+        raise RuntimeError('Host program does not support the {} transport'.format(transport))
+
+def read_frames(buf):
+    """Fills a pre-allocated buffer with binary frames from the host program
+
+    Parameters
+    ----------
+    buf : bytearray
+        the buffer to fill, its size being a multiple of
+        :code:`FRAME.size`
+    """
+    view = memoryview(buf)
+    readinto = sys.stdin.buffer.readinto
+    n = 0
+    while n < len(buf):
+        count = readinto(view[n:])
+        if not count:
+            raise EOFError('Host program closed the pipe')
+        n += count
+
 class CartPoleEnv(object):
     """Environment that interacts with the host program"""
 
-    def __init__(self):
+    # Bounds of the reward of one step
+    reward_range = (1, 1)
+
+    def __init__(self, transport='text'):
         """Initializes the environment
 
+        Parameters
+        ----------
+        transport : str (default is 'text')
+            :code:`'text'` to parse the observation lines of the host
+            program, :code:`'binary'` to read bit-exact binary frames
+
         Attributes
         ----------
         prev_obs : list
             the previous observation or current state before action is
             applied
         """
+        assert transport in TRANSPORTS, 'Invalid transport. Must be one of {}'.format(TRANSPORTS)
         self.prev_obs = None
+        self.transport = transport
+        self.negotiated = transport == 'text'
+        self.frame = bytearray(FRAME.size)
+        # The doubles of a frame, copied as they are on little-endian machines
+        self.values = memoryview(self.frame)[:FRAME.size - 1].cast('d') if sys.byteorder == 'little' else None
+        self.buf = self.view = None
+
+    def _feedback(self):
+        """Reads the reply of the host program
+
+        Returns
+        -------
+        list
+            the new observation, empty if the episode is done
+        bool
+            True if the episode is done
+        """
+        if self.transport == 'binary':
+            read_frames(self.frame)
+            x, x_dot, theta, theta_dot, status = FRAME.unpack_from(self.frame)
+            if status:
+                return [], True
+            return [x, x_dot, theta, theta_dot], False
+
+        feedback = input()
+        feedback = feedback.split()
+        return [float(i) for i in feedback[1:]], feedback[0] == 'done'
 
     def reset(self):
         """A method that resets the environment.
@@ -118,12 +417,14 @@ class CartPoleEnv(object):
         list
             4-dimensional vector sampled uniformly in the interval [-1,1]
         """
+        if not self.negotiated:
+            negotiate_transport(self.transport)
+            self.negotiated = True
+
         # Flush reset to stdout
         print('r')
         sys.stdout.flush()
-        feedback = input()
-        feedback = feedback.split()
-        self.prev_obs = [float(i) for i in feedback[1:]]
+        self.prev_obs, _ = self._feedback()
 
         return self.prev_obs
 
@@ -171,16 +472,662 @@ class CartPoleEnv(object):
         # Obtain next observation
         print('s {}'.format(action))
         sys.stdout.flush()
-        feedback = input()
-        feedback = feedback.split()
-        self.prev_obs = [float(i) for i in feedback[1:]]
-
-        # Check if episode is done
-        done = True if (feedback[0]=='done') else False
+        self.prev_obs, done = self._feedback()
 
         return (self.prev_obs, reward, done)
 
+    def _feedback_into(self, buf):
+        """Reads the reply of the host program into a buffer, left
+        unchanged if the episode is done
+
+        Returns
+        -------
+        bool
+            True if the episode is done
+        """
+        if self.transport == 'binary':
+            read_frames(self.frame)
+            if self.frame[-1]:
+                return True
+            if self.buf is not buf:
+                self.buf = buf
+                self.view = (memoryview(buf) if self.values is not None
+                             and isinstance(buf, (array, memoryview)) else None)
+            if self.view is None:
+                buf[0], buf[1], buf[2], buf[3], _ = FRAME.unpack_from(self.frame)
+            else:
+                self.view[:] = self.values
+            return False
+
+        feedback = input().split()
+        if feedback[0] == 'done':
+            return True
+        buf[0], buf[1], buf[2], buf[3] = map(float, feedback[1:])
+        return False
+
+    def observation_buffer(self):
+        """Returns a buffer for :code:`reset_into` and :code:`step_into`
+
+        An array (:code:`'d'`), into which the binary frames are copied
+        without unpacking them.
+        """
+        return array('d', bytes(8 * 4))
+
+    def reset_into(self, buf):
+        """Resets the environment, writing the observation into a buffer
+
+        Parameters
+        ----------
+        buf : list, array or memoryview
+            a pre-allocated buffer of 4 floats
+        """
+        if not self.negotiated:
+            negotiate_transport(self.transport)
+            self.negotiated = True
+
+        # Flush reset to stdout
+        print('r')
+        sys.stdout.flush()
+        self.prev_obs = buf
+        self.done = self._feedback_into(buf)
+
+    def step_into(self, action, buf):
+        """Applies an action, overwriting the observation in a buffer
+
+        Like :code:`step`, the stop signal being kept in :code:`done`.
+        With the binary transport, the frame is copied into an array
+        (:code:`'d'`) buffer without unpacking it. Once the episode is
+        done, the buffer is left unchanged.
+
+        Parameters
+        ----------
+        action : int
+            the action to be taken. Either -1 or 1.
+        buf : list, array or memoryview
+            the buffer given to :code:`reset_into`
+
+        Returns
+        -------
+        int
+            reward signal, always 1
+
+        Raises
+        ------
+        AssertionError
+            if input is not -1 or 1.
+        """
+        assert action in [-1,1], 'Invalid input. Must be -1 or 1'
+
+        # Obtain next observation
+        print('s {}'.format(action))
+        sys.stdout.flush()
+        self.done = self._feedback_into(buf)
+
+        return 1
+
+    def terminate(self):
+        """Terminates the host program"""
+        print('q')
+        sys.stdout.flush()
+
+class BatchedCartPoleEnv(object):
+    """Environment that runs K carts of the host program at once
+
+    All the carts are reset and stepped with a single command of the
+    batch protocol of :code:`cartpole.out`, so one round trip through
+    the pipe serves K episodes. The single-cart protocol of
+    :code:`CartPoleEnv` keeps working alongside it.
+    """
+
+    def __init__(self, k, transport='text'):
+        """Initializes the environment
+
+        Parameters
+        ----------
+        k : int
+            number of carts (episodes) to run in parallel
+        transport : str (default is 'text')
+            :code:`'text'` to parse the observation lines of the host
+            program, :code:`'binary'` to read bit-exact binary frames
+
+        Attributes
+        ----------
+        done : list
+            True if the episode of the cart is done and False otherwise
+        total_rewards : list
+            the cumulative reward of each episode
+        """
+        assert transport in TRANSPORTS, 'Invalid transport. Must be one of {}'.format(TRANSPORTS)
+        self.n = k
+        self.transport = transport
+        self.negotiated = False
+        self.frames = bytearray(FRAME.size * k)
+        self.done = [True] * k
+        self.total_rewards = [0] * k
+        self.live = []
+
+    def _command(self, command):
+        """Sends a command to the host program and returns the reply"""
+        print(command)
+        sys.stdout.flush()
+        try:
+            return input().split()
+        except EOFError:
+            raise RuntimeError('Host program closed the pipe after {!r}, '
+                               'does it support the batch protocol?'.format(command))
+
+    def _observe(self, command):
+        """Sends a command to the host program and parses the observation
+        and done flag of each cart"""
+        if self.transport == 'binary':
+            print(command)
+            sys.stdout.flush()
+            read_frames(self.frames)
+            obs = []
+            for i, (x, x_dot, theta, theta_dot, status) in enumerate(FRAME.iter_unpack(self.frames)):
+                self.done[i] = status == 1
+                obs.append([] if status else [x, x_dot, theta, theta_dot])
+            return obs
+
+        feedback = self._command(command)
+        assert feedback[0] == 'obs', 'Invalid reply: {}'.format(' '.join(feedback))
+        obs = []
+        j = 1
+        for i in range(self.n):
+            self.done[i] = feedback[j] == '1'
+            if self.done[i]:
+                obs.append([])
+                j += 1
+            else:
+                obs.append([float(v) for v in feedback[j+1:j+5]])
+                j += 5
+        assert j == len(feedback), 'Invalid reply: {}'.format(' '.join(feedback))
+        return obs
+
+    def negotiate(self):
+        """Switches the host program to the batch protocol with K carts
+
+        Raises
+        ------
+        RuntimeError
+            if the host program does not support the batch protocol
+        """
+        if self.transport != 'text':
+            negotiate_transport(self.transport)
+        feedback = self._command('b {}'.format(self.n))
+        if feedback != ['batch', str(self.n)]:
+            raise RuntimeError('Host program does not support the batch protocol: {}'.format(' '.join(feedback)))
+        self.negotiated = True
+
+    def reset(self):
+        """Resets all the carts
+
+        Returns
+        -------
+        list of lists
+            a K x 4 matrix of initial observations
+        """
+        if not self.negotiated:
+            self.negotiate()
+
+        obs = self._observe('R')
+        self.total_rewards = [0] * self.n
+        self.live = list(range(self.n))
+
+        return obs
+
+    def obs_dim(self):
+        """Returns the number of dimensions of the observation vector
+
+        Returns
+        -------
+        int
+            the number of dimensions in  the observation vector
+        """
+        return 4
+
+    def all_done(self):
+        """Returns True if the episodes of all carts are done"""
+        return not self.live
+
+    def step(self, actions):
+        """Applies one action to each cart whose episode is not done
+
+        Parameters
+        ----------
+        actions : list
+            the action of each cart, either -1 or 1. The actions of
+            carts whose episode is already done are ignored.
+
+        Returns
+        -------
+        list of lists
+            the new observation of each cart, empty if its episode is
+            done
+        list
+            reward signal of each cart, 1 if the cart was stepped and 0
+            otherwise
+        list
+            stop signal of each cart
+        """
+        rewards = [0] * self.n
+        command = ['S'] + ['0'] * self.n
+        for i in self.live:
+            assert actions[i] in (-1, 1), 'Invalid input. Must be -1 or 1'
+            command[i + 1] = '1' if actions[i] == 1 else '-1'
+            rewards[i] = 1
+            self.total_rewards[i] += 1
+
+        obs = self._observe(' '.join(command))
+        self.live = [i for i in self.live if not self.done[i]]
+
+        return (obs, rewards, list(self.done))
+
     def terminate(self):
         """Terminates the host program"""
         print('q')
-        sys.stdout.flush()
\ No newline at end of file
+        sys.stdout.flush()
+
+def sample_start_state(rng=random):
+    """Draws an initial state from the reset distribution of the host program
+
+    Each component is drawn like :code:`rand() % 1000` in the host
+    program, i.e. from 1000 evenly-spaced values of its interval.
+
+    Parameters
+    ----------
+    rng : random.Random (default is the random module)
+        the random number generator
+
+    Returns
+    -------
+    list
+        the initial :code:`[x, x_dot, theta, theta_dot]`
+    """
+    randrange = rng.randrange
+    return [(randrange(1000) / 1000.0 - 0.5) * 2.0 * scale
+            for scale in RESET_SCALES]
+
+class CartPoleSimEnv(object):
+    """In-process simulator that reproduces the host program
+
+    The dynamics, termination thresholds and reset distribution are the
+    same as :code:`step()`, :code:`done()` and :code:`reset()` in
+    :code:`cartpole.cc`, so this class can be used in place of
+    :code:`CartPoleEnv` without running :code:`cartpole.out`.
+    """
+
+    # Bounds of the reward of one step
+    reward_range = (1, 1)
+
+    def __init__(self, seed=None):
+        """Initializes the environment
+
+        Parameters
+        ----------
+        seed : int (default is None)
+            seed of the environment's own random number generator. If
+            None, the global :code:`random` module is used.
+
+        Attributes
+        ----------
+        prev_obs : list
+            the previous observation or current state before action is
+            applied
+        """
+        self.prev_obs = None
+        self.state = None
+        self.seed(seed)
+
+    def seed(self, seed=None):
+        """Seeds the random number generator used by :code:`reset`
+
+        Parameters
+        ----------
+        seed : int (default is None)
+            the seed. If None, the global :code:`random` module is used.
+        """
+        self.rng = random if seed is None else random.Random(seed)
+
+    def reset(self, state=None):
+        """A method that resets the environment.
+
+        Parameters
+        ----------
+        state : list (default is None)
+            the initial :code:`[x, x_dot, theta, theta_dot]`. If None, it
+            is sampled from the reset distribution of the host program.
+
+        Returns
+        -------
+        list
+            4-dimensional vector of the initial state
+        """
+        if state is None:
+            state = sample_start_state(self.rng)
+        self.state = list(state)
+        self.prev_obs = list(self.state)
+
+        return self.prev_obs
+
+    def obs_dim(self):
+        """Returns the number of dimensions of the observation vector
+
+        Returns
+        -------
+        int
+            the number of dimensions in  the observation vector
+        """
+        return 4
+
+    def step(self, action):
+        """Applies an action to the environment
+
+        Like the host program, no observation is returned once the
+        episode is done, and the reward is always 1.
+
+        Parameters
+        ----------
+        action : int
+            the action to be taken. Either -1 or 1.
+
+        Returns
+        -------
+        list
+            the new observation, empty if the episode is done
+        float
+            reward signal, always 1
+        bool
+            stop signal
+
+        Raises
+        ------
+        AssertionError
+            if input is not -1 or 1.
+        """
+        assert action in [-1,1], 'Invalid input. Must be -1 or 1'
+
+        x, x_dot, theta, theta_dot = self.state
+        reward = 1
+
+        force = FORCE_MAG * action
+        costheta = math.cos(theta)
+        sintheta = math.sin(theta)
+        temp = (force + POLEMASS_LENGTH * theta_dot * theta_dot * sintheta) / TOTAL_MASS
+        thetaacc = (GRAVITY * sintheta - costheta * temp) / (LENGTH * (4.0/3.0 - MASSPOLE * costheta * costheta / TOTAL_MASS))
+        xacc = temp - POLEMASS_LENGTH * thetaacc * costheta / TOTAL_MASS
+
+        x = x + TAU * x_dot
+        x_dot = x_dot + TAU * xacc
+        theta = theta + TAU * theta_dot
+        theta_dot = theta_dot + TAU * thetaacc
+        self.state = [x, x_dot, theta, theta_dot]
+
+        # Check if episode is done
+        done = (x < -X_THRESHOLD or x > X_THRESHOLD
+                or theta < -THETA_THRESHOLD_RADIANS
+                or theta > THETA_THRESHOLD_RADIANS)
+        self.prev_obs = [] if done else list(self.state)
+
+        return (self.prev_obs, reward, done)
+
+    def observation_buffer(self):
+        """Returns a buffer for :code:`reset_into` and :code:`step_into`
+
+        A list, as the model reads its floats without boxing them again.
+        """
+        return [0.0] * 4
+
+    def reset_into(self, buf, state=None):
+        """Resets the environment, writing the observation into a buffer
+
+        Parameters
+        ----------
+        buf : list, array or memoryview
+            a pre-allocated buffer of 4 floats
+        state : list (default is None)
+            the initial :code:`[x, x_dot, theta, theta_dot]`. If None, it
+            is sampled from the reset distribution of the host program.
+        """
+        if state is None:
+            state = sample_start_state(self.rng)
+        self.state = list(state)
+        buf[0], buf[1], buf[2], buf[3] = self.state
+        self.prev_obs = buf
+        self.done = False
+
+    def step_into(self, action, buf):
+        """Applies an action, overwriting the observation in a buffer
+
+        The dynamics are the ones of :code:`step`, but the state is
+        updated in place and no list or tuple is built: the stop signal
+        is kept in :code:`done`. Once the episode is done, the buffer is
+        left unchanged.
+
+        Parameters
+        ----------
+        action : int
+            the action to be taken. Either -1 or 1.
+        buf : list, array or memoryview
+            the buffer given to :code:`reset_into`
+
+        Returns
+        -------
+        int
+            reward signal, always 1
+
+        Raises
+        ------
+        AssertionError
+            if input is not -1 or 1.
+        """
+        assert action in [-1,1], 'Invalid input. Must be -1 or 1'
+
+        state = self.state
+        x, x_dot, theta, theta_dot = state
+
+        force = FORCE_MAG * action
+        costheta = math.cos(theta)
+        sintheta = math.sin(theta)
+        temp = (force + POLEMASS_LENGTH * theta_dot * theta_dot * sintheta) / TOTAL_MASS
+        thetaacc = (GRAVITY * sintheta - costheta * temp) / (LENGTH * (4.0/3.0 - MASSPOLE * costheta * costheta / TOTAL_MASS))
+        xacc = temp - POLEMASS_LENGTH * thetaacc * costheta / TOTAL_MASS
+
+        x = state[0] = x + TAU * x_dot
+        state[1] = x_dot + TAU * xacc
+        theta = state[2] = theta + TAU * theta_dot
+        state[3] = theta_dot + TAU * thetaacc
+
+        # Check if episode is done
+        done = self.done = (x < -X_THRESHOLD or x > X_THRESHOLD
+                            or theta < -THETA_THRESHOLD_RADIANS
+                            or theta > THETA_THRESHOLD_RADIANS)
+        if not done:
+            buf[0], buf[1], buf[2], buf[3] = state
+
+        return 1
+
+    def terminate(self):
+        """Does nothing, there is no host program to terminate"""
+        pass
+
+class BatchCartPoleSimEnv(object):
+    """Steps N independent carts of :code:`CartPoleSimEnv` at once
+
+    The state of the carts is held in contiguous arrays, one per
+    component, and each call to :code:`step` applies the update
+    equations of :code:`cartpole.cc` to all the episodes that are not
+    done yet. This is a batched loop over the carts, not a vectorized
+    step: it saves the calls and allocations of N separate
+    environments, but each cart is still updated by Python code.
+    """
+
+    def __init__(self, n, seed=None):
+        """Initializes the environment
+
+        Parameters
+        ----------
+        n : int
+            number of carts (episodes) to run in parallel
+        seed : int (default is None)
+            seed of the environment's own random number generator. If
+            None, the global :code:`random` module is used.
+
+        Attributes
+        ----------
+        x, x_dot, theta, theta_dot : array
+            the state of each cart
+        done : array
+            1 if the episode of the cart is done and 0 otherwise
+        total_rewards : array
+            the cumulative reward of each episode
+        """
+        self.n = n
+        self.x = array('d', bytes(8 * n))
+        self.x_dot = array('d', bytes(8 * n))
+        self.theta = array('d', bytes(8 * n))
+        self.theta_dot = array('d', bytes(8 * n))
+        self.done = array('b', bytes(n))
+        self.total_rewards = array('l', bytes(array('l').itemsize * n))
+        self.live = []
+        # Buffers returned by step, overwritten at each step
+        self.obs = [[] for i in range(n)]
+        self.rewards = [0] * n
+        self.dones = [False] * n
+        self.finished = []
+        self.seed(seed)
+
+    def seed(self, seed=None):
+        """Seeds the random number generator used by :code:`reset`
+
+        Parameters
+        ----------
+        seed : int (default is None)
+            the seed. If None, the global :code:`random` module is used.
+        """
+        self.rng = random if seed is None else random.Random(seed)
+
+    def reset(self, states=None):
+        """Resets all the carts
+
+        The initial states are drawn cart by cart, in the same order as
+        N consecutive calls to :code:`CartPoleSimEnv.reset`.
+
+        Parameters
+        ----------
+        states : list of lists (default is None)
+            the initial :code:`[x, x_dot, theta, theta_dot]` of each
+            cart. If None, they are sampled from the reset distribution
+            of the host program.
+
+        Returns
+        -------
+        list of lists
+            an N x 4 matrix of initial observations
+        """
+        if states is None:
+            states = [sample_start_state(self.rng) for i in range(self.n)]
+        assert len(states) == self.n, 'Expected {} states, got {}'.format(self.n, len(states))
+
+        for i, (x, x_dot, theta, theta_dot) in enumerate(states):
+            self.x[i] = x
+            self.x_dot[i] = x_dot
+            self.theta[i] = theta
+            self.theta_dot[i] = theta_dot
+            self.done[i] = 0
+            self.total_rewards[i] = 0
+        self.live = list(range(self.n))
+        self.obs = [list(state) for state in states]
+        self.rewards = [0] * self.n
+        self.dones = [False] * self.n
+        self.finished = []
+
+        return self.obs
+
+    def obs_dim(self):
+        """Returns the number of dimensions of the observation vector
+
+        Returns
+        -------
+        int
+            the number of dimensions in  the observation vector
+        """
+        return 4
+
+    def all_done(self):
+        """Returns True if the episodes of all carts are done"""
+        return not self.live
+
+    def step(self, actions):
+        """Applies one action to each cart whose episode is not done
+
+        Parameters
+        ----------
+        actions : list
+            the action of each cart, either -1 or 1. The actions of
+            carts whose episode is already done are ignored.
+
+        Returns
+        -------
+        list of lists
+            the new observation of each cart, empty if its episode is
+            done. The list and the observations are overwritten by the
+            next step.
+        list
+            reward signal of each cart, 1 if the cart was stepped and 0
+            otherwise
+        list
+            stop signal of each cart
+        """
+        assert set(actions) <= {-1, 1}, 'Invalid input. Must be -1 or 1'
+        x, x_dot, theta, theta_dot = self.x, self.x_dot, self.theta, self.theta_dot
+        done, total_rewards = self.done, self.total_rewards
+        obs, rewards, dones = self.obs, self.rewards, self.dones
+        cos, sin = math.cos, math.sin
+
+        # The carts done at the previous step are not stepped any more
+        for i in self.finished:
+            rewards[i] = 0
+        live = []
+        finished = []
+        for i in self.live:
+            action = actions[i]
+
+            th = theta[i]
+            th_dot = theta_dot[i]
+            force = FORCE_MAG * action
+            costheta = cos(th)
+            sintheta = sin(th)
+            temp = (force + POLEMASS_LENGTH * th_dot * th_dot * sintheta) / TOTAL_MASS
+            thetaacc = (GRAVITY * sintheta - costheta * temp) / (LENGTH * (4.0/3.0 - MASSPOLE * costheta * costheta / TOTAL_MASS))
+            xacc = temp - POLEMASS_LENGTH * thetaacc * costheta / TOTAL_MASS
+
+            xi = x[i] = x[i] + TAU * x_dot[i]
+            x_dot[i] = x_dot[i] + TAU * xacc
+            th = theta[i] = th + TAU * th_dot
+            theta_dot[i] = th_dot + TAU * thetaacc
+
+            rewards[i] = 1
+            total_rewards[i] += 1
+            if (xi < -X_THRESHOLD or xi > X_THRESHOLD
+                    or th < -THETA_THRESHOLD_RADIANS
+                    or th > THETA_THRESHOLD_RADIANS):
+                done[i] = 1
+                dones[i] = True
+                obs[i] = []
+                finished.append(i)
+            else:
+                o = obs[i]
+                o[0] = xi
+                o[1] = x_dot[i]
+                o[2] = th
+                o[3] = theta_dot[i]
+                live.append(i)
+        self.live = live
+        self.finished = finished
+
+        return (obs, rewards, dones)
+
+    def terminate(self):
+        """Does nothing, there is no host program to terminate"""
+        pass
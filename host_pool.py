@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+
+"""Contains the pool of host programs driven with asyncio
+
+Unlike :code:`CartPoleEnv`, which talks to the host program that started
+the agent, the pool spawns M host programs in stdio mode and owns their
+pipes, so a single agent process keeps all of them busy.
+"""
+
+import random
+import asyncio
+from collections import deque
+
+from environments import FRAME, TRANSPORTS
+from linear_model import LinearModel
+
+HOST = './cartpole.out'
+
+
+class HostProcess(object):
+    """A host program in stdio mode, driven through its pipes"""
+
+    def __init__(self, process, transport='text', model=None):
+        """Initializes the host
+
+        Parameters
+        ----------
+        process : asyncio.subprocess.Process
+            the host program, with piped stdin and stdout
+        transport : str (default is 'text')
+            the transport negotiated with the host program
+        model : object (default is None)
+            the policy of the episodes. If None, a :code:`LinearModel`.
+        """
+        self.process = process
+        self.transport = transport
+        self.model = LinearModel(dims=4) if model is None else model
+
+    @classmethod
+    async def spawn(cls, host=HOST, seed=None, transport='text', model=None):
+        """Starts a host program and negotiates its transport
+
+        Parameters
+        ----------
+        host : str (default is './cartpole.out')
+            the host program
+        seed : int (default is None)
+            the seed of the start states. If None, the host program
+            seeds itself from the clock.
+        transport : str (default is 'text')
+            :code:`'text'` or :code:`'binary'`
+        model : object (default is None)
+            the policy of the episodes. If None, a :code:`LinearModel`.
+
+        Returns
+        -------
+        HostProcess
+            the started host
+        """
+        assert transport in TRANSPORTS, 'Invalid transport. Must be one of {}'.format(TRANSPORTS)
+        args = ['-'] if seed is None else ['-', str(seed)]
+        process = await asyncio.create_subprocess_exec(
+            host, *args, stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE)
+        self = cls(process, transport, model)
+        if transport == 'binary':
+            mode = TRANSPORTS.index(transport)
+            process.stdin.write('m {}\n'.format(mode).encode())
+            feedback = (await process.stdout.readline()).split()
+            if feedback != [b'mode', str(mode).encode()]:
+                raise RuntimeError('Host program does not support the {} transport'.format(transport))
+        return self
+
+    async def _feedback(self):
+        """Reads the reply of the host program
+
+        Returns
+        -------
+        list
+            the new observation, empty if the episode is done
+        bool
+            True if the episode is done
+        """
+        if self.transport == 'binary':
+            frame = await self.process.stdout.readexactly(FRAME.size)
+            x, x_dot, theta, theta_dot, status = FRAME.unpack(frame)
+            if status:
+                return [], True
+            return [x, x_dot, theta, theta_dot], False
+
+        feedback = await self.process.stdout.readline()
+        if not feedback:
+            raise EOFError('Host program closed the pipe')
+        feedback = feedback.split()
+        return [float(i) for i in feedback[1:]], feedback[0] == b'done'
+
+    async def reset(self):
+        """Resets the cart and returns its observation"""
+        self.process.stdin.write(b'r\n')
+        obs, _ = await self._feedback()
+        return obs
+
+    async def step(self, action):
+        """Applies an action and returns the new observation and whether
+        the episode is done"""
+        self.process.stdin.write(b's 1\n' if action == 1 else b's -1\n')
+        return await self._feedback()
+
+    async def run_episode(self, params, steps):
+        """Runs an episode of the policy with params and returns
+        the total reward, like :code:`agent.run_episode`"""
+        self.model.params = params
+        action = self.model.action
+        obs = await self.reset()
+        episode_reward = 0
+
+        for s in range(steps):
+            obs, done = await self.step(action(obs))
+            episode_reward += 1
+
+            if done:
+                break
+
+        return episode_reward
+
+    async def close(self):
+        """Quits the host program and waits for it to exit"""
+        self.process.stdin.write(b'q\n')
+        self.process.stdin.close()
+        await self.process.wait()
+
+
+class HostPool(object):
+    """Environment that evaluates samples concurrently on M host programs
+
+    Besides :code:`evaluate`, the pool has the interface of
+    :code:`CartPoleEnv` on its first host, to run single episodes.
+    """
+
+    # Bounds of the reward of one step
+    reward_range = (1, 1)
+
+    def __init__(self, m, host=HOST, transport='text', seed=None, policy=None):
+        """Initializes the pool and starts the host programs
+
+        Parameters
+        ----------
+        m : int
+            no. of host programs
+        host : str (default is './cartpole.out')
+            the host program
+        transport : str (default is 'text')
+            :code:`'text'` or :code:`'binary'`
+        seed : int (default is None)
+            seed of the seeds of the host programs. If None, the seeds
+            are drawn from :code:`random`.
+        policy : callable (default is None)
+            called with the no. of dimensions of the observations to
+            create the policy of each host. If None, :code:`LinearModel`.
+        """
+        rng = random if seed is None else random.Random(seed)
+        seeds = [rng.getrandbits(31) for i in range(m)]
+        policy = policy or LinearModel
+        models = [policy(self.obs_dim()) for i in range(m)]
+        self.loop = asyncio.new_event_loop()
+        self.hosts = self.loop.run_until_complete(self._spawn(host, seeds, transport, models))
+        self.prev_obs = None
+
+    async def _spawn(self, host, seeds, transport, models):
+        """Starts one host program per seed and model"""
+        return await asyncio.gather(*[HostProcess.spawn(host, seed, transport, model)
+                                      for seed, model in zip(seeds, models)])
+
+    async def _close(self):
+        """Quits every host program"""
+        await asyncio.gather(*[host.close() for host in self.hosts])
+
+    async def _evaluate(self, noisy_params, steps):
+        """Runs one episode per noisy parameter vector, each host taking
+        the next vector as soon as its episode is done"""
+        rewards = [None] * len(noisy_params)
+        jobs = deque(enumerate(noisy_params))
+
+        async def drain(host):
+            while jobs:
+                i, params = jobs.popleft()
+                rewards[i] = await host.run_episode(params, steps)
+
+        await asyncio.gather(*[drain(host) for host in self.hosts])
+        return rewards
+
+    def evaluate(self, noisy_params, steps):
+        """Evaluates the noisy parameters concurrently
+
+        Parameters
+        ----------
+        noisy_params : list of lists
+            the parameters of the policy to evaluate
+        steps : int
+            the step budget of each episode
+
+        Returns
+        -------
+        list
+            the reward of each parameter vector
+        """
+        return self.loop.run_until_complete(self._evaluate(noisy_params, steps))
+
+    def reset(self):
+        """Resets the cart of the first host and returns its observation"""
+        self.prev_obs = self.loop.run_until_complete(self.hosts[0].reset())
+        return self.prev_obs
+
+    def obs_dim(self):
+        """Returns the number of dimensions of the observation vector"""
+        return 4
+
+    def step(self, action):
+        """Applies an action to the cart of the first host
+
+        Returns
+        -------
+        list
+            the new observation
+        float
+            reward signal, always 1
+        bool
+            stop signal
+        """
+        assert action in [-1,1], 'Invalid input. Must be -1 or 1'
+        self.prev_obs, done = self.loop.run_until_complete(self.hosts[0].step(action))
+        return (self.prev_obs, 1, done)
+
+    def terminate(self):
+        """Quits the host programs and closes the event loop"""
+        self.loop.run_until_complete(self._close())
+        self.loop.close()
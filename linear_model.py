@@ -3,6 +3,7 @@
 """Contains the linear model"""
 
 import random
+from operator import mul
 
 
 class LinearModel(object):
@@ -21,25 +22,82 @@ class LinearModel(object):
         params : list
             the weight of the linear model with dimensions :code:`dims`
         """
+        self.dims = dims
         try:
             self.params = [random.uniform(-1,1) for i in range(dims)]
         except TypeError:
             raise('No. of dimensions should be an integer')
 
+    @property
+    def params(self):
+        return self._params
+
+    @params.setter
+    def params(self, params):
+        # The length is checked once here rather than at every action
+        assert len(params) == self.dims, 'Expected {} parameters, got {}'.format(self.dims, len(params))
+        self._params = params
+
     def action(self, obs):
         """Takes the inner product of the observation and model parameters
 
         Parameters
         ----------
-        obs : list
-            the observations to perform inner product into
+        obs : list, array or memoryview
+            the observations to perform inner product into, e.g. the
+            buffer overwritten by :code:`step_into` of an environment,
+            with :code:`dims` values
 
         Returns
         -------
         int
             1 if inner product is positive and -1 otherwise
         """
-        assert len(self.params) == len(obs), "Length of two lists aren't the same, {} != {}".format(len(self.params), len(obs))
-        inner_prod = sum([x*y for x,y in zip(self.params,obs)])
-        sign = lambda k: (k>0) - (k<=0)
-        return sign(inner_prod)
+        return 1 if sum(map(mul, self.params, obs)) > 0 else -1
+
+    def batch_action(self, obs, params=None):
+        """Computes the actions for a matrix of observations
+
+        Parameters
+        ----------
+        obs : list of lists
+            an M x dims matrix of observations
+        params : list or list of lists (default is None)
+            either one parameter vector or a K x dims matrix of
+            parameter vectors. If None, the model parameters are used.
+
+        Returns
+        -------
+        list or list of lists
+            the M actions of the parameter vector, or a K x M matrix
+            with the actions of each parameter vector
+        """
+        if params is None:
+            params = self.params
+        if params and isinstance(params[0], (list, tuple)):
+            return [self.batch_action(obs, w) for w in params]
+
+        assert all(len(o) == len(params) for o in obs), "Length of observations and parameters aren't the same"
+        return [1 if sum(map(mul, params, o)) > 0 else -1 for o in obs]
+
+    def paired_action(self, obs, params):
+        """Computes the action of many policies, one per observation
+
+        Parameters
+        ----------
+        obs : list of lists
+            an N x dims matrix of observations. Empty rows (episodes
+            that are done) are allowed.
+        params : list of lists
+            an N x dims matrix of parameters, the i-th row being the
+            policy applied to the i-th observation
+
+        Returns
+        -------
+        list
+            the action of each policy, 1 if the inner product is
+            positive and -1 otherwise
+        """
+        assert len(obs) == len(params), "Number of observations and parameters aren't the same, {} != {}".format(len(obs), len(params))
+        return [1 if o and sum(map(mul, w, o)) > 0 else -1
+                for w, o in zip(params, obs)]
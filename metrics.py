@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+
+"""Streams per-iteration metrics to disk and aggregates them
+
+To aggregate the metrics of a sweep, simply write the following:
+
+    python3 metrics.py ./output/*.metrics.csv --by-config
+"""
+
+import os
+import re
+import csv
+import sys
+import json
+import math
+import time
+from argparse import ArgumentParser
+
+FIELDS = ('iteration', 'mean_reward', 'max_reward', 'elite_reward',
+          'win_ratio', 'wall_time', 'evals_per_sec', 'param_norm', 'steps_saved')
+FSYNC_INTERVAL = 10.0
+
+
+def metrics_format(path):
+    """Returns 'jsonl' for .jsonl/.ndjson files and 'csv' otherwise"""
+    return 'jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+class MetricsWriter(object):
+    """Writes one record per CEM iteration into a CSV or JSON-lines file
+
+    Records go through the file buffer and the file is flushed and
+    fsync'ed at most every :code:`fsync_interval` seconds, so a killed
+    run loses at most the last few seconds of metrics.
+    """
+
+    def __init__(self, path, fmt=None, fsync_interval=FSYNC_INTERVAL, append=False):
+        """Initializes the writer
+
+        Parameters
+        ----------
+        path : str
+            the metrics file
+        fmt : str (default is None)
+            :code:`'csv'` or :code:`'jsonl'`. If None, it is guessed
+            from the extension of :code:`path`.
+        fsync_interval : float (default is 10.0)
+            seconds between two fsyncs of the file
+        append : bool (default is False)
+            whether to append the records to an existing file, like when
+            a run is resumed, instead of overwriting it
+        """
+        self.fmt = fmt or metrics_format(path)
+        assert self.fmt in ('csv', 'jsonl'), 'Invalid format. Must be csv or jsonl'
+        self.fsync_interval = fsync_interval
+        new_file = not append or not os.path.exists(path) or os.path.getsize(path) == 0
+        self.f = open(path, 'a' if append else 'w', newline='')
+        if self.fmt == 'csv':
+            self.writer = csv.DictWriter(self.f, fieldnames=FIELDS)
+            if new_file:
+                self.writer.writeheader()
+        self.last_sync = time.monotonic()
+
+    def write(self, record):
+        """Appends a record, a dict with the keys of :code:`FIELDS`"""
+        if self.fmt == 'csv':
+            self.writer.writerow(record)
+        else:
+            self.f.write(json.dumps(record) + '\n')
+
+        now = time.monotonic()
+        if now - self.last_sync >= self.fsync_interval:
+            self.sync()
+            self.last_sync = now
+
+    def sync(self):
+        """Flushes the buffered records and fsyncs the file"""
+        self.f.flush()
+        os.fsync(self.f.fileno())
+
+    def offset(self):
+        """Syncs the file and returns its size, to truncate it back to
+        when a run is resumed"""
+        self.sync()
+        return self.f.tell()
+
+    def close(self):
+        """Syncs and closes the file"""
+        self.sync()
+        self.f.close()
+
+
+def make_record(iteration, rewards, elite_rewards, win_ratio, wall_time,
+                evaluations, params, steps_saved=0):
+    """Builds the metrics record of one CEM iteration
+
+    Parameters
+    ----------
+    iteration : int
+        the iteration (episode) number
+    rewards : list
+        the reward of each sample
+    elite_rewards : list
+        the reward of each elite sample
+    win_ratio : float
+        the win ratio of the updated parameters
+    wall_time : float
+        seconds spent in the iteration
+    evaluations : int
+        no. of episodes run in the iteration
+    params : list
+        the updated parameters
+    steps_saved : int (default is 0)
+        no. of steps of the budget left unplayed by aborted rollouts
+
+    Returns
+    -------
+    dict
+        the record, with the keys of :code:`FIELDS`
+    """
+    return {
+        'iteration': iteration,
+        'mean_reward': sum(rewards) / len(rewards),
+        'max_reward': max(rewards),
+        'elite_reward': sum(elite_rewards) / len(elite_rewards) if elite_rewards else float('nan'),
+        'win_ratio': win_ratio,
+        'wall_time': wall_time,
+        'evals_per_sec': evaluations / wall_time if wall_time > 0 else float('inf'),
+        'param_norm': math.sqrt(sum(x * x for x in params)),
+        'steps_saved': steps_saved,
+    }
+
+def iter_records(path):
+    """Streams the records of a metrics file
+
+    Besides the files of :code:`MetricsWriter`, the single-row win ratio
+    files written by :code:`agent.py -o` are also read, as records with
+    only an iteration and a win ratio.
+
+    Yields
+    ------
+    dict
+        one record per iteration, with float values
+    """
+    with open(path, newline='') as f:
+        if metrics_format(path) == 'jsonl':
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        if header[0] != 'iteration':
+            for i, win_ratio in enumerate(header, 1):
+                yield {'iteration': i, 'win_ratio': float(win_ratio)}
+            return
+        for row in reader:
+            yield {k: float(v) for k, v in zip(header, row)}
+
+def config_of(path):
+    """Returns the configuration of a trial file, like :code:`n-100` for
+    :code:`./output/n-100-3.metrics.csv`"""
+    name = re.sub(r'(\.metrics)?\.(csv|jsonl|ndjson)$', '', os.path.basename(path))
+    return re.sub(r'-\d+$', '', name)
+
+def aggregate(paths, field='win_ratio', by_config=False):
+    """Aggregates a field per iteration over many metrics files
+
+    Files are streamed one at a time, so memory only grows with the
+    number of iterations (and configurations), not with the number of
+    files.
+
+    Parameters
+    ----------
+    paths : list
+        the metrics files
+    field : str (default is 'win_ratio')
+        the field to aggregate
+    by_config : bool (default is False)
+        aggregate each configuration separately
+
+    Returns
+    -------
+    dict
+        for each configuration (or :code:`None`), a dict from iteration
+        to the :code:`[count, mean, min, max]` of the field
+    """
+    results = {}
+    for path in paths:
+        table = results.setdefault(config_of(path) if by_config else None, {})
+        for record in iter_records(path):
+            if field not in record:
+                continue
+            value = record[field]
+            stats = table.setdefault(int(record['iteration']), [0, 0.0, value, value])
+            stats[0] += 1
+            stats[1] += (value - stats[1]) / stats[0]
+            stats[2] = min(stats[2], value)
+            stats[3] = max(stats[3], value)
+    return results
+
+def build_parser():
+    parser = ArgumentParser()
+    parser.add_argument('paths', nargs='+',
+                        help='metrics or win ratio files to aggregate')
+    parser.add_argument('-f', '--field',
+                        dest='field', help='field to aggregate',
+                        choices=FIELDS[1:], default='win_ratio')
+    parser.add_argument('--by-config',
+                        dest='by_config', help='aggregate each configuration separately',
+                        action='store_true', default=False)
+    return parser
+
+def main():
+    # Build parser
+    parser = build_parser()
+    options = parser.parse_args()
+
+    results = aggregate(options.paths, options.field, options.by_config)
+    wr = csv.writer(sys.stdout)
+    wr.writerow(['config', 'iteration', 'count', 'mean', 'min', 'max'])
+    for config in sorted(results, key=str):
+        for iteration, stats in sorted(results[config].items()):
+            wr.writerow([config or 'all', iteration] + stats)
+
+if __name__ == '__main__':
+    main()
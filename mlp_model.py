@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+
+"""Contains the multi-layer perceptron model"""
+
+import math
+import random
+from array import array
+from operator import mul
+
+ACTIONS = (-1, 1)
+
+
+def layer_sizes(dims, hidden, n_actions):
+    """Returns the (inputs, outputs) of each layer"""
+    widths = [dims] + list(hidden) + [n_actions]
+    return list(zip(widths[:-1], widths[1:]))
+
+def n_params(dims, hidden=(), actions=ACTIONS):
+    """Returns the no. of parameters of an MLP"""
+    return sum(n_out * (n_in + 1) for n_in, n_out in layer_sizes(dims, hidden, len(actions)))
+
+
+class MLPModel(object):
+    """A multi-layer perceptron modelling a policy over discrete actions
+
+    The parameters are one flat vector, layer by layer, each layer being
+    its weights row by row (one row per output) followed by its biases.
+    The hidden layers use tanh, and the action with the largest output
+    is taken. Assigning :code:`params` only builds memoryviews of the
+    rows of each layer, so an array or a row of
+    :code:`optimizers.ParameterMatrix` is used without being copied or
+    reshaped; a list is packed into an array once.
+    """
+
+    def __init__(self, dims, hidden=(), actions=ACTIONS):
+        """Initializes the model
+
+        Parameters
+        ----------
+        dims : int
+            number of dimensions of the observations
+        hidden : tuple (default is ())
+            number of units of each hidden layer
+        actions : tuple (default is (-1, 1))
+            the discrete actions, one output per action
+
+        Attributes
+        ----------
+        params : list
+            the flat parameters of the model, uniform in [-1, 1]
+        """
+        self.dims = dims
+        self.hidden = tuple(hidden)
+        self.actions = tuple(actions)
+        self.sizes = layer_sizes(dims, self.hidden, len(self.actions))
+        self.size = n_params(dims, self.hidden, self.actions)
+        self.cached = None
+        self.params = [random.uniform(-1,1) for i in range(self.size)]
+
+    @property
+    def params(self):
+        return self._params
+
+    @params.setter
+    def params(self, params):
+        self._params = params
+        self.layers = self.views(params)
+
+    def views(self, params):
+        """Returns the (rows, biases) of each layer as memoryviews of params
+
+        Parameters
+        ----------
+        params : list, array or memoryview
+            the flat parameters
+
+        Returns
+        -------
+        list of tuples
+            for each layer, the list of its weight rows and its biases
+        """
+        assert len(params) == self.size, 'Expected {} parameters, got {}'.format(self.size, len(params))
+        if not isinstance(params, (array, memoryview)):
+            params = array('d', params)
+        view = memoryview(params)
+
+        layers = []
+        offset = 0
+        for n_in, n_out in self.sizes:
+            rows = [view[offset + j * n_in:offset + (j + 1) * n_in] for j in range(n_out)]
+            offset += n_in * n_out
+            layers.append((rows, view[offset:offset + n_out]))
+            offset += n_out
+        return layers
+
+    def forward(self, obs, layers=None):
+        """Computes the outputs of the model for one observation
+
+        Parameters
+        ----------
+        obs : list
+            the observation, with :code:`dims` values (not checked)
+        layers : list (default is None)
+            the layers returned by :code:`views`. If None, the layers of
+            the model parameters are used.
+
+        Returns
+        -------
+        list
+            the output of each action
+        """
+        if layers is None:
+            layers = self.layers
+        tanh = math.tanh
+        h = obs
+        last = len(layers) - 1
+        for i, (rows, biases) in enumerate(layers):
+            h = [b + sum(map(mul, row, h)) for row, b in zip(rows, biases)]
+            if i < last:
+                h = [tanh(v) for v in h]
+        return h
+
+    def batch_forward(self, obs, layers=None):
+        """Computes the outputs of the model for a matrix of observations,
+        one layer at a time for all of them
+
+        Returns
+        -------
+        list of lists
+            an M x actions matrix of outputs
+        """
+        if layers is None:
+            layers = self.layers
+        tanh = math.tanh
+        H = obs
+        last = len(layers) - 1
+        for i, (rows, biases) in enumerate(layers):
+            H = [[b + sum(map(mul, row, h)) for row, b in zip(rows, biases)] for h in H]
+            if i < last:
+                H = [[tanh(v) for v in h] for h in H]
+        return H
+
+    def choose(self, outputs):
+        """Returns the action with the largest output"""
+        return self.actions[max(range(len(outputs)), key=outputs.__getitem__)]
+
+    def action(self, obs):
+        """Returns the action with the largest output for an observation
+
+        Parameters
+        ----------
+        obs : list
+            the observation
+
+        Returns
+        -------
+        int
+            one of the actions of the model
+        """
+        return self.choose(self.forward(obs))
+
+    def batch_action(self, obs, params=None):
+        """Computes the actions for a matrix of observations
+
+        Parameters
+        ----------
+        obs : list of lists
+            an M x dims matrix of observations
+        params : list or list of lists (default is None)
+            either one parameter vector or a K x size matrix of
+            parameter vectors. If None, the model parameters are used.
+
+        Returns
+        -------
+        list or list of lists
+            the M actions of the parameter vector, or a K x M matrix
+            with the actions of each parameter vector
+        """
+        if params is not None and len(params) and not isinstance(params[0], (int, float)):
+            return [self.batch_action(obs, w) for w in params]
+
+        assert all(len(o) == self.dims for o in obs), "Length of observations and inputs aren't the same"
+        layers = self.layers if params is None else self.views(params)
+        return [self.choose(outputs) for outputs in self.batch_forward(obs, layers)]
+
+    def paired_action(self, obs, params):
+        """Computes the action of many policies, one per observation
+
+        The views of the parameters are kept between calls with the
+        same parameter matrix, as done by :code:`agent.batch_evaluation`
+        at every step of a batch of episodes.
+
+        Parameters
+        ----------
+        obs : list of lists
+            an N x dims matrix of observations. Empty rows (episodes
+            that are done) are allowed.
+        params : list of lists
+            an N x size matrix of parameters, the i-th row being the
+            policy applied to the i-th observation
+
+        Returns
+        -------
+        list
+            the action of each policy, the first action for empty rows
+        """
+        assert len(obs) == len(params), "Number of observations and parameters aren't the same, {} != {}".format(len(obs), len(params))
+        if self.cached is None or self.cached[0] is not params:
+            self.cached = (params, [self.views(w) for w in params])
+        forward, choose = self.forward, self.choose
+        return [choose(forward(o, layers)) if o else self.actions[0]
+                for layers, o in zip(self.cached[1], obs)]
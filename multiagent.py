@@ -2,9 +2,40 @@
 
 """Runs multiple agents in parallel to test hyperparameters"""
 
+import os
+import csv
 import sys
-from subprocess import Popen
+import json
+import math
+import time
+import queue
+import shlex
+import random
+import shutil
+import socket
+import tempfile
+import itertools
+import subprocess
 from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from distributed import Coordinator, RemoteAgent, JobError, parse_address
+
+# Flags of agent.py that can be swept, in the order used to name trials
+SWEEP_KEYS = ('n', 'p', 'z', 'e')
+SWEEP_TYPES = {'n': int, 'p': float, 'z': int, 'e': int}
+
+# Presets of the -n, -p and -z sweeps
+SAMPLE_SIZES = [25, 50, 75, 100, 125, 150, 175, 200]
+ELITE_SIZES = [0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9]
+STEP_SIZES = [100, 250, 500, 750, 1000]
+SEEDS = [1, 2, 3, 4, 5]
+OUTPUT_DIR = './output'
+
+# Successive halving
+MIN_EPISODES = 5
+MAX_EPISODES = 100
+ETA = 3
 
 
 def build_parser():
@@ -18,69 +49,591 @@ def build_parser():
     parser.add_argument('-z', '--step-size',
                         dest='z', help='sweep step size',
                         action='store_true', default=False)
+    parser.add_argument('-g', '--grid',
+                        dest='grid', help='sweep a flag of agent.py over comma-separated values, e.g. n=50,100 (repeatable, keys: {})'.format(', '.join(SWEEP_KEYS)),
+                        action='append', default=[])
+    parser.add_argument('-r', '--seeds',
+                        dest='seeds', help='comma-separated random seeds, one trial per seed',
+                        default=','.join(str(s) for s in SEEDS))
+    parser.add_argument('-j', '--jobs',
+                        dest='jobs', help='no. of trials to run at once',
+                        type=int, default=os.cpu_count() or 1)
+    parser.add_argument('-d', '--output-dir',
+                        dest='output_dir', help='directory of the trial outputs',
+                        default=OUTPUT_DIR)
+    parser.add_argument('--checkpoint',
+                        dest='checkpoint', help='checkpoint each trial to <output>.ckpt, so that an interrupted sweep can be resumed',
+                        action='store_true', default=False)
+    parser.add_argument('--resume',
+                        dest='resume', help='skip trials whose output already exists and continue the others from their checkpoint (implies --checkpoint)',
+                        action='store_true', default=False)
+    parser.add_argument('--env',
+                        dest='env', help='environment of the agents, host runs them through cartpole.out',
+                        choices=['host', 'sim'], default='host')
+    parser.add_argument('--cache-file',
+                        dest='cache_file', help='SQLite file of episode rewards shared by the trials (requires --env sim)',
+                        required=False)
+    parser.add_argument('-m', '--metrics',
+                        dest='metrics', help='stream the per-episode metrics of each trial to <output>.metrics.csv',
+                        action='store_true', default=False)
+    parser.add_argument('--results',
+                        dest='results', help='SQLite results store the trials write their per-episode metrics to',
+                        required=False)
+    pruning = parser.add_mutually_exclusive_group()
+    pruning.add_argument('--halving',
+                         dest='halving', help='prune configurations with successive halving',
+                         action='store_true', default=False)
+    pruning.add_argument('--hyperband',
+                         dest='hyperband', help='prune configurations with hyperband',
+                         action='store_true', default=False)
+    parser.add_argument('--min-episodes',
+                        dest='min_episodes', help='no. of episodes of the first rung',
+                        type=int, default=MIN_EPISODES)
+    parser.add_argument('--max-episodes',
+                        dest='max_episodes', help='no. of episodes of the last rung',
+                        type=int, default=MAX_EPISODES)
+    parser.add_argument('--eta',
+                        dest='eta', help='only the top 1/eta configurations go to the next rung',
+                        type=int, default=ETA)
+    parser.add_argument('--servers',
+                        dest='servers', help='run the trials in --jobs long-lived agent servers instead of one process per trial',
+                        action='store_true', default=False)
+    parser.add_argument('--listen',
+                        dest='listen', help='run the trials on the distributed.py workers connecting to this HOST:PORT, --jobs at once',
+                        required=False)
     return parser
 
-def agent_sample_size():
-    """Runs the agent with multiple CEM sample size (N) for five trials"""
-    sizes=[25,50,75,100,125,150,175,200]
-    for sz in sizes:
-        commands = [
-            ['./cartpole.out', 'python3 agent.py -n {} -o ./output/n-{}-1'.format(sz,sz)],
-            ['./cartpole.out', 'python3 agent.py -n {} -o ./output/n-{}-2'.format(sz,sz)],
-            ['./cartpole.out', 'python3 agent.py -n {} -o ./output/n-{}-3'.format(sz,sz)],
-            ['./cartpole.out', 'python3 agent.py -n {} -o ./output/n-{}-4'.format(sz,sz)],
-            ['./cartpole.out', 'python3 agent.py -n {} -o ./output/n-{}-5'.format(sz,sz)],
-        ]
-
-        # Run in parallel
-        processes = [Popen(cmd) for cmd in commands]
-        for p in processes: p.wait()
-
-def agent_elite_size():
-    """Runs the agent with multiple elite size (p) for five trials"""
-    elite_size = [0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9]
-    for sz in elite_size:
-        commands = [
-            ['./cartpole.out', 'python3 agent.py -p {} -o ./output/p-{}-1'.format(sz,sz)],
-            ['./cartpole.out', 'python3 agent.py -p {} -o ./output/p-{}-2'.format(sz,sz)],
-            ['./cartpole.out', 'python3 agent.py -p {} -o ./output/p-{}-3'.format(sz,sz)],
-            ['./cartpole.out', 'python3 agent.py -p {} -o ./output/p-{}-4'.format(sz,sz)],
-            ['./cartpole.out', 'python3 agent.py -p {} -o ./output/p-{}-5'.format(sz,sz)],
-        ]
-
-        # Run in parallel
-        processes = [Popen(cmd) for cmd in commands]
-        for p in processes: p.wait()
-
-def agent_step_size():
-    """Runs the agent with multiple step sizes for five trials"""
-    step_size = [100, 250, 500, 750, 1000]
-    for sz in step_size:
-        commands = [
-            ['./cartpole.out', 'python3 agent.py -z {} -o ./output/z-{}-1'.format(sz,sz)],
-            ['./cartpole.out', 'python3 agent.py -z {} -o ./output/z-{}-2'.format(sz,sz)],
-            ['./cartpole.out', 'python3 agent.py -z {} -o ./output/z-{}-3'.format(sz,sz)],
-            ['./cartpole.out', 'python3 agent.py -z {} -o ./output/z-{}-4'.format(sz,sz)],
-            ['./cartpole.out', 'python3 agent.py -z {} -o ./output/z-{}-5'.format(sz,sz)],
-        ]
-
-        # Run in parallel
-        processes = [Popen(cmd) for cmd in commands]
-        for p in processes: p.wait()
+def parse_options(parser, args=None):
+    """Parses and checks the options of a sweep
+
+    Parameters
+    ----------
+    parser : ArgumentParser
+        the parser returned by :code:`build_parser`
+    args : list (default is None)
+        the arguments to parse. If None, the command-line arguments.
+
+    Returns
+    -------
+    Namespace
+        the options of the sweep
+    """
+    options = parser.parse_args(args)
+    if options.cache_file and options.env != 'sim':
+        parser.error('--cache-file requires --env sim')
+    if options.listen and options.servers:
+        parser.error('--listen and --servers cannot be used together')
+    if options.halving or options.hyperband:
+        if options.min_episodes < 1 or options.min_episodes > options.max_episodes:
+            parser.error('--min-episodes must be between 1 and --max-episodes')
+        if options.eta < 2:
+            parser.error('--eta must be at least 2')
+    return options
+
+def sweep_agent_args(options):
+    """Returns the arguments added to the agent of every trial of a
+    sweep, with :code:`{output}` standing for the output of the trial"""
+    # Resumable sweeps checkpoint every trial, so that an interrupted
+    # sweep continues from the last checkpoint of its unfinished trials
+    agent_args = []
+    if options.checkpoint or options.resume:
+        agent_args += ['--checkpoint', '{output}.ckpt']
+    if options.resume:
+        agent_args += ['--resume']
+    if options.cache_file:
+        agent_args += ['--cache-file', options.cache_file]
+    if options.metrics:
+        agent_args += ['-m', '{output}.metrics.csv']
+    if options.results:
+        agent_args += ['--results', os.path.abspath(options.results)]
+    return agent_args
+
+def parse_grid(specs):
+    """Parses :code:`key=v1,v2` specifications into a grid
+
+    Parameters
+    ----------
+    specs : list
+        the specifications, one per swept flag
+
+    Returns
+    -------
+    dict
+        the values of each swept flag
+    """
+    grid = {}
+    for spec in specs:
+        key, _, values = spec.partition('=')
+        if key not in SWEEP_TYPES or not values:
+            raise ValueError('Invalid grid specification: {}'.format(spec))
+        grid[key] = [SWEEP_TYPES[key](v) for v in values.split(',')]
+    return grid
+
+def expand_grid(grid):
+    """Returns the configurations of every point of a grid"""
+    keys = [k for k in SWEEP_KEYS if k in grid]
+    return [dict(zip(keys, values))
+            for values in itertools.product(*(grid[k] for k in keys))]
+
+def config_name(config):
+    """Names a configuration after its values, like :code:`n-100_p-0.1`"""
+    return '_'.join('{}-{}'.format(k, config[k]) for k in SWEEP_KEYS if k in config)
+
+def config_trials(configs, seeds, output_dir=OUTPUT_DIR):
+    """Returns the trials of a list of configurations
+
+    Each trial is named after its configuration and seed, like
+    :code:`n-100-3` for a sweep over the sample size.
+
+    Parameters
+    ----------
+    configs : list of dicts
+        the values of the swept flags of :code:`agent.py`
+    seeds : list
+        the random seeds, one trial per seed and configuration
+    output_dir : str (default is './output')
+        the directory of the trial outputs
+
+    Returns
+    -------
+    list of dicts
+        the trials, with their :code:`name`, agent :code:`args` and
+        :code:`output` path
+    """
+    trials = []
+    for config in configs:
+        for seed in seeds:
+            name = config_name(config)
+            name = '{}-{}'.format(name, seed) if name else str(seed)
+            output = os.path.join(output_dir, name)
+            args = []
+            for k in SWEEP_KEYS:
+                if k in config:
+                    args += ['-{}'.format(k), str(config[k])]
+            args += ['-r', str(seed), '-o', output]
+            trials.append({'name': name, 'config': config, 'seed': seed,
+                           'args': args, 'output': output})
+    return trials
+
+def build_trials(grid, seeds, output_dir=OUTPUT_DIR):
+    """Expands a grid into the list of trials to run
+
+    Parameters
+    ----------
+    grid : dict
+        the values of each swept flag of :code:`agent.py`
+    seeds : list
+        the random seeds, one trial per seed and grid point
+    output_dir : str (default is './output')
+        the directory of the trial outputs
+
+    Returns
+    -------
+    list of dicts
+        the trials returned by :code:`config_trials`
+    """
+    return config_trials(expand_grid(grid), seeds, output_dir)
+
+def trial_args(trial, env='host', agent_args=()):
+    """Returns the arguments of the agent of a trial
+
+    In :code:`agent_args`, :code:`{output}` is replaced by the output
+    path of the trial.
+    """
+    args = trial['args'] + [a.replace('{output}', trial['output']) for a in agent_args]
+    if env == 'host':
+        return args
+    return ['--env', env] + args
+
+def agent_command(args, env='host'):
+    """Returns the command that runs agent.py with args, through the host
+    program if env is 'host'"""
+    if env == 'host':
+        agent = ['python3', 'agent.py'] + args
+        return ['./cartpole.out', ' '.join(shlex.quote(a) for a in agent)]
+    return [sys.executable, 'agent.py'] + args
+
+def trial_command(trial, env='host', agent_args=()):
+    """Returns the command that runs the agent of a trial"""
+    return agent_command(trial_args(trial, env, agent_args), env)
+
+
+class AgentServerError(RuntimeError):
+    """Raised when an agent server fails to run a trial"""
+
+
+class AgentServer(object):
+    """A long-lived :code:`agent.py --serve` process running trials"""
+
+    def __init__(self, address, env='host', timeout=30.0):
+        """Starts the server and connects to it
+
+        Parameters
+        ----------
+        address : str
+            path of the Unix socket of the server
+        env : str (default is 'host')
+            environment of the agents, host runs the server through
+            cartpole.out
+        timeout : float (default is 30.0)
+            seconds to wait for the server to listen
+        """
+        self.process = subprocess.Popen(agent_command(['--serve', address], env),
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                self.sock.connect(address)
+                break
+            except (FileNotFoundError, ConnectionRefusedError):
+                if self.process.poll() is not None or time.monotonic() > deadline:
+                    self.sock.close()
+                    raise AgentServerError('agent server on {} did not start'.format(address))
+                time.sleep(0.01)
+        self.f = self.sock.makefile('rw')
+
+    def run(self, args):
+        """Runs the agent with args and returns its results
+
+        Returns
+        -------
+        dict
+            the :code:`win_ratios`, :code:`successful_episodes` and
+            :code:`seconds` of the run
+
+        Raises
+        ------
+        AgentServerError
+            if the run failed or the server died
+        """
+        self.f.write(json.dumps({'args': args}) + '\n')
+        self.f.flush()
+        for line in self.f:
+            message = json.loads(line)
+            if 'episode' in message:
+                continue
+            if 'error' in message:
+                raise AgentServerError(message['error'])
+            return message
+        raise AgentServerError('agent server exited')
+
+    def close(self):
+        """Stops the server"""
+        try:
+            self.f.write(json.dumps({'quit': True}) + '\n')
+            self.f.flush()
+        except OSError:
+            pass
+        self.f.close()
+        self.sock.close()
+        self.process.wait()
+
+def start_servers(count, directory, env='host'):
+    """Starts agent servers with their sockets in directory and returns
+    a queue of them, from which trials take an idle server"""
+    servers = queue.Queue()
+    for i in range(count):
+        servers.put(AgentServer(os.path.join(directory, 'agent-{}.sock'.format(i)), env))
+    return servers
+
+def start_remote(count, address, secret=None):
+    """Starts a coordinator on address and returns a queue of count
+    handles on it, so that count trials at once are sent to its workers
+    (which authenticate with secret, see :code:`distributed.py`)"""
+    agent = RemoteAgent(Coordinator(parse_address(address), secret=secret))
+    sys.stderr.write('Listening for workers on {}:{}\n'.format(*agent.coordinator.address))
+    servers = queue.Queue()
+    for i in range(count):
+        servers.put(agent)
+    return servers
+
+def stop_servers(servers):
+    """Stops the agent servers of a queue"""
+    while not servers.empty():
+        servers.get().close()
+
+def run_trial(trial, env='host', agent_args=(), servers=None):
+    """Runs a trial and returns its wall time in seconds
+
+    With :code:`servers`, the trial is run by the next idle agent server
+    of the queue instead of a new process. Remote workers write their
+    outputs on their own machine, so the win ratios they return are
+    written to the output of the trial if it does not exist.
+    """
+    start = time.monotonic()
+    if servers is None:
+        subprocess.run(trial_command(trial, env, agent_args), stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL, check=True)
+        return time.monotonic() - start
+
+    server = servers.get()
+    try:
+        result = server.run(trial_args(trial, env, agent_args))
+    finally:
+        servers.put(server)
+    if not os.path.exists(trial['output'] + '.csv'):
+        with open(trial['output'] + '.csv', 'w', newline='') as f:
+            csv.writer(f).writerow(result['win_ratios'])
+    return time.monotonic() - start
+
+def run_sweep(trials, jobs, env='host', resume=False, agent_args=(), servers=None):
+    """Runs trials through a queue of at most :code:`jobs` at once
+
+    A new trial starts as soon as any running trial finishes, and the
+    progress, wall time and ETA are reported as trials complete.
+
+    Parameters
+    ----------
+    trials : list of dicts
+        the trials returned by :code:`build_trials`
+    jobs : int
+        no. of trials to run at once
+    env : str (default is 'host')
+        environment of the agents
+    resume : bool (default is False)
+        if True, skip trials whose output already exists
+    agent_args : list (default is ())
+        extra arguments passed to every agent, where :code:`{output}`
+        stands for the output path of the trial
+    servers : Queue (default is None)
+        agent servers returned by :code:`start_servers` or
+        :code:`start_remote` to run the trials in, instead of one
+        process per trial
+
+    Returns
+    -------
+    dict
+        the wall time of each trial that was run, by name
+    """
+    if resume:
+        done = [t for t in trials if os.path.exists(t['output'] + '.csv')]
+        trials = [t for t in trials if t not in done]
+        sys.stderr.write('Skipping {} finished trials\n'.format(len(done)))
+
+    for trial in trials:
+        directory = os.path.dirname(trial['output'])
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    wall_times = {}
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = {executor.submit(run_trial, t, env, agent_args, servers): t for t in trials}
+        for count, future in enumerate(as_completed(futures), 1):
+            trial = futures[future]
+            try:
+                wall_times[trial['name']] = future.result()
+            except subprocess.CalledProcessError as e:
+                sys.stderr.write('[{}/{}] {} failed with exit code {}\n'.format(count, len(trials), trial['name'], e.returncode))
+                continue
+            except (AgentServerError, JobError) as e:
+                sys.stderr.write('[{}/{}] {} failed: {}\n'.format(count, len(trials), trial['name'], e))
+                continue
+            elapsed = time.monotonic() - start
+            eta = elapsed / count * (len(trials) - count)
+            sys.stderr.write('[{}/{}] {} finished in {:.1f}s (elapsed {:.1f}s, ETA {:.1f}s)\n'.format(count, len(trials), trial['name'], wall_times[trial['name']], elapsed, eta))
+
+    return wall_times
+
+def read_win_ratios(output):
+    """Reads the per-episode win ratios written by :code:`agent.py`"""
+    with open(output + '.csv', newline='') as f:
+        return [float(v) for v in next(csv.reader(f))]
+
+def score_trials(trials):
+    """Scores each configuration by its mean win ratio over the episodes,
+    averaged over the seeds
+
+    Trials without output (failed) are ignored, and configurations
+    without any output get a score of -inf.
+
+    Returns
+    -------
+    dict
+        the score of each configuration, by name
+    """
+    totals = {}
+    for trial in trials:
+        name = config_name(trial['config'])
+        totals.setdefault(name, [])
+        try:
+            win_ratios = read_win_ratios(trial['output'])
+        except (OSError, StopIteration, ValueError):
+            continue
+        if win_ratios:
+            totals[name].append(sum(win_ratios) / len(win_ratios))
+    return {name: sum(v) / len(v) if v else float('-inf')
+            for name, v in totals.items()}
+
+def continue_trials(previous, trials, agent_args=(), overwrite=True):
+    """Copies the checkpoints of finished trials to the trials of the same
+    configuration and seed run for more episodes
+
+    Every path of :code:`agent_args` made from :code:`{output}`, like
+    the checkpoint and the metrics file, is copied, so that the trials
+    resumed with :code:`--resume` continue from the last episode of the
+    previous ones instead of episode 0.
+
+    Parameters
+    ----------
+    previous : list of dicts
+        the finished trials, returned by :code:`config_trials`
+    trials : list of dicts
+        the trials to continue them with
+    agent_args : list
+        the extra arguments of the agents
+    overwrite : bool (default is True)
+        whether to replace the files the trials already have
+    """
+    def key(trial):
+        return config_name({k: v for k, v in trial['config'].items() if k != 'e'}), trial['seed']
+
+    outputs = {key(t): t['output'] for t in previous}
+    patterns = [a for a in agent_args if a.startswith('{output}')]
+    for trial in trials:
+        output = outputs.get(key(trial))
+        if output is None:
+            continue
+        for pattern in patterns:
+            src = pattern.replace('{output}', output)
+            dst = pattern.replace('{output}', trial['output'])
+            if os.path.exists(src) and (overwrite or not os.path.exists(dst)):
+                shutil.copyfile(src, dst)
+
+def successive_halving(configs, seeds, min_episodes, max_episodes, eta=ETA,
+                       jobs=1, env='host', output_dir=OUTPUT_DIR, resume=False,
+                       agent_args=(), servers=None):
+    """Runs configurations for more and more episodes, only keeping the
+    best 1/eta of them at each rung
+
+    The first rung runs every configuration for :code:`min_episodes`,
+    and each next rung multiplies the episodes by :code:`eta` until
+    :code:`max_episodes`. The trials of a rung resume from the
+    checkpoints of the previous one, so only their new episodes are run.
+
+    Parameters
+    ----------
+    configs : list of dicts
+        the values of the swept flags of :code:`agent.py`, without
+        :code:`e`
+    seeds : list
+        the random seeds, one trial per seed and configuration
+    min_episodes : int
+        no. of episodes of the first rung
+    max_episodes : int
+        no. of episodes of the last rung
+    eta : int (default is 3)
+        reduction factor of the configurations at each rung
+
+    Returns
+    -------
+    list of tuples
+        the (score, configuration) of the last rung, best first
+    """
+    # The trials of a rung continue the checkpoints of the previous one
+    agent_args = list(agent_args)
+    if '--checkpoint' not in agent_args:
+        agent_args += ['--checkpoint', '{output}.ckpt']
+    rung_args = agent_args if '--resume' in agent_args else agent_args + ['--resume']
+
+    episodes = min(min_episodes, max_episodes)
+    previous = None
+    while True:
+        rung = [dict(c, e=episodes) for c in configs]
+        trials = config_trials(rung, seeds, output_dir)
+        sys.stderr.write('Rung of {} episodes: {} configurations\n'.format(episodes, len(rung)))
+        if previous is not None:
+            continue_trials(previous, trials, agent_args, overwrite=not resume)
+        run_sweep(trials, jobs, env=env, resume=resume,
+                  agent_args=agent_args if previous is None else rung_args,
+                  servers=servers)
+
+        scores = score_trials(trials)
+        ranked = sorted(((scores[config_name(c)], c) for c in rung),
+                        key=lambda x: x[0], reverse=True)
+        if episodes >= max_episodes or len(configs) <= 1:
+            return ranked
+
+        previous = trials
+        keep = max(1, len(configs) // eta)
+        configs = [{k: v for k, v in c.items() if k != 'e'} for _, c in ranked[:keep]]
+        episodes = min(max_episodes, episodes * eta)
+
+def hyperband(configs, seeds, min_episodes, max_episodes, eta=ETA,
+              jobs=1, env='host', output_dir=OUTPUT_DIR, resume=False,
+              agent_args=(), servers=None):
+    """Runs brackets of successive halving that trade the number of
+    configurations for the episodes of their first rung
+
+    The configurations of each bracket are drawn from :code:`configs`
+    with the global :code:`random` module.
+
+    Returns
+    -------
+    list of tuples
+        the (score, configuration) of the last rung of every bracket,
+        best first
+    """
+    s_max = int(math.log(max_episodes / min_episodes, eta) + 1e-9)
+    results = []
+    for s in range(s_max, -1, -1):
+        n = int(math.ceil((s_max + 1) / (s + 1) * eta ** s))
+        bracket = random.sample(configs, min(n, len(configs)))
+        episodes = max(1, int(max_episodes * eta ** -s))
+        results += successive_halving(bracket, seeds, episodes, max_episodes, eta,
+                                      jobs, env, output_dir, resume, agent_args,
+                                      servers)
+    return sorted(results, key=lambda x: x[0], reverse=True)
 
 def main():
     # Build parser
     parser = build_parser()
-    options = parser.parse_args()
+    options = parse_options(parser)
 
+    try:
+        grid = parse_grid(options.grid)
+    except ValueError as e:
+        parser.error(str(e))
     if options.n:
-        agent_sample_size()
-    elif options.p:
-        agent_elite_size()
-    elif options.z:
-        agent_step_size()
-    else:
+        grid['n'] = SAMPLE_SIZES
+    if options.p:
+        grid['p'] = ELITE_SIZES
+    if options.z:
+        grid['z'] = STEP_SIZES
+    if not grid:
         sys.stderr.write('Invalid argument passed')
+        return
+
+    seeds = [int(s) for s in options.seeds.split(',')]
+    agent_args = sweep_agent_args(options)
+
+    if (options.halving or options.hyperband) and 'e' in grid:
+        parser.error('the episodes cannot be swept with --halving or --hyperband')
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        servers = None
+        if options.listen:
+            servers = start_remote(options.jobs, options.listen)
+        elif options.servers:
+            servers = start_servers(options.jobs, tmpdir, options.env)
+        try:
+            if options.halving or options.hyperband:
+                prune = hyperband if options.hyperband else successive_halving
+                random.seed(seeds[0])
+                ranked = prune(expand_grid(grid), seeds, options.min_episodes,
+                               options.max_episodes, options.eta, options.jobs,
+                               options.env, options.output_dir, options.resume,
+                               agent_args, servers)
+                for score, config in ranked:
+                    sys.stderr.write('{:.4f} {}\n'.format(score, config_name(config)))
+            else:
+                trials = build_trials(grid, seeds, options.output_dir)
+                run_sweep(trials, options.jobs, env=options.env, resume=options.resume,
+                          agent_args=agent_args, servers=servers)
+        finally:
+            if servers is not None:
+                stop_servers(servers)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -1,25 +1,214 @@
 # -*- coding: utf-8 -*-
 
-"""Contains the cross entropy method"""
+"""Contains the optimizers of the policy parameters
 
+Every optimizer has the same ask/tell interface: :code:`ask` returns the
+samples to evaluate around the current parameters, and :code:`tell`
+takes their rewards and returns the new parameters.
+"""
+
+import math
+import heapq
 import random
+from array import array
+from operator import add, mul, sub
+from itertools import cycle, repeat
+
+
+def cholesky(matrix):
+    """Returns the lower-triangular Cholesky factor of a symmetric
+    positive-definite matrix (list of lists)"""
+    n = len(matrix)
+    L = [[0.0] * n for i in range(n)]
+    for i in range(n):
+        for j in range(i + 1):
+            s = matrix[i][j] - sum(L[i][k] * L[j][k] for k in range(j))
+            if i == j:
+                L[i][i] = math.sqrt(max(s, 0.0))
+            else:
+                L[i][j] = s / L[j][j] if L[j][j] > 0 else 0.0
+    return L
+
+def symmetric_eigen(matrix, basis=None, sweeps=50):
+    """Returns the eigenvalues and eigenvectors of a symmetric matrix
+    (list of lists) by cyclic Jacobi rotations
+
+    The eigenvectors are the columns of the returned matrix B, so that
+    :code:`matrix = B diag(eigenvalues) B^T`. Starting from the
+    eigenvectors of a close matrix as :code:`basis` only takes a few
+    rotations.
+    """
+    n = len(matrix)
+    # Rows of B^T, rotated like the rows of A = B^T matrix B
+    if basis is None:
+        Bt = [[float(i == j) for j in range(n)] for i in range(n)]
+        A = [list(map(float, row)) for row in matrix]
+    else:
+        Bt = [list(col) for col in zip(*basis)]
+        MB = [[sum(map(mul, row, b)) for b in Bt] for row in matrix]
+        A = [[sum(map(mul, b, col)) for col in zip(*MB)] for b in Bt]
+        A = [[(A[i][j] + A[j][i]) / 2 for j in range(n)] for i in range(n)]
+    norm = sum(a * a for row in A for a in row)
+    for sweep in range(sweeps):
+        off = sum(A[p][q] ** 2 for p in range(n) for q in range(p + 1, n))
+        if off <= 1e-30 * norm:
+            break
+        for p in range(n):
+            for q in range(p + 1, n):
+                a = A[p][q]
+                if a == 0.0:
+                    continue
+                theta = (A[q][q] - A[p][p]) / (2 * a)
+                t = math.copysign(1.0, theta) / (abs(theta) + math.sqrt(theta * theta + 1))
+                c = 1 / math.sqrt(t * t + 1)
+                s = t * c
+                # Rotating the rows p and q gives the columns too, A being symmetric
+                row_p = [c * x - s * y for x, y in zip(A[p], A[q])]
+                row_q = [s * x + c * y for x, y in zip(A[p], A[q])]
+                row_p[p], row_q[q] = A[p][p] - t * a, A[q][q] + t * a
+                row_p[q] = row_q[p] = 0.0
+                A[p], A[q] = row_p, row_q
+                for row, x, y in zip(A, row_p, row_q):
+                    row[p] = x
+                    row[q] = y
+                Bt[p], Bt[q] = ([c * x - s * y for x, y in zip(Bt[p], Bt[q])],
+                                [s * x + c * y for x, y in zip(Bt[p], Bt[q])])
+    return [A[i][i] for i in range(n)], [list(col) for col in zip(*Bt)]
+
+
+class Optimizer(object):
+    """Interface of the optimizers driven by the agent"""
+
+    def ask(self, params):
+        """Generates the samples to evaluate
+
+        Parameters
+        ----------
+        params : list
+            the current parameters, as returned by the last :code:`tell`
+
+        Returns
+        -------
+        list of lists
+            an N x dims matrix of parameter samples
+        """
+        raise NotImplementedError
+
+    def tell(self, samples, rewards):
+        """Updates the optimizer with the rewards of the samples
+
+        Parameters
+        ----------
+        samples : list of lists
+            the samples returned by :code:`ask`
+        rewards : list
+            the reward of each sample
+
+        Returns
+        -------
+        list
+            the new parameters
+        """
+        raise NotImplementedError
+
+    def elite_count(self):
+        """Returns the no. of best samples the update is based on"""
+        return self.N
+
+    def get_state(self):
+        """Returns the state of the optimizer as a dict"""
+        raise NotImplementedError
+
+    def set_state(self, state):
+        """Restores the state returned by :code:`get_state`"""
+        raise NotImplementedError
 
 
-class CrossEntropyMethod(object):
+class CrossEntropyMethod(Optimizer):
     """Method for optimizing the parameters in the model"""
 
-    def __init__(self, N, p):
+    def __init__(self, N, p, adaptive=False, smoothing=1.0, extra_noise=0.0,
+                 noise_decay=0.0, min_variance=0.0, full_covariance=False):
         """Initializes the model
 
+        By default, samples are drawn with unit variance around the
+        parameters. With :code:`adaptive`, the sampling distribution is
+        fitted to the elites at each call to :code:`get_parameter_mean`:
+        its mean and variance become :code:`smoothing * elite + (1 -
+        smoothing) * previous`, an extra variance of :code:`extra_noise -
+        iteration * noise_decay` (at least 0) is added when sampling,
+        and the variance never goes below :code:`min_variance`.
+
         Parameters
         ----------
         N : int
             number of samples to generate
         p : float
             the amount of elite parameters to obtain
+        adaptive : bool (default is False)
+            fit the sampling variance to the elites
+        smoothing : float (default is 1.0)
+            weight of the elites in the new distribution
+        extra_noise : float (default is 0.0)
+            extra variance added when sampling at the first iteration
+        noise_decay : float (default is 0.0)
+            decrease of the extra variance at each iteration
+        min_variance : float (default is 0.0)
+            floor of the variance of each dimension
+        full_covariance : bool (default is False)
+            fit a full covariance matrix instead of one variance per
+            dimension
         """
         self.N = N
         self.p = p
+        self.adaptive = adaptive
+        self.smoothing = smoothing
+        self.extra_noise = extra_noise
+        self.noise_decay = noise_decay
+        self.min_variance = min_variance
+        self.full_covariance = full_covariance
+        self.iteration = 0
+        self.mean = None
+        self.variance = None
+        self.covariance = None
+
+    def noise_variance(self):
+        """Returns the extra variance added at the current iteration"""
+        return max(0.0, self.extra_noise - self.iteration * self.noise_decay)
+
+    def init_distribution(self, params):
+        """Centers the sampling distribution on params, starting from
+        unit variance on the first call"""
+        self.mean = list(params)
+        dims = len(params)
+        if self.variance is None:
+            self.variance = [1.0] * dims
+        if self.full_covariance and self.covariance is None:
+            self.covariance = [[float(i == j) for j in range(dims)] for i in range(dims)]
+
+    def get_state(self):
+        """Returns the state of the sampling distribution as a dict"""
+        return {'iteration': self.iteration, 'mean': self.mean,
+                'variance': self.variance, 'covariance': self.covariance}
+
+    def set_state(self, state):
+        """Restores the state returned by :code:`get_state`"""
+        self.iteration = state['iteration']
+        self.mean = state['mean']
+        self.variance = state['variance']
+        self.covariance = state['covariance']
+
+    def ask(self, params):
+        """Samples around params, see :code:`sample_parameters`"""
+        return self.sample_parameters(params)
+
+    def tell(self, samples, rewards):
+        """Returns the mean of the elite samples"""
+        return self.get_parameter_mean(self.get_elite_parameters(samples, rewards))
+
+    def elite_count(self):
+        """Returns the no. of elite samples"""
+        return int(self.N * self.p)
 
     def sample_parameters(self, params):
         """Generates an N x dims matrix of parameter samples
@@ -34,6 +223,9 @@ class CrossEntropyMethod(object):
         list of lists
             an N x dims matrix of parameter samples
         """
+        if self.adaptive:
+            return self.sample_distribution(params)
+
         noisy_params = []
 
         for i in range(self.N):
@@ -86,4 +278,427 @@ class CrossEntropyMethod(object):
         mean = lambda x : sum(x) / len(x)
         mean_params = [mean(x) for x in zip(*params)]
 
+        if self.adaptive:
+            variance = [mean([(v - m) ** 2 for v in x]) for x, m in zip(zip(*params), mean_params)]
+            return self.update_distribution(params, mean_params, variance)
+
         return mean_params
+
+    def sample_distribution(self, params):
+        """Generates an N x dims matrix of samples from the adaptive
+        distribution centered on params"""
+        self.init_distribution(params)
+        noise = self.noise_variance()
+        dims = len(params)
+
+        if self.full_covariance:
+            L = cholesky([[c + noise * (i == j) for j, c in enumerate(row)]
+                          for i, row in enumerate(self.covariance)])
+            noisy_params = []
+            for i in range(self.N):
+                z = [random.normalvariate(0,1) for j in range(dims)]
+                noisy_params.append([m + sum(map(mul, row, z)) for m, row in zip(params, L)])
+            return noisy_params
+
+        std = [math.sqrt(v + noise) for v in self.variance]
+        return [[m + s * random.normalvariate(0,1) for m, s in zip(params, std)]
+                for i in range(self.N)]
+
+    def update_distribution(self, params, elite_mean, elite_variance):
+        """Fits the sampling distribution to the elites
+
+        Parameters
+        ----------
+        params : list of lists
+            the elite parameters
+        elite_mean : list
+            the mean (by column) of the elites
+        elite_variance : list
+            the variance (by column) of the elites
+
+        Returns
+        -------
+        list
+            the new (smoothed) mean
+        """
+        alpha = self.smoothing
+        smooth = lambda new, old: alpha * new + (1 - alpha) * old
+        floor = self.min_variance
+
+        if self.mean is None:
+            self.init_distribution(elite_mean)
+        new_mean = [smooth(x, m) for x, m in zip(elite_mean, self.mean)]
+        self.variance = [max(floor, smooth(v, o)) for v, o in zip(elite_variance, self.variance)]
+
+        if self.full_covariance:
+            k = len(params)
+            dims = len(elite_mean)
+            centered = [[v - m for v, m in zip(row, elite_mean)] for row in params]
+            for i in range(dims):
+                for j in range(i + 1):
+                    c = sum(row[i] * row[j] for row in centered) / k
+                    c = smooth(c, self.covariance[i][j])
+                    if i == j:
+                        c = max(floor, c)
+                    self.covariance[i][j] = self.covariance[j][i] = c
+
+        self.mean = new_mean
+        self.iteration += 1
+        return new_mean
+
+
+class ParameterMatrix(object):
+    """An N x dims matrix of parameters stored in one contiguous array
+
+    Rows are returned as :code:`memoryview` objects into the array, so
+    they can be used wherever a parameter list is expected without
+    being copied.
+    """
+
+    def __init__(self, data, dims):
+        """Initializes the matrix
+
+        Parameters
+        ----------
+        data : array
+            the parameters in row-major order
+        dims : int
+            number of columns
+        """
+        self.data = data
+        self.dims = dims
+        self.view = memoryview(data)
+
+    def __len__(self):
+        return len(self.data) // self.dims
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('row index out of range')
+        return self.view[i * self.dims:(i + 1) * self.dims]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.view[i * self.dims:(i + 1) * self.dims]
+
+    def tolist(self):
+        """Returns the matrix as a list of lists"""
+        return [row.tolist() for row in self]
+
+
+class ArrayCrossEntropyMethod(CrossEntropyMethod):
+    """Cross entropy method over a contiguous array of samples
+
+    Samples are drawn into a single N x dims array, elites are selected
+    with a partial selection instead of a full sort, and the elite mean
+    and variance are computed over the rows, without transposing them.
+    For the same random state, the samples, elites and mean are the same
+    as the ones of :code:`CrossEntropyMethod`.
+    """
+
+    def sample_parameters(self, params):
+        """Generates an N x dims matrix of parameter samples
+
+        Parameters
+        ----------
+        params : list
+            the original set of parameters
+
+        Returns
+        -------
+        ParameterMatrix
+            an N x dims matrix of parameter samples
+        """
+        if self.adaptive and self.full_covariance:
+            return ParameterMatrix(array('d', [x for row in self.sample_distribution(params) for x in row]), len(params))
+
+        size = self.N * len(params)
+        noise = map(random.normalvariate, repeat(0, size), repeat(1, size))
+        if self.adaptive:
+            self.init_distribution(params)
+            extra = self.noise_variance()
+            std = [math.sqrt(v + extra) for v in self.variance]
+            noise = map(mul, cycle(std), noise)
+        return ParameterMatrix(array('d', map(add, cycle(params), noise)), len(params))
+
+    def get_elite_indices(self, rewards):
+        """Obtains the indices of the top N * p% rewards, best first
+
+        Small elite sets are selected with a heap in O(N log k); above
+        N / 16 elites, the C sort of the whole population is faster.
+        Both keep the order of :code:`sorted` for equal rewards.
+        """
+        k = int(self.N*self.p)
+        if k * 16 <= len(rewards):
+            return heapq.nlargest(k, range(len(rewards)), key=rewards.__getitem__)
+        return sorted(range(len(rewards)), key=rewards.__getitem__, reverse=True)[:k]
+
+    def get_elite_parameters(self, samples, rewards):
+        """Obtains the top N * p% parameters based on the reward
+
+        Parameters
+        ----------
+        samples : ParameterMatrix or list of lists
+            a set of sampled parameters with rows as samples and columns
+            as the parameter value
+        rewards : list
+            the sample's corresponding reward
+
+        Returns
+        -------
+        list
+            the top rows of :code:`samples`, without copying them
+        """
+        return [samples[i] for i in self.get_elite_indices(rewards)]
+
+    def get_parameter_statistics(self, params):
+        """Obtains the mean and variance (by column) of params in two passes
+
+        Parameters
+        ----------
+        params : list
+            the set of parameters with rows as samples and columns as
+            parameter value
+
+        Returns
+        -------
+        list
+            the mean of each column
+        list
+            the (population) variance of each column
+        """
+        dims = len(params[0])
+        sums = [0] * dims
+        for row in params:
+            sums = list(map(add, sums, row))
+
+        k = len(params)
+        mean = [x / k for x in sums]
+        # Deviations from the mean in a second pass over the k elites, as
+        # E[x^2] - E[x]^2 cancels out when the mean is large next to the spread
+        squares = [0] * dims
+        for row in params:
+            deviation = list(map(sub, row, mean))
+            squares = list(map(add, squares, map(mul, deviation, deviation)))
+        variance = [sq / k for sq in squares]
+
+        return mean, variance
+
+    def get_parameter_mean(self, params):
+        """Obtains the mean (by column) of params.
+
+        Parameters
+        ----------
+        params : list
+            the set of parameters with rows as samples and columns as
+            parameter value
+
+        Returns
+        -------
+        list
+            a list with the same dimension as :code:`params`
+        """
+        mean, variance = self.get_parameter_statistics(params)
+        if self.adaptive:
+            return self.update_distribution(params, mean, variance)
+        return mean
+
+
+class CMAES(Optimizer):
+    """Covariance matrix adaptation evolution strategy
+
+    Samples are drawn from :code:`N(mean, sigma^2 C)`. The mean moves to
+    the weighted mean of the best :code:`mu` samples, C is updated with
+    the rank-one (evolution path) and rank-mu updates and sigma with
+    cumulative step-size adaptation, following Hansen's tutorial. C is
+    factored as :code:`B D^2 B^T` by its eigendecomposition, so that the
+    evolution path of sigma follows :code:`C^(-1/2) y_w = B z_w`. The
+    eigenvectors of each generation start the Jacobi rotations of the
+    next one.
+    """
+
+    def __init__(self, N, sigma=1.0, mu=None):
+        """Initializes the optimizer
+
+        Parameters
+        ----------
+        N : int
+            number of samples to generate (lambda)
+        sigma : float (default is 1.0)
+            initial step size
+        mu : int (default is None)
+            number of samples the update is based on. If None, N / 2.
+        """
+        self.N = N
+        self.sigma = sigma
+        self.mu = mu or max(1, N // 2)
+        weights = [math.log(self.mu + 0.5) - math.log(i + 1) for i in range(self.mu)]
+        self.weights = [w / sum(weights) for w in weights]
+        self.mu_eff = 1 / sum(w * w for w in self.weights)
+        self.generation = 0
+        self.dims = None
+        self.covariance = None
+        self.p_sigma = None
+        self.p_c = None
+        self.noise = None
+        self.B = None
+
+    def init_distribution(self, dims):
+        """Starts from an identity covariance and empty evolution paths,
+        and sets the learning rates for dims dimensions"""
+        n = self.dims = dims
+        mu_eff = self.mu_eff
+        self.c_sigma = (mu_eff + 2) / (n + mu_eff + 5)
+        self.d_sigma = 1 + 2 * max(0.0, math.sqrt((mu_eff - 1) / (n + 1)) - 1) + self.c_sigma
+        self.c_c = (4 + mu_eff / n) / (n + 4 + 2 * mu_eff / n)
+        self.c_1 = 2 / ((n + 1.3) ** 2 + mu_eff)
+        self.c_mu = min(1 - self.c_1, 2 * (mu_eff - 2 + 1 / mu_eff) / ((n + 2) ** 2 + mu_eff))
+        self.chi_n = math.sqrt(n) * (1 - 1 / (4 * n) + 1 / (21 * n * n))
+        if self.covariance is None:
+            self.covariance = [[float(i == j) for j in range(n)] for i in range(n)]
+            self.p_sigma = [0.0] * n
+            self.p_c = [0.0] * n
+
+    def elite_count(self):
+        """Returns the no. of samples the update is based on"""
+        return self.mu
+
+    def ask(self, params):
+        """Samples N vectors from the distribution centered on params"""
+        if self.dims is None:
+            self.init_distribution(len(params))
+        self.mean = list(params)
+        eigenvalues, self.B = symmetric_eigen(self.covariance, self.B)
+        D = [math.sqrt(max(e, 0.0)) for e in eigenvalues]
+        self.noise = [[random.normalvariate(0,1) for j in range(self.dims)] for i in range(self.N)]
+        sigma = self.sigma
+        samples = []
+        for z in self.noise:
+            dz = list(map(mul, D, z))
+            samples.append([m + sigma * sum(map(mul, row, dz)) for m, row in zip(params, self.B)])
+        return samples
+
+    def tell(self, samples, rewards):
+        """Updates the distribution with the best mu samples and returns
+        its new mean"""
+        n = self.dims
+        sigma = self.sigma
+        best = sorted(range(len(rewards)), key=lambda i: rewards[i], reverse=True)[:self.mu]
+        steps = [[(x - m) / sigma for x, m in zip(samples[i], self.mean)] for i in best]
+        y_w = [sum(w * y[j] for w, y in zip(self.weights, steps)) for j in range(n)]
+        z_w = [sum(w * self.noise[i][j] for w, i in zip(self.weights, best)) for j in range(n)]
+        # C^(-1/2) y_w = B D^-1 B^T B D z_w
+        z_w = [sum(map(mul, row, z_w)) for row in self.B]
+
+        c_sigma, c_c, c_1, c_mu = self.c_sigma, self.c_c, self.c_1, self.c_mu
+        self.generation += 1
+        self.p_sigma = [(1 - c_sigma) * p + math.sqrt(c_sigma * (2 - c_sigma) * self.mu_eff) * z
+                        for p, z in zip(self.p_sigma, z_w)]
+        norm = math.sqrt(sum(p * p for p in self.p_sigma))
+        h_sigma = norm / math.sqrt(1 - (1 - c_sigma) ** (2 * self.generation)) < (1.4 + 2 / (n + 1)) * self.chi_n
+        self.p_c = [(1 - c_c) * p + h_sigma * math.sqrt(c_c * (2 - c_c) * self.mu_eff) * y
+                    for p, y in zip(self.p_c, y_w)]
+
+        decay = 1 - c_1 - c_mu + (1 - h_sigma) * c_1 * c_c * (2 - c_c)
+        C = self.covariance
+        for i in range(n):
+            for j in range(i + 1):
+                rank_mu = sum(w * y[i] * y[j] for w, y in zip(self.weights, steps))
+                C[i][j] = C[j][i] = decay * C[i][j] + c_1 * self.p_c[i] * self.p_c[j] + c_mu * rank_mu
+
+        self.sigma *= math.exp(c_sigma / self.d_sigma * (norm / self.chi_n - 1))
+        self.mean = [m + sigma * y for m, y in zip(self.mean, y_w)]
+        return self.mean
+
+    def get_state(self):
+        """Returns the step size, covariance, its eigenvectors and the
+        evolution paths as a dict"""
+        return {'generation': self.generation, 'sigma': self.sigma,
+                'covariance': self.covariance, 'eigenvectors': self.B,
+                'p_sigma': self.p_sigma, 'p_c': self.p_c}
+
+    def set_state(self, state):
+        """Restores the state returned by :code:`get_state`"""
+        self.generation = state['generation']
+        self.sigma = state['sigma']
+        self.covariance = state['covariance']
+        self.B = state.get('eigenvectors')
+        self.p_sigma = state['p_sigma']
+        self.p_c = state['p_c']
+        if self.covariance is not None:
+            self.init_distribution(len(self.covariance))
+
+
+class EvolutionStrategy(Optimizer):
+    """Evolution strategy with antithetic sampling and rank-based fitness
+    shaping, as in Salimans et al. (2017)
+
+    Samples come in mirrored pairs :code:`params +/- sigma * eps`. The
+    rewards are replaced by their centered ranks in [-0.5, 0.5] (equal
+    rewards sharing their mean rank), and the
+    parameters follow the estimated gradient
+    :code:`sum((F+ - F-) * eps) / (N * sigma)` with a fixed learning rate.
+    """
+
+    def __init__(self, N, sigma=0.3, learning_rate=1.0):
+        """Initializes the optimizer
+
+        Parameters
+        ----------
+        N : int
+            number of samples to generate, rounded down to an even number
+        sigma : float (default is 0.3)
+            standard deviation of the perturbations
+        learning_rate : float (default is 1.0)
+            step size of the gradient ascent
+        """
+        assert N >= 2, 'At least one pair of samples is needed'
+        self.N = N - N % 2
+        self.sigma = sigma
+        self.learning_rate = learning_rate
+        self.iteration = 0
+        self.noise = None
+
+    def ask(self, params):
+        """Samples N / 2 mirrored pairs of perturbations of params"""
+        self.mean = list(params)
+        sigma = self.sigma
+        self.noise = [[random.normalvariate(0,1) for j in range(len(params))] for i in range(self.N // 2)]
+        samples = []
+        for eps in self.noise:
+            samples.append([m + sigma * e for m, e in zip(params, eps)])
+            samples.append([m - sigma * e for m, e in zip(params, eps)])
+        return samples
+
+    def tell(self, samples, rewards):
+        """Takes a gradient step with the centered ranks of the rewards and
+        returns the new parameters"""
+        order = sorted(range(len(rewards)), key=rewards.__getitem__)
+        ranks = [0] * len(rewards)
+        start = 0
+        while start < len(order):
+            # Equal rewards share their mean rank
+            end = start + 1
+            while end < len(order) and rewards[order[end]] == rewards[order[start]]:
+                end += 1
+            for i in order[start:end]:
+                ranks[i] = (start + end - 1) / 2 / (len(rewards) - 1) - 0.5
+            start = end
+        scale = self.learning_rate / (len(rewards) * self.sigma)
+        gradient = [0.0] * len(self.mean)
+        for k, eps in enumerate(self.noise):
+            diff = ranks[2 * k] - ranks[2 * k + 1]
+            gradient = [g + diff * e for g, e in zip(gradient, eps)]
+        self.iteration += 1
+        self.mean = [m + scale * g for m, g in zip(self.mean, gradient)]
+        return self.mean
+
+    def get_state(self):
+        """Returns the no. of iterations as a dict"""
+        return {'iteration': self.iteration}
+
+    def set_state(self, state):
+        """Restores the state returned by :code:`get_state`"""
+        self.iteration = state['iteration']
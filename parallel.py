@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+"""Evaluates CEM samples in a persistent pool of worker processes"""
+
+import multiprocessing
+from itertools import repeat
+
+# State of the worker process, set once by its initializer
+_worker = {}
+
+def _init_worker(make_evaluator, args):
+    """Creates the evaluator owned by the worker process"""
+    _worker['evaluate'] = make_evaluator(*args)
+
+def _evaluate(job):
+    """Evaluates one (params, seed, states) job in the worker process"""
+    return _worker['evaluate'](*job)
+
+
+class EvaluationPool(object):
+    """Pool of worker processes, each owning its own environment"""
+
+    def __init__(self, workers, make_evaluator, args=(), chunksize=None):
+        """Initializes the pool
+
+        Parameters
+        ----------
+        workers : int
+            number of worker processes
+        make_evaluator : callable
+            picklable factory called once per worker as
+            :code:`make_evaluator(*args)`. It returns a callable that
+            takes a parameter vector, a seed and optionally a list of
+            start states, and returns the reward.
+        args : tuple (default is ())
+            arguments of :code:`make_evaluator`
+        chunksize : int (default is None)
+            number of samples sent to a worker at once. If None, each
+            worker gets about four chunks per call to :code:`evaluate`.
+        """
+        self.workers = workers
+        self.chunksize = chunksize
+        self.pool = multiprocessing.Pool(workers, _init_worker,
+                                         (make_evaluator, args))
+
+    def evaluate(self, noisy_params, seeds, states=None):
+        """Evaluates the samples in the worker processes
+
+        Each sample is evaluated with its own seed, so the rewards do not
+        depend on which worker evaluates it or on the number of workers.
+
+        Parameters
+        ----------
+        noisy_params : list of lists or ParameterMatrix
+            an N x dims matrix of parameter samples
+        seeds : list
+            the seed of each sample
+        states : list of lists (default is None)
+            start states shared by all samples, passed to the evaluator
+
+        Returns
+        -------
+        list
+            the reward of each sample, in the same order
+        """
+        chunksize = self.chunksize or max(1, len(noisy_params) // (4 * self.workers))
+        if states is None:
+            jobs = zip(map(list, noisy_params), seeds)
+        else:
+            jobs = zip(map(list, noisy_params), seeds, repeat(states))
+        return self.pool.map(_evaluate, jobs, chunksize)
+
+    def close(self):
+        """Stops the worker processes"""
+        self.pool.close()
+        self.pool.join()
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+
+"""Checks that CartPoleSimEnv reproduces the host program
+
+The harness runs as the agent of :code:`cartpole.out` and replays the
+same random action sequence through :code:`CartPoleEnv` and
+:code:`CartPoleSimEnv`. Every observation of the simulator is printed
+with the same 12-digit precision as the host program and compared to
+the observation received through the pipe. To run the check, simply
+write the following:
+
+    ./cartpole.out "python3 parity.py -e 20"
+
+With :code:`--transport binary`, the host program sends bit-exact binary
+frames and the observations must match exactly. With :code:`-k`, the
+batch protocol of the host program is also checked
+by replaying K carts through :code:`BatchedCartPoleEnv` and
+:code:`BatchCartPoleSimEnv`.
+"""
+
+import sys
+import random
+from argparse import ArgumentParser
+
+from environments import (CartPoleEnv, BatchedCartPoleEnv, CartPoleSimEnv,
+                          BatchCartPoleSimEnv, RESET_SCALES, TRANSPORTS)
+
+EPISODES = 20
+STEP_SIZE = 500
+RANDOM_SEED = 42
+
+def build_parser():
+    parser = ArgumentParser()
+    parser.add_argument('-e','--episodes',
+                        dest='episodes',help='number of episodes to replay',
+                        type=int, default=EPISODES)
+    parser.add_argument('-z', '--step-size',
+                        dest='step_size', help='no. of steps for each episode',
+                        type=int, default=STEP_SIZE)
+    parser.add_argument('-k', '--lanes',
+                        dest='lanes', help='no. of carts to replay through the batch protocol',
+                        type=int, default=0)
+    parser.add_argument('--transport',
+                        dest='transport', help='transport of the host program',
+                        choices=TRANSPORTS, default='text')
+    parser.add_argument('-o', '--output-file',
+                        dest='output_file', help='file to store the parity report',
+                        required=False)
+    parser.add_argument('-r', '--random-seed',
+                        dest='random_seed', help='sets the random seed',
+                        type=int, default=RANDOM_SEED)
+    return parser
+
+def printed(value):
+    """Rounds a value like :code:`toString` in :code:`cartpole.cc`"""
+    return float('{:.12g}'.format(value))
+
+def recover_state(obs):
+    """Recovers the exact initial state from a reset observation
+
+    The host program draws each component from 1000 evenly-spaced
+    values, so the index of the draw can be recovered from the printed
+    value and the state rebuilt without the rounding of the pipe.
+
+    Parameters
+    ----------
+    obs : list
+        the observation returned by :code:`CartPoleEnv.reset`
+
+    Returns
+    -------
+    list
+        the initial :code:`[x, x_dot, theta, theta_dot]`
+    """
+    state = []
+    for value, scale in zip(obs, RESET_SCALES):
+        k = int(round((value / (2.0 * scale) + 0.5) * 1000))
+        state.append((k / 1000.0 - 0.5) * 2.0 * scale)
+    return state
+
+def same_obs(host_obs, sim_obs, exact=False):
+    """Checks if two observations match to the printed precision, or
+    exactly if :code:`exact` is True"""
+    if exact:
+        return host_obs == sim_obs
+    return (len(host_obs) == len(sim_obs)
+            and all(x == printed(y) for x, y in zip(host_obs, sim_obs)))
+
+def replay_episode(host, sim, steps, exact=False):
+    """Replays one random action sequence through both environments
+
+    Returns
+    -------
+    int
+        number of steps taken
+    int
+        number of steps where the trajectories do not match
+    """
+    host_obs = host.reset()
+    sim_obs = sim.reset(state=recover_state(host_obs))
+    mismatches = 0 if same_obs(host_obs, sim_obs, exact) else 1
+
+    for s in range(steps):
+        action = random.choice([-1, 1])
+        host_obs, _, host_done = host.step(action)
+        sim_obs, _, sim_done = sim.step(action)
+
+        if host_done != sim_done or not same_obs(host_obs, sim_obs, exact):
+            sys.stderr.write('Mismatch at step {}: {} != {}\n'.format(s, host_obs, sim_obs))
+            mismatches += 1
+            break
+
+        if host_done:
+            break
+
+    return s + 1, mismatches
+
+def replay_batch(host, sim, steps, exact=False):
+    """Replays random action sequences through both batch environments
+
+    Returns
+    -------
+    int
+        number of cart steps taken
+    int
+        number of steps where the trajectories do not match
+    """
+    host_obs = host.reset()
+    sim_obs = sim.reset(states=[recover_state(o) for o in host_obs])
+    mismatches = 0 if all(same_obs(h, o, exact) for h, o in zip(host_obs, sim_obs)) else 1
+    total_steps = 0
+
+    for s in range(steps):
+        total_steps += len(host.live)
+        actions = [random.choice([-1, 1]) for i in range(host.n)]
+        host_obs, _, host_done = host.step(actions)
+        sim_obs, _, sim_done = sim.step(actions)
+
+        if host_done != sim_done or not all(same_obs(h, o, exact) for h, o in zip(host_obs, sim_obs)):
+            sys.stderr.write('Batch mismatch at step {}\n'.format(s))
+            mismatches += 1
+            break
+
+        if host.all_done():
+            break
+
+    return total_steps, mismatches
+
+def main():
+    # Build parser
+    parser = build_parser()
+    options = parser.parse_args()
+
+    # Set random seed
+    random.seed(options.random_seed)
+
+    host = CartPoleEnv(transport=options.transport)
+    sim = CartPoleSimEnv()
+    exact = options.transport == 'binary'
+
+    total_steps = 0
+    total_mismatches = 0
+    for i_episode in range(options.episodes):
+        steps, mismatches = replay_episode(host, sim, options.step_size, exact)
+        total_steps += steps
+        total_mismatches += mismatches
+
+    if options.lanes > 0:
+        batch_host = BatchedCartPoleEnv(options.lanes, transport=options.transport)
+        batch_sim = BatchCartPoleSimEnv(options.lanes)
+        for i_episode in range(options.episodes):
+            steps, mismatches = replay_batch(batch_host, batch_sim, options.step_size, exact)
+            total_steps += steps
+            total_mismatches += mismatches
+
+    report = 'episodes={} steps={} mismatches={}'.format(options.episodes, total_steps, total_mismatches)
+    sys.stderr.write('Parity check: {}\n'.format(report))
+
+    # If output_file is given, write the report to disk
+    if options.output_file:
+        with open(options.output_file, 'w') as f:
+            f.write(report + '\n')
+
+    # Terminate the host program
+    host.terminate()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+
+"""Contains the stage timers of the agent loop
+
+Stages are timed by wrapping the methods of the environments, model and
+optimizer of a run, so a run without profiler executes exactly the same
+code as before and pays nothing for it.
+"""
+
+import sys
+import json
+import time
+from array import array
+from functools import wraps
+
+
+def percentile(sorted_values, q):
+    """Returns the q-th percentile (nearest rank) of sorted values"""
+    if not sorted_values:
+        return float('nan')
+    rank = max(1, -(-q * len(sorted_values) // 100))
+    return sorted_values[int(rank) - 1]
+
+
+class Profiler(object):
+    """Collects the duration of each call to the instrumented stages"""
+
+    def __init__(self, trace=False):
+        """Initializes the profiler
+
+        Parameters
+        ----------
+        trace : bool (default is False)
+            also keep the start time of each call, to export them with
+            :code:`write_trace`
+        """
+        self.durations = {}
+        self.starts = {} if trace else None
+        self.patched = []
+        self.start = time.perf_counter()
+
+    def add(self, stage, duration, start=None):
+        """Records one call of a stage"""
+        durations = self.durations.get(stage)
+        if durations is None:
+            durations = self.durations[stage] = array('d')
+            if self.starts is not None:
+                self.starts[stage] = array('d')
+        durations.append(duration)
+        if self.starts is not None:
+            self.starts[stage].append(time.perf_counter() - duration if start is None else start)
+
+    def timed(self, stage, function):
+        """Returns function, recording the duration of each call in stage"""
+        clock = time.perf_counter
+        add = self.add
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                add(stage, clock() - start, start)
+        return wrapper
+
+    def instrument(self, obj, name, stage=None):
+        """Times every call of the method name of obj
+
+        Parameters
+        ----------
+        obj : object
+            the instance (or module) whose method is timed
+        name : str
+            the name of the method
+        stage : str (default is None)
+            the name of the stage. If None, :code:`<class>.<name>`.
+        """
+        if obj is None or not hasattr(obj, name):
+            return
+        stage = stage or '{}.{}'.format(type(obj).__name__, name)
+        self.patched.append((obj, name, obj.__dict__.get(name)))
+        setattr(obj, name, self.timed(stage, getattr(obj, name)))
+
+    def restore(self):
+        """Removes the timers added by :code:`instrument`"""
+        for obj, name, original in reversed(self.patched):
+            if original is None:
+                delattr(obj, name)
+            else:
+                setattr(obj, name, original)
+        self.patched = []
+
+    def summary(self):
+        """Returns the statistics of each stage
+
+        Returns
+        -------
+        list of tuples
+            :code:`(stage, calls, total, mean, p50, p99, calls per
+            second)`, by decreasing total time, with times in seconds
+            and rates over the wall time since the profiler was created
+        """
+        wall = time.perf_counter() - self.start
+        rows = []
+        for stage, durations in self.durations.items():
+            values = sorted(durations)
+            total = sum(values)
+            rows.append((stage, len(values), total, total / len(values),
+                         percentile(values, 50), percentile(values, 99),
+                         len(values) / wall if wall > 0 else float('inf')))
+        rows.sort(key=lambda row: -row[2])
+        return rows
+
+    def report(self, f=sys.stderr):
+        """Writes the per-stage breakdown"""
+        f.write('\n{:<24}{:>10}{:>11}{:>11}{:>11}{:>11}{:>13}\n'.format(
+            'stage', 'calls', 'total (s)', 'mean (us)', 'p50 (us)', 'p99 (us)', 'calls/sec'))
+        for stage, calls, total, mean, p50, p99, rate in self.summary():
+            f.write('{:<24}{:>10}{:>11.3f}{:>11.1f}{:>11.1f}{:>11.1f}{:>13.0f}\n'.format(
+                stage, calls, total, 1e6 * mean, 1e6 * p50, 1e6 * p99, rate))
+
+    def write_trace(self, path):
+        """Writes the calls in the Chrome trace event format, which can be
+        opened in chrome://tracing or Perfetto"""
+        assert self.starts is not None, 'The profiler was created without trace'
+        events = []
+        for stage, durations in self.durations.items():
+            for start, duration in zip(self.starts[stage], durations):
+                events.append({'name': stage, 'ph': 'X', 'pid': 0, 'tid': 0,
+                               'ts': 1e6 * (start - self.start), 'dur': 1e6 * duration})
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events}, f)
@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+
+"""Stores the per-episode results of runs in an indexed SQLite file
+
+Runs of :code:`agent.py --results` (and the trials of
+:code:`multiagent.py --results`) write into the store directly, and the
+outputs of earlier sweeps can be imported. Queries are aggregated by
+SQLite, so they do not load the trials into memory. To import a sweep
+and query its configurations, simply write the following:
+
+    python3 results.py import results.db ./output/*.csv
+    python3 results.py curves results.db
+    python3 results.py solve results.db -t 1.0
+    python3 results.py best results.db
+"""
+
+import os
+import re
+import csv
+import sys
+import json
+import math
+import sqlite3
+from argparse import ArgumentParser
+
+from metrics import FIELDS, iter_records
+
+# Value of the normal distribution for 95% confidence intervals
+Z95 = 1.959964
+SOLVED = 1.0
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS trials (
+    id INTEGER PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL,
+    config TEXT NOT NULL,
+    seed INTEGER,
+    hyperparams TEXT
+);
+CREATE INDEX IF NOT EXISTS trials_config ON trials (config);
+CREATE TABLE IF NOT EXISTS iterations (
+    trial INTEGER NOT NULL REFERENCES trials (id),
+    {},
+    PRIMARY KEY (trial, iteration)
+) WITHOUT ROWID;
+'''.format(',\n    '.join('{} {}'.format(f, 'INTEGER NOT NULL' if f == 'iteration' else 'REAL')
+                          for f in FIELDS))
+
+
+def parse_config(config):
+    """Returns the hyperparameters of a configuration name, like
+    :code:`{'n': 100, 'p': 0.1}` for :code:`n-100_p-0.1`"""
+    hyperparams = {}
+    for part in config.split('_'):
+        key, _, value = part.partition('-')
+        if not value:
+            continue
+        try:
+            hyperparams[key] = int(value)
+        except ValueError:
+            try:
+                hyperparams[key] = float(value)
+            except ValueError:
+                hyperparams[key] = value
+    return hyperparams
+
+def trial_of(path):
+    """Returns the (name, config, seed) of a trial file, like
+    :code:`('n-100-3', 'n-100', 3)` for :code:`./output/n-100-3.csv`"""
+    name = re.sub(r'(\.metrics)?\.(csv|jsonl|ndjson)$', '', os.path.basename(path))
+    seed = re.search(r'(?:^|-)(\d+)$', name)
+    if seed is None:
+        return name, name, None
+    return name, name[:seed.start()], int(seed.group(1))
+
+def config_filter(config):
+    """Returns the WHERE clause and arguments selecting the trials whose
+    configuration matches a glob pattern, or all if it is None"""
+    if config is None:
+        return '', ()
+    return 'WHERE t.config GLOB ?', (config,)
+
+def confidence(count, mean, mean_square):
+    """Returns the half-width of the 95% confidence interval of a mean,
+    from the mean of the squares"""
+    if count < 2:
+        return float('nan')
+    variance = max(0.0, mean_square - mean * mean) * count / (count - 1)
+    return Z95 * math.sqrt(variance / count)
+
+
+class ResultsStore(object):
+    """SQLite file of trials and of their per-episode records
+
+    Trials are keyed by name, with their configuration, seed and
+    hyperparameters, and records by trial and iteration. Several
+    processes can write to the same file.
+    """
+
+    def __init__(self, path):
+        """Opens (or creates) the store
+
+        Parameters
+        ----------
+        path : str
+            the SQLite file
+        """
+        self.db = sqlite3.connect(path, timeout=60)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SCHEMA)
+        self.db.commit()
+
+    def add_trial(self, name, config, seed=None, hyperparams=None):
+        """Adds a trial, or updates the one with the same name
+
+        Returns
+        -------
+        int
+            the id of the trial
+        """
+        # INSERT OR IGNORE then UPDATE, as SQLite < 3.24 has no UPSERT
+        hyperparams = json.dumps(hyperparams or {}, sort_keys=True)
+        self.db.execute('INSERT OR IGNORE INTO trials (name, config, seed, hyperparams) VALUES (?, ?, ?, ?)',
+                        (name, config, seed, hyperparams))
+        self.db.execute('UPDATE trials SET config = ?, seed = ?, hyperparams = ? WHERE name = ?',
+                        (config, seed, hyperparams, name))
+        self.db.commit()
+        return self.db.execute('SELECT id FROM trials WHERE name = ?', (name,)).fetchone()[0]
+
+    def truncate(self, trial, iteration=0):
+        """Deletes the records of a trial after an iteration, for the
+        episodes of a resumed (or rerun) trial to be written again"""
+        self.db.execute('DELETE FROM iterations WHERE trial = ? AND iteration > ?', (trial, iteration))
+        self.db.commit()
+
+    def copy_records(self, source, trial, iteration):
+        """Copies the records of a trial up to an iteration to another
+        one, like the episodes a trial resumed from the checkpoint of
+        another one (the previous rung of successive halving) did not run
+
+        Parameters
+        ----------
+        source : str
+            the name of the trial to copy the records of
+        trial : int
+            the id of the trial to copy them to
+        iteration : int
+            the last iteration to copy
+        """
+        fields = ', '.join(FIELDS)
+        self.db.execute('INSERT OR REPLACE INTO iterations (trial, {0}) SELECT ?, {0} FROM iterations '
+                        'WHERE trial = (SELECT id FROM trials WHERE name = ?) AND iteration <= ?'.format(fields),
+                        (trial, source, iteration))
+        self.db.commit()
+
+    def add_records(self, trial, records):
+        """Writes records of a trial, only setting the fields they have
+
+        Parameters
+        ----------
+        trial : int
+            the id of the trial
+        records : iterable of dicts
+            records with an :code:`iteration` and some other keys of
+            :code:`metrics.FIELDS`
+        """
+        statements = {}
+        for record in records:
+            fields = tuple(f for f in FIELDS if f in record)
+            if fields not in statements:
+                updates = [f for f in fields if f != 'iteration']
+                statements[fields] = (
+                    'INSERT OR IGNORE INTO iterations (trial, {}) VALUES (?{})'.format(
+                        ', '.join(fields), ', ?' * len(fields)),
+                    updates,
+                    'UPDATE iterations SET {} WHERE trial = ? AND iteration = ?'.format(
+                        ', '.join('{} = ?'.format(f) for f in updates)))
+            insert, updates, update = statements[fields]
+            self.db.execute(insert, [trial] + [record[f] for f in fields])
+            if updates:
+                self.db.execute(update, [record[f] for f in updates] + [trial, record['iteration']])
+        self.db.commit()
+
+    def import_file(self, path):
+        """Imports a win ratio file of :code:`agent.py -o` or a metrics
+        file, named after its trial
+
+        Returns
+        -------
+        int
+            the id of the trial
+        """
+        name, config, seed = trial_of(path)
+        trial = self.add_trial(name, config, seed, parse_config(config))
+        self.add_records(trial, iter_records(path))
+        return trial
+
+    def curves(self, field='win_ratio', config=None):
+        """Yields the mean of a field per configuration and iteration
+
+        Parameters
+        ----------
+        field : str (default is 'win_ratio')
+            one of :code:`metrics.FIELDS`
+        config : str (default is None)
+            glob pattern of the configurations to query. If None, all.
+
+        Yields
+        ------
+        tuple
+            :code:`(config, iteration, trials, mean, ci95)`
+        """
+        assert field in FIELDS[1:], 'Invalid field. Must be one of {}'.format(FIELDS[1:])
+        where, args = config_filter(config)
+        query = ('SELECT t.config, i.iteration, COUNT(i.{0}), AVG(i.{0}), AVG(i.{0} * i.{0}) '
+                 'FROM iterations i JOIN trials t ON t.id = i.trial {1} '
+                 'GROUP BY t.config, i.iteration HAVING COUNT(i.{0}) > 0 '
+                 'ORDER BY t.config, i.iteration').format(field, where)
+        for config, iteration, count, mean, mean_square in self.db.execute(query, args):
+            yield config, iteration, count, mean, confidence(count, mean, mean_square)
+
+    def best_so_far(self, field='win_ratio', config=None):
+        """Yields the mean of the best value of a field up to each
+        iteration, per configuration
+
+        Yields
+        ------
+        tuple
+            :code:`(config, iteration, trials, mean, ci95)`
+        """
+        assert field in FIELDS[1:], 'Invalid field. Must be one of {}'.format(FIELDS[1:])
+        where, args = config_filter(config)
+        # The running maximum of each trial is taken in one pass over its
+        # rows, as window functions need SQLite >= 3.25
+        query = ('SELECT t.config, i.trial, i.iteration, i.{0} '
+                 'FROM iterations i JOIN trials t ON t.id = i.trial {1} '
+                 'ORDER BY i.trial, i.iteration').format(field, where)
+        sums = {}
+        trial = best = None
+        for config, row_trial, iteration, value in self.db.execute(query, args):
+            if row_trial != trial:
+                trial, best = row_trial, None
+            if value is not None and (best is None or value > best):
+                best = value
+            if best is not None:
+                count, total, squares = sums.get((config, iteration), (0, 0.0, 0.0))
+                sums[config, iteration] = (count + 1, total + best, squares + best * best)
+        for (config, iteration), (count, total, squares) in sorted(sums.items()):
+            mean = total / count
+            yield config, iteration, count, mean, confidence(count, mean, squares / count)
+
+    def time_to_solve(self, threshold=SOLVED, config=None):
+        """Yields the no. of episodes needed to first reach a win ratio,
+        per configuration
+
+        Yields
+        ------
+        tuple
+            :code:`(config, trials, solved, mean, ci95)`, the mean and
+            confidence interval being over the solved trials
+        """
+        where, args = config_filter(config)
+        query = ('SELECT config, COUNT(*), COUNT(solved), AVG(solved), AVG(solved * solved) FROM ('
+                 'SELECT t.config, MIN(CASE WHEN i.win_ratio >= ? THEN i.iteration END) AS solved '
+                 'FROM trials t LEFT JOIN iterations i ON i.trial = t.id {} GROUP BY t.id) '
+                 'GROUP BY config ORDER BY config').format(where)
+        for config, count, solved, mean, mean_square in self.db.execute(query, (threshold,) + args):
+            yield config, count, solved, mean, confidence(solved, mean, mean_square) if solved else float('nan')
+
+    def close(self):
+        """Closes the file"""
+        self.db.close()
+
+def build_parser():
+    parser = ArgumentParser()
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    importer = commands.add_parser('import', help='import win ratio or metrics files')
+    importer.add_argument('store', help='SQLite file of the results')
+    importer.add_argument('paths', nargs='+', help='files named after their trial, like ./output/n-100-3.csv')
+
+    for command, help in (('curves', 'mean of a field per configuration and episode'),
+                          ('best', 'mean best-so-far of a field per configuration and episode'),
+                          ('solve', 'episodes to first reach a win ratio per configuration')):
+        query = commands.add_parser(command, help=help)
+        query.add_argument('store', help='SQLite file of the results')
+        query.add_argument('-c', '--config',
+                           dest='config', help='glob pattern of the configurations, e.g. n-100_*',
+                           required=False)
+        if command == 'solve':
+            query.add_argument('-t', '--threshold',
+                               dest='threshold', help='win ratio of a solved episode',
+                               type=float, default=SOLVED)
+        else:
+            query.add_argument('-f', '--field',
+                               dest='field', help='field to aggregate',
+                               choices=FIELDS[1:], default='win_ratio')
+    return parser
+
+def main():
+    # Build parser
+    parser = build_parser()
+    options = parser.parse_args()
+    store = ResultsStore(options.store)
+    wr = csv.writer(sys.stdout)
+
+    try:
+        if options.command == 'import':
+            for path in options.paths:
+                store.import_file(path)
+            sys.stderr.write('Imported {} files into {}\n'.format(len(options.paths), options.store))
+        elif options.command == 'solve':
+            wr.writerow(['config', 'trials', 'solved', 'mean', 'ci95'])
+            wr.writerows(store.time_to_solve(options.threshold, options.config))
+        else:
+            rows = store.curves if options.command == 'curves' else store.best_so_far
+            wr.writerow(['config', 'iteration', 'trials', 'mean', 'ci95'])
+            wr.writerows(rows(options.field, options.config))
+    finally:
+        store.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+
+"""Tests the evaluation of the samples by the agent"""
+
+import random
+import unittest
+
+from agent import abortable_evaluation, noisy_evaluation, run_episode, build_parser, parse_options, run
+from environments import EasyEnv, CartPoleSimEnv
+from linear_model import LinearModel
+from optimizers import CrossEntropyMethod
+
+
+class TestAbortableEvaluation(unittest.TestCase):
+
+    def run_cem(self, abort, iterations=8):
+        random.seed(3)
+        env = CartPoleSimEnv()
+        model = LinearModel(dims=env.obs_dim())
+        cem = CrossEntropyMethod(N=50, p=0.1)
+        params = model.params
+        steps_saved = 0
+        for i in range(iterations):
+            noisy_params = cem.sample_parameters(params)
+            seeds = [random.getrandbits(32) for w in noisy_params]
+            if abort:
+                rewards, saved = abortable_evaluation(model, env, 200, noisy_params, 5, seeds)
+                steps_saved += saved
+            else:
+                rewards = []
+                for w, seed in zip(noisy_params, seeds):
+                    env.seed(seed)
+                    rewards.append(noisy_evaluation(model, env, 200, w))
+            params = cem.get_parameter_mean(cem.get_elite_parameters(noisy_params, rewards))
+        return params, steps_saved
+
+    def test_same_elites(self):
+        """Check if aborting rollouts keeps the same parameter updates"""
+        params, _ = self.run_cem(abort=False)
+        aborted_params, steps_saved = self.run_cem(abort=True)
+        self.assertEqual(aborted_params, params)
+        self.assertGreater(steps_saved, 0)
+
+    def test_cutoff(self):
+        """Check if rollouts after k full rewards are skipped"""
+        env = CartPoleSimEnv(seed=0)
+        model = LinearModel(dims=env.obs_dim())
+        good = [0.5, 2.0, 4.0, 3.0]
+        rewards, steps_saved = abortable_evaluation(model, env, 50, [good, good, good], 2)
+        self.assertEqual(rewards, [50, 50, 0])
+        self.assertEqual(steps_saved, 50)
+
+class TestRunEpisode(unittest.TestCase):
+
+    def step_episode(self, model, env, steps):
+        """Runs an episode with reset and step"""
+        obs = env.reset()
+        episode_reward = 0
+        for s in range(steps):
+            obs, reward, done = env.step(model.action(obs))
+            episode_reward += reward
+            if done:
+                break
+        return episode_reward
+
+    def test_step_into_path(self):
+        """Check if episodes run with step_into have the rewards of step"""
+        for env_class, steps in ((CartPoleSimEnv, 200), (EasyEnv, 10)):
+            random.seed(7)
+            env = env_class()
+            model = LinearModel(dims=env.obs_dim())
+            rewards = []
+            for episode in (run_episode, self.step_episode):
+                random.seed(11)
+                rewards.append([episode(model, env, steps) for i in range(5)])
+            self.assertEqual(rewards[0], rewards[1])
+
+    def test_step_into_state(self):
+        """Check if episodes run with step_into start from the given state"""
+        env = CartPoleSimEnv()
+        model = LinearModel(dims=4)
+        model.params = [0.5, 2.0, 4.0, 3.0]
+        self.assertEqual(run_episode(model, env, 100, state=[0, 0, 0.25, 0]), 1)
+class TestOddSamples(unittest.TestCase):
+
+    def test_es_batch_env(self):
+        """Check if es with an odd N evaluates its even no. of samples in a batch environment"""
+        win_ratios = {}
+        for n in ('10', '11'):
+            options = parse_options(build_parser(), ['--env', 'batch', '--optimizer', 'es', '-n', n,
+                                                     '-e', '2', '-z', '50', '-r', '1'])
+            win_ratios[n], _ = run(options)
+        self.assertEqual(win_ratios['11'], win_ratios['10'])
+
+
+if __name__ == '__main__':
+    unittest.main()
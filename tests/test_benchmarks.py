@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+
+"""Tests the regression check of the benchmark suite"""
+
+import unittest
+
+from benchmarks.suite import compare, result
+
+
+class TestCompare(unittest.TestCase):
+
+    def test_regressions(self):
+        """Check if slowdowns beyond the threshold are flagged"""
+        baseline = {'steps': result(100.0, 'steps/s'),
+                    'seconds': result(1.0, 's', higher_is_better=False),
+                    'removed': result(1.0, 's', higher_is_better=False)}
+        results = {'steps': result(80.0, 'steps/s'),
+                   'seconds': result(0.5, 's', higher_is_better=False),
+                   'added': result(1.0, 's', higher_is_better=False)}
+        rows = {row[0]: row for row in compare(baseline, results, threshold=0.1)}
+        self.assertEqual(sorted(rows), ['seconds', 'steps'])
+        self.assertAlmostEqual(rows['steps'][3], -0.2)
+        self.assertTrue(rows['steps'][4])
+        self.assertAlmostEqual(rows['seconds'][3], 1.0)
+        self.assertFalse(rows['seconds'][4])
+
+
+if __name__ == '__main__':
+    unittest.main()
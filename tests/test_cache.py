@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+"""Tests the evaluation cache"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from cache import EvaluationCache, param_seed
+from agent import build_parser, cache_namespace, evaluate_samples
+from environments import CartPoleSimEnv
+from linear_model import LinearModel
+
+
+class TestEvaluationCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = EvaluationCache(max_entries=2, decimals=3)
+
+    def test_key_quantization(self):
+        """Check if parameters are rounded in the key"""
+        self.assertEqual(self.cache.key([0.12341, -0.0], 1, 500),
+                         self.cache.key([0.12339, 0.0], 1, 500))
+        self.assertNotEqual(self.cache.key([0.1], 1, 500), self.cache.key([0.1], 2, 500))
+
+    def test_key_namespace(self):
+        """Check if rewards of other environments or models have other keys"""
+        other = EvaluationCache(max_entries=2, decimals=3, namespace='sim/mlp-8')
+        self.assertNotEqual(self.cache.key([0.1], 1, 500), other.key([0.1], 1, 500))
+
+        parser = build_parser()
+        namespaces = [cache_namespace(parser.parse_args(args)) for args in
+                      (['--env', 'sim'], ['--env', 'sim', '--model', 'mlp'],
+                       ['--env', 'sim', '--model', 'mlp', '--hidden', '8,8'], ['--env', 'easy'])]
+        self.assertEqual(len(set(namespaces)), 4)
+
+    def test_param_seed(self):
+        """Check if the seed only depends on the rounded parameters"""
+        self.assertEqual(param_seed([0.1, -0.0]), param_seed([0.1 + 1e-12, 0.0]))
+        self.assertNotEqual(param_seed([0.1, 0.0]), param_seed([0.0, 0.1]))
+        self.assertTrue(0 <= param_seed([0.5, 2.0]) < 2**32)
+
+    def test_repeated_parameters_hit(self):
+        """Check if repeated parameters are simulated once and then hit the cache"""
+        cache = EvaluationCache()
+        env = CartPoleSimEnv()
+        model = LinearModel(dims=4)
+        noisy_params = [[0.1, 0.5, 1.0, 1.0], [0.5, 2.0, 4.0, 3.0], [0.1, 0.5, 1.0, 1.0]]
+        seeds = [param_seed(w) for w in noisy_params]
+        rewards = evaluate_samples(model, env, 100, noisy_params, seeds, cache=cache)
+        self.assertEqual(rewards[0], rewards[2])
+        self.assertEqual(evaluate_samples(model, env, 100, noisy_params[:2], seeds[:2], cache=cache),
+                         rewards[:2])
+        self.assertEqual((cache.hits, cache.misses), (2, 2))
+
+    def test_hit_and_miss(self):
+        """Check if hits and misses are counted"""
+        key = self.cache.key([1, 2], 0, 10)
+        self.assertIsNone(self.cache.get(key))
+        self.cache.put(key, 10)
+        self.assertEqual(self.cache.get(key), 10)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+        self.assertEqual(self.cache.hit_rate(), 0.5)
+
+    def test_lru_eviction(self):
+        """Check if the least recently used reward is evicted"""
+        keys = [self.cache.key([i], 0, 10) for i in range(3)]
+        self.cache.put(keys[0], 0)
+        self.cache.put(keys[1], 1)
+        self.cache.get(keys[0])
+        self.cache.put(keys[2], 2)
+        self.assertEqual(len(self.cache), 2)
+        self.assertIsNone(self.cache.get(keys[1]))
+        self.assertEqual(self.cache.get(keys[0]), 0)
+
+    def test_memory_eviction(self):
+        """Check if rewards are evicted above the memory budget"""
+        cache = EvaluationCache(max_bytes=1)
+        cache.put(cache.key([1], 0, 10), 1)
+        self.assertEqual(len(cache), 0)
+
+    def test_persistence(self):
+        """Check if rewards are shared through the SQLite file"""
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, 'cache.db')
+            cache = EvaluationCache(path=path)
+            cache.put(cache.key([1, 2], 0, 10), 7)
+            cache.close()
+
+            cache = EvaluationCache(path=path)
+            self.assertEqual(cache.get(cache.key([1, 2], 0, 10)), 7)
+            cache.close()
+        finally:
+            shutil.rmtree(tmpdir)
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+
+"""Tests the checkpoints of a CEM run"""
+
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from checkpoint import save_checkpoint, load_checkpoint, get_random_state, set_random_state
+from optimizers import CrossEntropyMethod
+
+
+class TestCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'run.ckpt')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_missing_checkpoint(self):
+        """Check if None is returned without checkpoint"""
+        self.assertIsNone(load_checkpoint(self.path))
+
+    def test_atomic_overwrite(self):
+        """Check if a checkpoint replaces the previous one without leftovers"""
+        save_checkpoint(self.path, {'episode': 1})
+        save_checkpoint(self.path, {'episode': 2, 'params': [0.1, -1e-300]})
+        self.assertEqual(load_checkpoint(self.path), {'episode': 2, 'params': [0.1, -1e-300]})
+        self.assertEqual(os.listdir(self.tmpdir), ['run.ckpt'])
+
+    def test_random_state(self):
+        """Check if the random state survives a checkpoint"""
+        rng = random.Random(3)
+        rng.normalvariate(0, 1)
+        save_checkpoint(self.path, {'random': get_random_state(rng)})
+        expected = [rng.normalvariate(0, 1) for i in range(5)]
+        set_random_state(load_checkpoint(self.path)['random'], rng)
+        self.assertEqual([rng.normalvariate(0, 1) for i in range(5)], expected)
+
+    def test_optimizer_state(self):
+        """Check if a restored adaptive CEM samples the same parameters"""
+        cem = CrossEntropyMethod(10, 0.2, adaptive=True, full_covariance=True, extra_noise=1, noise_decay=0.1)
+        random.seed(0)
+        params = cem.get_parameter_mean(cem.get_elite_parameters(cem.sample_parameters([0, 0]), list(range(10))))
+        save_checkpoint(self.path, cem.get_state())
+
+        restored = CrossEntropyMethod(10, 0.2, adaptive=True, full_covariance=True, extra_noise=1, noise_decay=0.1)
+        restored.set_state(load_checkpoint(self.path))
+        random.seed(1)
+        expected = cem.sample_parameters(params)
+        random.seed(1)
+        self.assertEqual(restored.sample_parameters(params), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
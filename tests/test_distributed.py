@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+"""Tests the coordinator and TCP workers"""
+
+import os
+import json
+import random
+import socket
+import tempfile
+import threading
+import unittest
+
+from agent import SeededEvaluator
+from distributed import (Coordinator, RemoteEvaluationPool, RemoteAgent, Worker, JobError,
+                         authenticate, parse_address)
+
+SECRET = 'secret'
+
+
+class TestDistributed(unittest.TestCase):
+
+    def setUp(self):
+        self.coordinator = Coordinator(('127.0.0.1', 0), heartbeat_timeout=0.5, secret=SECRET)
+        self.threads = []
+
+    def tearDown(self):
+        self.coordinator.close()
+        for thread in self.threads:
+            thread.join(5)
+
+    def start_workers(self, count, **kwargs):
+        for i in range(count):
+            worker = Worker(self.coordinator.address, secret=SECRET, **kwargs)
+            thread = threading.Thread(target=worker.run, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def samples(self, n=12):
+        random.seed(0)
+        noisy_params = [[random.uniform(-1, 1) for i in range(4)] for j in range(n)]
+        seeds = [random.getrandbits(32) for j in range(n)]
+        return noisy_params, seeds
+
+    def test_same_rewards(self):
+        """Check if remote workers return the rewards of a local evaluator"""
+        noisy_params, seeds = self.samples()
+        evaluator = SeededEvaluator('sim', 200)
+        expected = [evaluator(w, seed) for w, seed in zip(noisy_params, seeds)]
+
+        self.start_workers(2, batch=2)
+        pool = RemoteEvaluationPool(self.coordinator, ('sim', 200, 'linear', '8'), chunksize=3)
+        self.assertEqual(pool.evaluate(noisy_params, seeds), expected)
+
+    def test_dead_worker(self):
+        """Check if the jobs of a disconnected worker are run by another one"""
+        noisy_params, seeds = self.samples(4)
+        pool = RemoteEvaluationPool(self.coordinator, ('sim', 200, 'linear', '8'), chunksize=1)
+        results = []
+        thread = threading.Thread(target=lambda: results.append(pool.evaluate(noisy_params, seeds)))
+        thread.start()
+
+        sock = socket.create_connection(self.coordinator.address)
+        with sock, sock.makefile('rw') as f:
+            authenticate(f, SECRET.encode())
+            f.write(json.dumps({'pull': 2}) + '\n')
+            f.flush()
+            self.assertEqual(len(json.loads(f.readline())['jobs']), 2)
+
+        self.start_workers(1)
+        thread.join(10)
+        evaluator = SeededEvaluator('sim', 200)
+        self.assertEqual(results, [[evaluator(w, seed) for w, seed in zip(noisy_params, seeds)]])
+
+    def test_missed_heartbeats(self):
+        """Check if the jobs of a silent worker are queued again"""
+        noisy_params, seeds = self.samples(2)
+        pool = RemoteEvaluationPool(self.coordinator, ('sim', 200, 'linear', '8'), chunksize=1)
+        sock = socket.create_connection(self.coordinator.address)
+        with sock, sock.makefile('rw') as f:
+            authenticate(f, SECRET.encode())
+            results = []
+            thread = threading.Thread(target=lambda: results.append(pool.evaluate(noisy_params, seeds)))
+            thread.start()
+            f.write(json.dumps({'pull': 2}) + '\n')
+            f.flush()
+            f.readline()
+            self.start_workers(1)
+            thread.join(10)
+            self.assertEqual(len(results[0]), 2)
+
+    def test_trial(self):
+        """Check if trials return their results, and failures raise JobError"""
+        self.start_workers(1)
+        agent = RemoteAgent(self.coordinator)
+        result = agent.run(['--env', 'sim', '-e', '2', '-n', '10'])
+        self.assertEqual(len(result['win_ratios']), 2)
+        with self.assertRaises(JobError):
+            agent.run(['--env', 'sim', '--crn', '2', '--cache', '10'])
+
+    def test_wrong_secret(self):
+        """Check if a worker without the shared secret gets no job"""
+        worker = Worker(self.coordinator.address, secret='wrong')
+        self.assertEqual(worker.run(), 0)
+        self.assertEqual(self.coordinator.worker_count(), 0)
+
+    def test_trial_restrictions(self):
+        """Check if trials cannot choose the host program or write outside the root"""
+        self.start_workers(1)
+        agent = RemoteAgent(self.coordinator)
+        with self.assertRaises(JobError):
+            agent.run(['--env', 'host-pool', '--host-program', '/bin/sh', '-e', '1'])
+        with self.assertRaises(JobError):
+            agent.run(['--env', 'sim', '-e', '1', '-o', os.path.join(tempfile.gettempdir(), 'x')])
+        with self.assertRaises(JobError):
+            agent.run(['--env', 'sim', '-e', '1', '-m', os.path.join('..', 'x.csv')])
+
+    def test_parse_address(self):
+        """Check if the coordinator listens on localhost without a host"""
+        self.assertEqual(parse_address(':5555'), ('127.0.0.1', 5555))
+        self.assertEqual(parse_address('0.0.0.0:5555'), ('0.0.0.0', 5555))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,8 +4,10 @@
 
 import unittest
 import random
+from array import array
 
-from environments import EasyEnv, CartPoleEnv
+from environments import (EasyEnv, BatchEasyEnv, CartPoleEnv, CartPoleSimEnv,
+                          BatchCartPoleSimEnv, sample_start_state)
 
 
 class TestEasyEnv(unittest.TestCase):
@@ -46,6 +48,23 @@ class TestEasyEnv(unittest.TestCase):
         with self.assertRaises(AssertionError):
             self.env.step(43892.42)
 
+    def test_step_into(self):
+        """Check if step_into overwrites the buffer with the observations of step"""
+        random.seed(5)
+        expected = [self.env.reset()[0]]
+        for s in range(10):
+            obs, reward, done = self.env.step(1 if s % 2 else -1)
+            expected += [reward, obs[0], done]
+
+        random.seed(5)
+        buf = array('d', [0.0])
+        self.env.reset_into(buf)
+        observed = [buf[0]]
+        for s in range(10):
+            reward = self.env.step_into(1 if s % 2 else -1, buf)
+            observed += [reward, buf[0], self.env.done]
+        self.assertEqual(observed, expected)
+
 class TestCartPoleEnv(unittest.TestCase):
 
     def setUp(self):
@@ -89,6 +108,17 @@ class TestCartPoleEnv(unittest.TestCase):
         with self.assertRaises(AssertionError):
             self.env.step(43892.42)
 
+    def test_observation_buffer(self):
+        """Check if the observations are read into an array of 4 doubles"""
+        buf = self.env.observation_buffer()
+        self.assertIsInstance(buf, array)
+        self.assertEqual((buf.typecode, len(buf)), ('d', 4))
+
+    def test_wrong_transport(self):
+        """Check if assertion is raised with an unknown transport"""
+        with self.assertRaises(AssertionError):
+            CartPoleEnv(transport='morse')
+
     @unittest.skip('Skipping due to cartpole.out')
     def test_done_signal_per_episode(self):
         """Check if done signal is triggered at the end of the episode"""
@@ -103,3 +133,185 @@ class TestCartPoleEnv(unittest.TestCase):
 
         # Must be true at the end of the episode
         self.assertTrue(done)
+
+class TestCartPoleSimEnv(unittest.TestCase):
+
+    def setUp(self):
+        self.env = CartPoleSimEnv(seed=42)
+
+    def test_reset_return_type(self):
+        """Check if a list is returned"""
+        self.assertIsInstance(self.env.reset(), list)
+
+    def test_reset_return_dims(self):
+        """Check if a 4-dimensional list is returned"""
+        self.assertEqual(len(self.env.reset()), 4)
+
+    def test_reset_distribution(self):
+        """Check if the initial state is within the reset intervals"""
+        for _ in range(100):
+            x, x_dot, theta, theta_dot = self.env.reset()
+            self.assertTrue(-1.2 <= x < 1.2)
+            for v in (x_dot, theta, theta_dot):
+                self.assertTrue(-0.15 <= v < 0.15)
+
+    def test_reset_given_state(self):
+        """Check if reset starts from the given state"""
+        self.assertEqual(self.env.reset(state=[0.1, 0, 0, 0]), [0.1, 0, 0, 0])
+
+    def test_sample_start_state(self):
+        """Check if reset draws its state like sample_start_state"""
+        state = sample_start_state(random.Random(1))
+        self.assertEqual(CartPoleSimEnv(seed=1).reset(), state)
+
+    def test_seed_reproducibility(self):
+        """Check if the same seed gives the same initial state"""
+        self.assertEqual(CartPoleSimEnv(seed=1).reset(), CartPoleSimEnv(seed=1).reset())
+
+    def test_step_return_type(self):
+        """Check if a 3-tuple of list, int, and bool is returned"""
+        self.env.reset()
+        obs, reward, done = self.env.step(action=-1)
+
+        self.assertIsInstance(obs, list)
+        self.assertEqual(reward, 1)
+        self.assertIsInstance(done, bool)
+
+    def test_step_wrong_input(self):
+        """Check if assertion is raised with wrong input"""
+        self.env.reset()
+        with self.assertRaises(AssertionError):
+            self.env.step(43892.42)
+
+    def test_done_signal(self):
+        """Check if done is triggered when the pole falls"""
+        self.env.reset(state=[0, 0, 0.25, 0])
+        obs, _, done = self.env.step(action=1)
+        self.assertTrue(done)
+        self.assertEqual(obs, [])
+
+    def test_step_into(self):
+        """Check if step_into follows step, leaving the buffer unchanged once done"""
+        expected = [list(self.env.reset())]
+        done = False
+        while not done:
+            obs, reward, done = self.env.step(action=1)
+            expected.append(obs)
+
+        env = CartPoleSimEnv(seed=42)
+        buf = [0.0] * 4
+        env.reset_into(buf)
+        observed = [list(buf)]
+        while not env.done:
+            self.assertEqual(env.step_into(1, buf), 1)
+            observed.append([] if env.done else list(buf))
+        self.assertEqual(observed, expected)
+        self.assertEqual(buf, expected[-2])
+
+    def test_reset_into_given_state(self):
+        """Check if reset_into starts from the given state"""
+        buf = array('d', [0.0] * 4)
+        self.env.reset_into(buf, state=[0.1, 0, 0, 0])
+        self.assertEqual(list(buf), [0.1, 0, 0, 0])
+        self.assertFalse(self.env.done)
+
+class TestBatchEasyEnv(unittest.TestCase):
+
+    def setUp(self):
+        self.n = 5
+        self.env = BatchEasyEnv(self.n, seed=3)
+
+    def serial_episodes(self, actions):
+        """Runs n episodes of EasyEnv from the same random state"""
+        random.seed(3)
+        env = EasyEnv()
+        episodes = []
+        for i in range(self.n):
+            obs = [env.reset()]
+            rewards = []
+            done = False
+            while not done:
+                o, reward, done = env.step(actions(obs[-1][0]))
+                obs.append(o)
+                rewards.append(reward)
+            episodes.append((obs, rewards))
+        return episodes
+
+    def test_same_as_easy_env(self):
+        """Check if the observations and rewards are the ones of EasyEnv"""
+        episodes = self.serial_episodes(lambda o: 1)
+        obs = self.env.reset()
+        for t in range(10):
+            self.assertEqual([list(o) for o in obs], [e[0][t] for e in episodes])
+            obs, rewards, dones = self.env.step([1] * self.n)
+            self.assertEqual(rewards, [e[1][t] for e in episodes])
+            self.assertEqual(dones, [t == 9] * self.n)
+        self.assertTrue(self.env.all_done())
+        self.assertEqual(list(self.env.total_rewards), [sum(e[1]) for e in episodes])
+
+    def test_invalid_action(self):
+        """Check if error is raised with invalid actions"""
+        self.env.reset()
+        with self.assertRaises(AssertionError):
+            self.env.step([0] * self.n)
+
+
+class TestBatchCartPoleSimEnv(unittest.TestCase):
+
+    def setUp(self):
+        self.n = 8
+        self.env = BatchCartPoleSimEnv(self.n, seed=42)
+
+    def test_reset_return_dims(self):
+        """Check if an N x 4 matrix is returned"""
+        obs = self.env.reset()
+        self.assertEqual(len(obs), self.n)
+        self.assertTrue(all(len(o) == 4 for o in obs))
+
+    def test_step_return_dims(self):
+        """Check if one observation, reward and done signal per cart is returned"""
+        self.env.reset()
+        obs, rewards, dones = self.env.step([1] * self.n)
+        self.assertEqual(len(obs), self.n)
+        self.assertEqual(rewards, [1] * self.n)
+        self.assertEqual(len(dones), self.n)
+
+    def test_step_wrong_input(self):
+        """Check if assertion is raised with wrong input"""
+        self.env.reset()
+        with self.assertRaises(AssertionError):
+            self.env.step([43892.42] * self.n)
+
+    def test_matches_scalar_env(self):
+        """Check if each cart follows the same trajectory as CartPoleSimEnv"""
+        sim = CartPoleSimEnv(seed=42)
+        batch_obs = self.env.reset()
+        scalar_obs = [sim.reset() for i in range(self.n)]
+        self.assertEqual(batch_obs, scalar_obs)
+
+        totals = []
+        for i in range(self.n):
+            sim.reset(state=scalar_obs[i])
+            total = 0
+            for t in range(200):
+                obs, reward, done = sim.step(1 if t % 3 else -1)
+                total += reward
+                if done:
+                    break
+            totals.append(total)
+
+        for t in range(200):
+            self.env.step([1 if t % 3 else -1] * self.n)
+            if self.env.all_done():
+                break
+        self.assertEqual(list(self.env.total_rewards), totals)
+
+    def test_done_carts_are_not_stepped(self):
+        """Check if the reward stops accumulating once a cart is done"""
+        self.env.reset(states=[[0, 0, 0.25, 0]] + [[0, 0, 0, 0]] * (self.n - 1))
+        _, _, dones = self.env.step([1] * self.n)
+        self.assertTrue(dones[0])
+        obs, rewards, _ = self.env.step([1] * self.n)
+        self.assertEqual(obs[0], [])
+        self.assertEqual(rewards[0], 0)
+        self.assertEqual(self.env.total_rewards[0], 1)
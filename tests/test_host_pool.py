@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+"""Tests the asyncio pool of host programs"""
+
+import shutil
+import tempfile
+import unittest
+
+from host_pool import HostPool
+from tests.test_parity import build_host
+
+
+class TestHostPool(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.mkdtemp()
+        try:
+            cls.host = build_host(cls.tmpdir)
+        except unittest.SkipTest:
+            shutil.rmtree(cls.tmpdir)
+            raise
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmpdir)
+
+    def test_evaluate(self):
+        """Check if every sample gets a reward within the step budget"""
+        for transport in ('text', 'binary'):
+            pool = HostPool(3, host=self.host, transport=transport, seed=0)
+            try:
+                rewards = pool.evaluate([[0, 0, 0, 0], [1, 1, 1, 1]] * 4, 50)
+            finally:
+                pool.terminate()
+            self.assertEqual(len(rewards), 8)
+            self.assertTrue(all(1 <= r <= 50 for r in rewards))
+
+    def test_seeded_hosts(self):
+        """Check if a seeded pool of one host replays the same episodes"""
+        results = []
+        for i in range(2):
+            pool = HostPool(1, host=self.host, seed=5)
+            results.append(pool.evaluate([[0.1, 0.2, 0.3, 0.4]] * 5, 100))
+            pool.terminate()
+        self.assertEqual(results[0], results[1])
+
+    def test_env_interface(self):
+        """Check if the pool runs single episodes on its first host"""
+        pool = HostPool(2, host=self.host, seed=0)
+        try:
+            obs = pool.reset()
+            self.assertEqual(len(obs), pool.obs_dim())
+            done = False
+            while not done:
+                obs, reward, done = pool.step(1)
+            self.assertEqual(obs, [])
+        finally:
+            pool.terminate()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -25,12 +25,18 @@ class TestLinearModel(unittest.TestCase):
         model = LinearModel(obs_dim)
         self.assertEqual(len(model.params), obs_dim)
 
-    def test_action_input(self):
+    def test_params_input(self):
+        """Check if error is raised when params do not have dims values"""
+        model = LinearModel(self.regular_obs_dim)
+        with self.assertRaises(AssertionError):
+            model.params = [random.uniform(-1,1) for i in range(random.randint(5,10))]
+
+    def test_batch_action_input(self):
         """Check if error is raised when length of params and obs are not the same"""
         new_obs = [random.uniform(-1,1) for i in range(random.randint(5,10))]
         model = LinearModel(self.regular_obs_dim)
         with self.assertRaises(AssertionError):
-            model.action(new_obs)
+            model.batch_action([new_obs])
 
     def test_return_sign_positive(self):
         """Check if the sign returned is as expected given the input"""
@@ -45,4 +51,26 @@ class TestLinearModel(unittest.TestCase):
     def test_return_sign_negative_for_zero(self):
         """Check if the sign returned is as expected given the input"""
         zero_obs = [0]
-        self.assertEqual(self.model_.action(zero_obs),-1)
\ No newline at end of file
+        self.assertEqual(self.model_.action(zero_obs),-1)
+
+    def test_paired_action(self):
+        """Check if each observation is paired with its own parameters"""
+        model = LinearModel(1)
+        actions = model.paired_action([[1], [1], []], [[5], [-5], [5]])
+        self.assertEqual(actions, [1, -1, -1])
+
+    def test_batch_action_vector(self):
+        """Check if one action per observation is returned"""
+        actions = self.model_.batch_action([[1], [-1], [0]])
+        self.assertEqual(actions, [1, -1, -1])
+
+    def test_batch_action_matrix(self):
+        """Check if a K x M matrix of actions is returned"""
+        actions = self.model_.batch_action([[1], [-1]], [[5], [-5], [0]])
+        self.assertEqual(actions, [[1, -1], [-1, 1], [-1, -1]])
+
+    def test_batch_action_matches_action(self):
+        """Check if the batch actions are the same as the scalar ones"""
+        model = LinearModel(self.regular_obs_dim)
+        obs = [[random.uniform(-1,1) for i in range(self.regular_obs_dim)] for j in range(20)]
+        self.assertEqual(model.batch_action(obs), [model.action(o) for o in obs])
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+"""Tests the metrics writer and aggregation"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from agent import build_parser, parse_options, run
+from metrics import FIELDS, MetricsWriter, make_record, iter_records, config_of, aggregate
+
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, name, win_ratios, append=False):
+        path = os.path.join(self.tmpdir, name)
+        writer = MetricsWriter(path, append=append)
+        for i, win_ratio in enumerate(win_ratios, 1):
+            writer.write(make_record(i, [1, 3], [3], win_ratio, 0.5, 3, [3, 4]))
+        writer.close()
+        return path
+
+    def test_make_record(self):
+        """Check if a record has every field"""
+        record = make_record(1, [1, 3], [3], 0.5, 0.5, 3, [3, 4])
+        self.assertEqual(set(record), set(FIELDS))
+        self.assertEqual(record['mean_reward'], 2)
+        self.assertEqual(record['evals_per_sec'], 6)
+        self.assertEqual(record['param_norm'], 5)
+
+    def test_round_trip(self):
+        """Check if csv and jsonl records are read back"""
+        for name in ('a.csv', 'a.jsonl'):
+            records = list(iter_records(self.write(name, [0.1, 0.2])))
+            self.assertEqual([r['win_ratio'] for r in records], [0.1, 0.2])
+            self.assertEqual([r['iteration'] for r in records], [1, 2])
+
+    def test_append(self):
+        """Check if reopening a csv file does not repeat the header"""
+        path = self.write('a.csv', [0.1])
+        self.write('a.csv', [0.2], append=True)
+        self.assertEqual(len(list(iter_records(path))), 2)
+
+    def test_overwrite(self):
+        """Check if reopening a file without append drops its records"""
+        for name in ('a.csv', 'a.jsonl'):
+            path = self.write(name, [0.1, 0.2])
+            self.write(name, [0.3])
+            self.assertEqual([r['win_ratio'] for r in iter_records(path)], [0.3])
+
+    def test_legacy_win_ratios(self):
+        """Check if the win ratio files of the agent are read"""
+        path = os.path.join(self.tmpdir, 'n-10-1.csv')
+        with open(path, 'w') as f:
+            f.write('0.0,0.5\r\n')
+        self.assertEqual(list(iter_records(path)),
+                         [{'iteration': 1, 'win_ratio': 0.0},
+                          {'iteration': 2, 'win_ratio': 0.5}])
+
+    def test_config_of(self):
+        """Check if the seed and extension are stripped"""
+        self.assertEqual(config_of('./output/n-100-3.metrics.csv'), 'n-100')
+        self.assertEqual(config_of('n-100_p-0.1-12.csv'), 'n-100_p-0.1')
+
+    def test_aggregate(self):
+        """Check if the field is aggregated per iteration and config"""
+        paths = [self.write('n-10-1.csv', [0.1, 0.2]),
+                 self.write('n-10-2.jsonl', [0.3]),
+                 self.write('n-20-1.csv', [1.0])]
+        results = aggregate(paths)
+        self.assertEqual(results[None][1][0], 3)
+        self.assertAlmostEqual(results[None][1][1], 1.4 / 3)
+        self.assertEqual(results[None][1][2:], [0.1, 1.0])
+
+        results = aggregate(paths, by_config=True)
+        self.assertEqual(sorted(results), ['n-10', 'n-20'])
+        self.assertAlmostEqual(results['n-10'][1][1], 0.2)
+        self.assertEqual(results['n-10'][2], [1, 0.2, 0.2, 0.2])
+
+    def test_agent_rerun(self):
+        """Check if a rerun replaces the records and a resumed run continues them"""
+        path = os.path.join(self.tmpdir, 'n-10-1.metrics.csv')
+        checkpoint = os.path.join(self.tmpdir, 'n-10-1.ckpt')
+
+        def agent(episodes, *args):
+            run(parse_options(build_parser(), ['--env', 'sim', '-e', str(episodes), '-n', '10',
+                                               '-r', '1', '-o', os.path.join(self.tmpdir, 'n-10-1'),
+                                               '-m', path] + list(args)))
+            return [r['iteration'] for r in iter_records(path)]
+
+        self.assertEqual(agent(2), [1, 2])
+        self.assertEqual(agent(2, '--checkpoint', checkpoint, '--resume'), [1, 2])
+        self.assertEqual(agent(3, '--checkpoint', checkpoint, '--resume'), [1, 2, 3])
+        self.assertEqual(agent(2), [1, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+"""Tests the multi-layer perceptron model"""
+
+import math
+import unittest
+import random
+from array import array
+
+from mlp_model import MLPModel, n_params
+from optimizers import ParameterMatrix
+
+class TestMLPModel(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(0)
+        self.model_ = MLPModel(4, hidden=(3, 2))
+
+    def reference(self, params, obs, hidden=(3, 2), actions=(-1, 1)):
+        """Computes the outputs of the model with plain nested lists"""
+        h = list(obs)
+        offset = 0
+        widths = [len(obs)] + list(hidden) + [len(actions)]
+        for layer, (n_in, n_out) in enumerate(zip(widths[:-1], widths[1:])):
+            weights = [params[offset + j * n_in:offset + (j + 1) * n_in] for j in range(n_out)]
+            offset += n_in * n_out
+            biases = params[offset:offset + n_out]
+            offset += n_out
+            h = [b + sum(w * x for w, x in zip(row, h)) for row, b in zip(weights, biases)]
+            if layer < len(hidden):
+                h = [math.tanh(v) for v in h]
+        return h
+
+    def test_params_length(self):
+        """Check if the flat parameters cover the weights and biases of every layer"""
+        self.assertEqual(n_params(4, (3, 2)), 3 * 5 + 2 * 4 + 2 * 3)
+        self.assertEqual(len(self.model_.params), self.model_.size)
+
+    def test_no_hidden_layer(self):
+        """Check if the model without hidden layers has one linear output per action"""
+        model = MLPModel(2, actions=(-1, 0, 1))
+        model.params = [1, 0,  0, 1,  -1, -1,  0, 0, 0]
+        self.assertEqual(model.action([2, 1]), -1)
+        self.assertEqual(model.action([1, 2]), 0)
+        self.assertEqual(model.action([-1, -1]), 1)
+
+    def test_forward(self):
+        """Check if the outputs match a plain nested-list forward pass"""
+        obs = [random.uniform(-1, 1) for i in range(4)]
+        outputs = self.model_.forward(obs)
+        expected = self.reference(self.model_.params, obs)
+        for o, e in zip(outputs, expected):
+            self.assertAlmostEqual(o, e)
+
+    def test_batch_action_input(self):
+        """Check if error is raised when an observation has the wrong length"""
+        with self.assertRaises(AssertionError):
+            self.model_.batch_action([[0.1, 0.2]])
+
+    def test_params_length_input(self):
+        """Check if error is raised when params have the wrong length"""
+        with self.assertRaises(AssertionError):
+            self.model_.params = [0.0] * (self.model_.size + 1)
+
+    def test_views_share_buffer(self):
+        """Check if the layers are views of the parameter array, not copies"""
+        params = array('d', self.model_.params)
+        self.model_.params = params
+        obs = [0.5, -0.5, 0.25, 1.0]
+        before = self.model_.forward(obs)
+        params[-1] += 10
+        after = self.model_.forward(obs)
+        self.assertAlmostEqual(after[1], before[1] + 10)
+
+    def test_parameter_matrix_rows(self):
+        """Check if rows of a ParameterMatrix are used as parameters"""
+        rows = [[random.uniform(-1, 1) for i in range(self.model_.size)] for j in range(3)]
+        matrix = ParameterMatrix(array('d', [x for row in rows for x in row]), self.model_.size)
+        obs = [[random.uniform(-1, 1) for i in range(4)] for j in range(3)]
+        self.assertEqual(self.model_.paired_action(obs, matrix),
+                         self.model_.paired_action(obs, rows))
+
+    def test_batch_action(self):
+        """Check if the batched actions are the ones of action"""
+        obs = [[random.uniform(-1, 1) for i in range(4)] for j in range(20)]
+        self.assertEqual(self.model_.batch_action(obs),
+                         [self.model_.action(o) for o in obs])
+
+        params = [[random.uniform(-1, 1) for i in range(self.model_.size)] for j in range(2)]
+        expected = []
+        for w in params:
+            self.model_.params = w
+            expected.append([self.model_.action(o) for o in obs])
+        self.assertEqual(self.model_.batch_action(obs, params), expected)
+
+    def test_paired_action(self):
+        """Check if each observation is paired with its own parameters"""
+        params = [[random.uniform(-1, 1) for i in range(self.model_.size)] for j in range(3)]
+        obs = [[random.uniform(-1, 1) for i in range(4)] for j in range(2)] + [[]]
+        expected = []
+        for w, o in zip(params[:2], obs):
+            self.model_.params = w
+            expected.append(self.model_.action(o))
+        self.assertEqual(self.model_.paired_action(obs, params), expected + [-1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+
+"""Tests the hyperparameter sweep scheduler"""
+
+import os
+import shutil
+import tempfile
+import unittest
+import multiprocessing
+
+from multiagent import (build_parser, parse_options, sweep_agent_args, parse_grid, build_trials,
+                        run_sweep, successive_halving, hyperband, continue_trials, read_win_ratios,
+                        start_servers, start_remote, stop_servers, AgentServerError)
+from distributed import run_worker
+
+
+class TestSweep(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_parse_grid(self):
+        """Check if the values are parsed with the type of the flag"""
+        grid = parse_grid(['n=50,100', 'p=0.2'])
+        self.assertEqual(grid, {'n': [50, 100], 'p': [0.2]})
+
+    def test_pruning_options(self):
+        """Check if error is raised with both pruners or empty rungs"""
+        for args in (['--halving', '--hyperband'],
+                     ['--halving', '--min-episodes', '10', '--max-episodes', '5'],
+                     ['--hyperband', '--min-episodes', '0'],
+                     ['--halving', '--eta', '1']):
+            with self.assertRaises(SystemExit):
+                parse_options(build_parser(), args)
+        options = parse_options(build_parser(), ['--halving', '--min-episodes', '5', '--max-episodes', '5'])
+        self.assertTrue(options.halving)
+
+    def test_checkpoint_opt_in(self):
+        """Check if trials are only checkpointed by resumable sweeps"""
+        for args, expected in (([], []),
+                               (['--checkpoint'], ['--checkpoint', '{output}.ckpt']),
+                               (['--resume'], ['--checkpoint', '{output}.ckpt', '--resume'])):
+            self.assertEqual(sweep_agent_args(parse_options(build_parser(), args)), expected)
+
+    def test_parse_grid_wrong_key(self):
+        """Check if error is raised with a flag that cannot be swept"""
+        with self.assertRaises(ValueError):
+            parse_grid(['q=1'])
+
+    def test_build_trials(self):
+        """Check if one trial per grid point and seed is built"""
+        trials = build_trials({'p': [0.1, 0.2], 'n': [25]}, [1, 2], self.tmpdir)
+        self.assertEqual(len(trials), 4)
+        self.assertEqual(trials[0]['name'], 'n-25_p-0.1-1')
+        self.assertEqual(trials[0]['args'][:6], ['-n', '25', '-p', '0.1', '-r', '1'])
+
+    def test_legacy_names(self):
+        """Check if single-flag sweeps keep the n-100-3 naming"""
+        trials = build_trials({'n': [100]}, [3], self.tmpdir)
+        self.assertEqual(trials[0]['output'], os.path.join(self.tmpdir, 'n-100-3'))
+
+    def test_run_sweep_and_resume(self):
+        """Check if trials are run once and skipped when resuming"""
+        trials = build_trials({'n': [10], 'e': [2]}, [1, 2], self.tmpdir)
+        wall_times = run_sweep(trials, jobs=2, env='sim')
+        self.assertEqual(sorted(wall_times), sorted(t['name'] for t in trials))
+        for trial in trials:
+            self.assertTrue(os.path.exists(trial['output'] + '.csv'))
+
+        self.assertEqual(run_sweep(trials, jobs=2, env='sim', resume=True), {})
+
+    def test_successive_halving(self):
+        """Check if only the best configurations reach the last rung"""
+        configs = [{'n': 10}, {'n': 20}, {'n': 30}, {'n': 40}]
+        ranked = successive_halving(configs, [1], min_episodes=1, max_episodes=4,
+                                    eta=2, jobs=2, env='sim', output_dir=self.tmpdir)
+        self.assertEqual(len(ranked), 1)
+        self.assertEqual(ranked[0][1]['e'], 4)
+        self.assertTrue(os.path.exists(os.path.join(self.tmpdir, 'n-10_e-1-1.csv')))
+
+    def test_continue_trials(self):
+        """Check if the checkpoints of a rung are copied to the next one"""
+        previous = build_trials({'n': [10, 20], 'e': [1]}, [1], self.tmpdir)
+        trials = build_trials({'n': [20], 'e': [2]}, [1], self.tmpdir)
+        for trial in previous:
+            with open(trial['output'] + '.ckpt', 'w') as f:
+                f.write(trial['name'])
+        continue_trials(previous, trials, ['--checkpoint', '{output}.ckpt', '-m', '{output}.m.csv'])
+        with open(trials[0]['output'] + '.ckpt') as f:
+            self.assertEqual(f.read(), 'n-20_e-1-1')
+        self.assertFalse(os.path.exists(trials[0]['output'] + '.m.csv'))
+
+    def test_successive_halving_resumes(self):
+        """Check if a resumed rung gives the win ratios of a full run"""
+        configs = [{'n': 10}, {'n': 20}]
+        ranked = successive_halving(configs, [1], min_episodes=2, max_episodes=4,
+                                    eta=2, jobs=2, env='sim', output_dir=self.tmpdir)
+        full = build_trials({'n': [ranked[0][1]['n']], 'e': [4]}, [1],
+                            os.path.join(self.tmpdir, 'full'))
+        run_sweep(full, jobs=1, env='sim')
+        name = full[0]['name']
+        self.assertEqual(read_win_ratios(os.path.join(self.tmpdir, name)),
+                         read_win_ratios(full[0]['output']))
+
+    def test_hyperband(self):
+        """Check if every bracket reaches the maximum episodes"""
+        configs = [{'n': 10}, {'n': 20}, {'n': 30}]
+        ranked = hyperband(configs, [1], min_episodes=1, max_episodes=3,
+                           eta=3, jobs=2, env='sim', output_dir=self.tmpdir)
+        self.assertTrue(all(c['e'] == 3 for _, c in ranked))
+        self.assertEqual(ranked, sorted(ranked, key=lambda x: x[0], reverse=True))
+
+
+class TestAgentServers(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.servers = start_servers(2, self.tmpdir, env='sim')
+
+    def tearDown(self):
+        stop_servers(self.servers)
+        shutil.rmtree(self.tmpdir)
+
+    def test_same_results(self):
+        """Check if servers write the same outputs as one process per trial"""
+        trials = build_trials({'n': [10, 20], 'e': [2]}, [1, 2], os.path.join(self.tmpdir, 'a'))
+        served = build_trials({'n': [10, 20], 'e': [2]}, [1, 2], os.path.join(self.tmpdir, 'b'))
+        run_sweep(trials, jobs=2, env='sim')
+        wall_times = run_sweep(served, jobs=2, env='sim', servers=self.servers)
+        self.assertEqual(len(wall_times), 4)
+        for trial, served_trial in zip(trials, served):
+            self.assertEqual(read_win_ratios(trial['output']), read_win_ratios(served_trial['output']))
+
+    def test_invalid_trial(self):
+        """Check if a failed run is reported and the server keeps serving"""
+        server = self.servers.get()
+        try:
+            with self.assertRaises(AgentServerError):
+                server.run(['--env', 'sim', '--crn', '2', '--cache', '10'])
+            result = server.run(['--env', 'sim', '-e', '2', '-n', '10'])
+            self.assertEqual(len(result['win_ratios']), 2)
+        finally:
+            self.servers.put(server)
+
+
+class TestRemoteSweep(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.servers = start_remote(2, '127.0.0.1:0', secret='secret')
+        address = self.servers.queue[0].coordinator.address
+        # Trials seed the global random module, so each worker has its own process
+        self.processes = [multiprocessing.Process(target=run_worker, args=(address,), daemon=True,
+                                                  kwargs={'secret': 'secret', 'root': self.tmpdir})
+                          for i in range(2)]
+        for process in self.processes:
+            process.start()
+
+    def tearDown(self):
+        stop_servers(self.servers)
+        for process in self.processes:
+            process.join(5)
+        shutil.rmtree(self.tmpdir)
+
+    def test_same_results(self):
+        """Check if remote workers write the same outputs as one process per trial"""
+        trials = build_trials({'n': [10, 20], 'e': [2]}, [1], os.path.join(self.tmpdir, 'a'))
+        remote = build_trials({'n': [10, 20], 'e': [2]}, [1], os.path.join(self.tmpdir, 'b'))
+        run_sweep(trials, jobs=2, env='sim')
+        wall_times = run_sweep(remote, jobs=2, env='sim', servers=self.servers)
+        self.assertEqual(len(wall_times), 2)
+        for trial, remote_trial in zip(trials, remote):
+            self.assertEqual(read_win_ratios(trial['output']), read_win_ratios(remote_trial['output']))
@@ -2,10 +2,13 @@
 
 """Tests all environment classes EasyEnv and CartPoleEnv"""
 
+import json
+import math
 import unittest
 import random
 
-from optimizers import CrossEntropyMethod
+from optimizers import (CrossEntropyMethod, ArrayCrossEntropyMethod, CMAES, EvolutionStrategy,
+                        symmetric_eigen)
 
 
 class TestCEM(unittest.TestCase):
@@ -34,3 +37,209 @@ class TestCEM(unittest.TestCase):
         """Check if the expected mean is obtained"""
         mean = self.cem.get_parameter_mean(self.X)
         self.assertEqual(mean, [2.5, 2.0, 3.0, 2.75])
+
+class TestArrayCEM(unittest.TestCase):
+
+    def setUp(self):
+        self.cem = ArrayCrossEntropyMethod(N=5,p=0.2)
+        self.x = [1,2,3,4]
+        self.r = [100,28,1,400]
+        self.X = [[1,2,3,4],
+                  [4,2,1,4],
+                  [3,1,4,2],
+                  [2,3,4,1]]
+
+    def test_sample_parameters_shape(self):
+        """Check if the returned dimensions of the matrix is as expected"""
+        samples = self.cem.sample_parameters(self.x)
+        self.assertEqual(len(samples), self.cem.N)
+        self.assertEqual(len(samples[0]), len(self.x))
+        self.assertEqual(len(samples.tolist()), self.cem.N)
+
+    def test_get_elite_parameters(self):
+        """Check if the top is obtained"""
+        elites = self.cem.get_elite_parameters(self.X, self.r)
+        self.assertEqual(elites, [[2,3,4,1]])
+
+    def test_get_elite_parameters_are_views(self):
+        """Check if the elites share memory with the samples"""
+        samples = self.cem.sample_parameters(self.x)
+        elite = self.cem.get_elite_parameters(samples, [0, 0, 5, 0, 0])[0]
+        samples.data[2 * len(self.x)] = 42.0
+        self.assertEqual(elite[0], 42.0)
+
+    def test_get_parameter_statistics(self):
+        """Check if the expected mean and variance are obtained"""
+        mean, variance = self.cem.get_parameter_statistics(self.X)
+        self.assertEqual(mean, [2.5, 2.0, 3.0, 2.75])
+        self.assertEqual(variance, [1.25, 0.5, 1.5, 1.6875])
+
+    def test_get_parameter_statistics_large_mean(self):
+        """Check if the variance is kept when the mean is large next to the spread"""
+        params = [[1e9 + 0.1], [1e9 - 0.1], [1e9 + 0.1], [1e9 - 0.1]]
+        mean, variance = self.cem.get_parameter_statistics(params)
+        self.assertAlmostEqual(variance[0], 0.01, places=6)
+
+    def test_matches_list_engine(self):
+        """Check if the same random state gives the same CEM update"""
+        means = []
+        for engine in (CrossEntropyMethod, ArrayCrossEntropyMethod):
+            random.seed(7)
+            cem = engine(N=50, p=0.2)
+            samples = cem.sample_parameters(self.x)
+            rewards = [random.randint(0, 5) for i in range(50)]
+            means.append(cem.get_parameter_mean(cem.get_elite_parameters(samples, rewards)))
+        self.assertEqual(means[0], means[1])
+
+class TestAdaptiveCEM(unittest.TestCase):
+
+    def setUp(self):
+        self.X = [[1,2,3,4],
+                  [4,2,1,4],
+                  [3,1,4,2],
+                  [2,3,4,1]]
+
+    def test_variance_fitted_to_elites(self):
+        """Check if the variance becomes the variance of the elites"""
+        cem = CrossEntropyMethod(N=5, p=0.2, adaptive=True)
+        cem.sample_parameters([0,0,0,0])
+        mean = cem.get_parameter_mean(self.X)
+        self.assertEqual(mean, [2.5, 2.0, 3.0, 2.75])
+        self.assertEqual(cem.variance, [1.25, 0.5, 1.5, 1.6875])
+
+    def test_smoothing(self):
+        """Check if the new mean is smoothed with the previous one"""
+        cem = CrossEntropyMethod(N=5, p=0.2, adaptive=True, smoothing=0.5)
+        cem.sample_parameters([0.5,0,1,0.25])
+        self.assertEqual(cem.get_parameter_mean(self.X), [1.5, 1.0, 2.0, 1.5])
+
+    def test_min_variance(self):
+        """Check if the variance does not go below the floor"""
+        cem = CrossEntropyMethod(N=5, p=0.2, adaptive=True, min_variance=0.1)
+        cem.sample_parameters([0,0])
+        cem.get_parameter_mean([[1,2],[1,2]])
+        self.assertEqual(cem.variance, [0.1, 0.1])
+
+    def test_noise_annealing(self):
+        """Check if the extra variance decreases down to zero"""
+        cem = CrossEntropyMethod(N=5, p=0.2, adaptive=True, extra_noise=1.0, noise_decay=0.6)
+        cem.sample_parameters([0,0])
+        self.assertEqual(cem.noise_variance(), 1.0)
+        cem.get_parameter_mean([[1,2],[1,2]])
+        self.assertAlmostEqual(cem.noise_variance(), 0.4)
+        cem.get_parameter_mean([[1,2],[1,2]])
+        self.assertEqual(cem.noise_variance(), 0.0)
+
+    def test_full_covariance(self):
+        """Check if the covariance matrix of the elites is fitted"""
+        cem = CrossEntropyMethod(N=5, p=0.2, full_covariance=True, adaptive=True)
+        samples = cem.sample_parameters([0,0])
+        self.assertEqual(len(samples), 5)
+        cem.get_parameter_mean([[0,0],[2,2]])
+        self.assertEqual(cem.covariance, [[1.0, 1.0], [1.0, 1.0]])
+
+    def test_fixed_variance_by_default(self):
+        """Check if the default samples are unchanged by the adaptive options"""
+        random.seed(3)
+        fixed = CrossEntropyMethod(N=5, p=0.2).sample_parameters([1,2])
+        random.seed(3)
+        adaptive = CrossEntropyMethod(N=5, p=0.2, adaptive=True).sample_parameters([1,2])
+        self.assertEqual(fixed, adaptive)
+
+
+def sphere(x):
+    """Reward peaking at 0 at (3, ..., 3)"""
+    return -sum((v - 3) ** 2 for v in x)
+
+class TestAskTell(unittest.TestCase):
+
+    def test_cem_ask_tell(self):
+        """Check if ask/tell is the sample, elite and mean update of CEM"""
+        means = []
+        for ask_tell in (False, True):
+            random.seed(7)
+            cem = CrossEntropyMethod(N=20, p=0.2)
+            samples = cem.ask([1,2]) if ask_tell else cem.sample_parameters([1,2])
+            rewards = [sphere(x) for x in samples]
+            if ask_tell:
+                means.append(cem.tell(samples, rewards))
+            else:
+                means.append(cem.get_parameter_mean(cem.get_elite_parameters(samples, rewards)))
+        self.assertEqual(means[0], means[1])
+
+    def test_cmaes_converges(self):
+        """Check if CMA-ES finds the optimum of a quadratic"""
+        random.seed(0)
+        optimizer = CMAES(N=12)
+        params = [0.0] * 5
+        for i in range(100):
+            samples = optimizer.ask(params)
+            params = optimizer.tell(samples, [sphere(x) for x in samples])
+        self.assertGreater(sphere(params), -1e-6)
+
+    def test_symmetric_eigen(self):
+        """Check if the eigendecomposition gives back the matrix"""
+        C = [[4.0, 1.0, 0.5], [1.0, 3.0, -1.0], [0.5, -1.0, 2.0]]
+        for basis in (None, symmetric_eigen([[4.0, 1.0, 0.0], [1.0, 3.0, 0.0], [0.0, 0.0, 2.0]])[1]):
+            values, B = symmetric_eigen(C, basis)
+            for i in range(3):
+                for j in range(3):
+                    self.assertAlmostEqual(sum(B[i][k] * values[k] * B[j][k] for k in range(3)), C[i][j])
+                    self.assertAlmostEqual(sum(B[k][i] * B[k][j] for k in range(3)), float(i == j))
+
+    def test_cmaes_evolution_path(self):
+        """Check if the evolution path of sigma follows C^(-1/2) y_w"""
+        random.seed(2)
+        optimizer = CMAES(N=6)
+        optimizer.init_distribution(3)
+        optimizer.covariance = [[4.0, 1.0, 0.5], [1.0, 3.0, -1.0], [0.5, -1.0, 2.0]]
+        values, B = symmetric_eigen(optimizer.covariance)
+        inv_sqrt = [[sum(B[i][k] * B[j][k] / math.sqrt(values[k]) for k in range(3)) for j in range(3)]
+                    for i in range(3)]
+        samples = optimizer.ask([0.0] * 3)
+        rewards = [sphere(x) for x in samples]
+        best = sorted(range(6), key=lambda i: rewards[i], reverse=True)[:optimizer.mu]
+        y_w = [sum(w * samples[i][j] for w, i in zip(optimizer.weights, best)) for j in range(3)]
+        optimizer.tell(samples, rewards)
+        scale = math.sqrt(optimizer.c_sigma * (2 - optimizer.c_sigma) * optimizer.mu_eff)
+        for p, row in zip(optimizer.p_sigma, inv_sqrt):
+            self.assertAlmostEqual(p, scale * sum(r * y for r, y in zip(row, y_w)))
+
+    def test_cmaes_state(self):
+        """Check if a restored CMA-ES draws the same samples"""
+        optimizer = CMAES(N=6)
+        params = [0.0] * 3
+        for i in range(3):
+            samples = optimizer.ask(params)
+            params = optimizer.tell(samples, [sphere(x) for x in samples])
+        restored = CMAES(N=6)
+        restored.set_state(json.loads(json.dumps(optimizer.get_state())))
+        random.seed(1)
+        expected = optimizer.ask(params)
+        random.seed(1)
+        self.assertEqual(restored.ask(params), expected)
+
+    def test_es_antithetic(self):
+        """Check if the samples come in pairs mirrored around the parameters"""
+        optimizer = EvolutionStrategy(N=7)
+        samples = optimizer.ask([1.0, -2.0])
+        self.assertEqual(len(samples), 6)
+        for plus, minus in zip(samples[::2], samples[1::2]):
+            for p, m, x in zip(plus, minus, [1.0, -2.0]):
+                self.assertAlmostEqual(p + m, 2 * x)
+
+    def test_es_ties(self):
+        """Check if equal rewards of a pair leave the parameters unchanged"""
+        optimizer = EvolutionStrategy(N=4)
+        samples = optimizer.ask([1.0, -2.0])
+        self.assertEqual(optimizer.tell(samples, [3, 3, 5, 5]), [1.0, -2.0])
+
+    def test_es_converges(self):
+        """Check if the evolution strategy climbs a quadratic"""
+        random.seed(0)
+        optimizer = EvolutionStrategy(N=20, sigma=0.3, learning_rate=0.5)
+        params = [0.0] * 3
+        for i in range(200):
+            samples = optimizer.ask(params)
+            params = optimizer.tell(samples, [sphere(x) for x in samples])
+        self.assertGreater(sphere(params), -0.1)
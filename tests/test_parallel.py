@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+
+"""Tests the parallel evaluation of CEM samples"""
+
+import unittest
+import random
+
+from agent import SeededEvaluator, build_parser, parse_options, run
+from parallel import EvaluationPool
+
+
+class TestEvaluationPool(unittest.TestCase):
+
+    def setUp(self):
+        self.samples = [[random.uniform(-1,1) for i in range(4)] for j in range(12)]
+        self.seeds = list(range(12))
+
+    def test_matches_serial_order(self):
+        """Check if the pool returns the same rewards as a serial evaluation"""
+        evaluate = SeededEvaluator('sim', 100)
+        expected = [evaluate(w, seed) for w, seed in zip(self.samples, self.seeds)]
+
+        pool = EvaluationPool(2, SeededEvaluator, ('sim', 100), chunksize=5)
+        try:
+            rewards = pool.evaluate(self.samples, self.seeds)
+        finally:
+            pool.close()
+        self.assertEqual(rewards, expected)
+
+    def test_common_start_states(self):
+        """Check if the start states are shared by all the samples"""
+        states = [[0, 0, 0.1, 0], [0.5, 0, -0.1, 0]]
+        evaluate = SeededEvaluator('sim', 100)
+        expected = [evaluate(w, None, states) for w in self.samples]
+
+        pool = EvaluationPool(2, SeededEvaluator, ('sim', 100))
+        try:
+            rewards = pool.evaluate(self.samples, [None] * len(self.samples), states)
+        finally:
+            pool.close()
+        self.assertEqual(rewards, expected)
+
+    def test_run_matches_serial(self):
+        """Check if a run with workers has the win ratios of a seeded serial run"""
+        win_ratios = []
+        for args in (['--seed-episodes'], ['-w', '2']):
+            options = parse_options(build_parser(), ['--env', 'sim', '-e', '3', '-n', '10', '-z', '100',
+                                                     '-r', '1'] + args)
+            win_ratios.append(run(options)[0])
+        self.assertEqual(win_ratios[0], win_ratios[1])
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+"""Tests the parity of CartPoleSimEnv with the host program"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def build_host(directory):
+    """Compiles cartpole.cc into directory and returns the executable path"""
+    if shutil.which('g++') is None:
+        raise unittest.SkipTest('Skipping due to missing g++')
+    host = os.path.join(directory, 'cartpole.out')
+    subprocess.check_call(['g++', '-std=c++11', os.path.join(ROOT, 'cartpole.cc'),
+                           '-I', ROOT, '-o', host])
+    return host
+
+
+def run_parity(host, tmpdir, args):
+    """Runs parity.py as the agent of the host program and returns the report"""
+    report = os.path.join(tmpdir, 'report')
+    agent = '{} parity.py {} -o {}'.format(sys.executable, args, report)
+    subprocess.check_call([host, agent], cwd=ROOT, timeout=60)
+
+    with open(report) as f:
+        return dict(kv.split('=') for kv in f.read().split())
+
+
+class TestParity(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.host = build_host(self.tmpdir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_trajectories_match(self):
+        """Check if the simulator reproduces the host trajectories"""
+        result = run_parity(self.host, self.tmpdir, '-e 50')
+        self.assertEqual(int(result['episodes']), 50)
+        self.assertEqual(int(result['mismatches']), 0)
+
+    def test_batch_trajectories_match(self):
+        """Check if the batch protocol reproduces the batch simulator"""
+        result = run_parity(self.host, self.tmpdir, '-e 20 -k 7')
+        self.assertEqual(int(result['mismatches']), 0)
+
+    def test_binary_trajectories_match_exactly(self):
+        """Check if the binary transport gives bit-exact observations"""
+        result = run_parity(self.host, self.tmpdir, '-e 20 -k 7 --transport binary')
+        self.assertEqual(int(result['mismatches']), 0)
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+"""Tests the stage timers of the agent loop"""
+
+import io
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+from profiling import Profiler, percentile
+from environments import CartPoleSimEnv, EasyEnv
+from linear_model import LinearModel
+from agent import build_parser, make_profiler, run_episode
+
+
+class TestProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.env = CartPoleSimEnv(seed=0)
+
+    def test_percentile(self):
+        """Check if the nearest rank percentile is returned"""
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([3], 99), 3)
+
+    def test_instrument_and_restore(self):
+        """Check if calls are counted and the method is restored"""
+        profiler = Profiler()
+        profiler.instrument(self.env, 'step', 'env.step')
+        profiler.instrument(None, 'step')
+        self.env.reset()
+        for i in range(3):
+            self.env.step(1)
+        self.assertEqual(len(profiler.durations['env.step']), 3)
+
+        profiler.restore()
+        self.assertNotIn('step', vars(self.env))
+        self.env.step(1)
+        self.assertEqual(len(profiler.durations['env.step']), 3)
+
+    def test_report(self):
+        """Check if each stage is reported"""
+        profiler = Profiler()
+        profiler.add('evaluate', 0.5)
+        profiler.add('evaluate', 1.5)
+        stage, calls, total, mean = profiler.summary()[0][:4]
+        self.assertEqual((stage, calls, total, mean), ('evaluate', 2, 2.0, 1.0))
+        f = io.StringIO()
+        profiler.report(f)
+        self.assertIn('evaluate', f.getvalue())
+
+    def test_write_trace(self):
+        """Check if one complete event is written per call"""
+        tmpdir = tempfile.mkdtemp()
+        try:
+            profiler = Profiler(trace=True)
+            profiler.instrument(self.env, 'reset')
+            self.env.reset()
+            path = os.path.join(tmpdir, 'trace.json')
+            profiler.write_trace(path)
+            with open(path) as f:
+                events = json.load(f)['traceEvents']
+            self.assertEqual([(e['name'], e['ph']) for e in events], [('CartPoleSimEnv.reset', 'X')])
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_agent_env_stages(self):
+        """Check if the episodes of the agent report the env stages"""
+        options = build_parser().parse_args(['--profile'])
+        for env in (self.env, EasyEnv()):
+            model = LinearModel(env.obs_dim())
+            profiler = make_profiler(options, env, None, model, None, None)
+            try:
+                run_episode(model, env, 20)
+            finally:
+                profiler.restore()
+            self.assertEqual(len(profiler.durations['env.reset']), 1)
+            self.assertGreater(len(profiler.durations['env.step']), 0)
+            self.assertGreater(len(profiler.durations['model.action']), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
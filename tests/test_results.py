@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+
+"""Tests the results store"""
+
+import os
+import csv
+import shutil
+import tempfile
+import unittest
+
+from agent import build_parser, parse_options, run
+from metrics import MetricsWriter, make_record
+from results import ResultsStore, parse_config, trial_of
+
+
+class TestResultsStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.store = ResultsStore(os.path.join(self.tmpdir, 'results.db'))
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, name, win_ratios):
+        path = os.path.join(self.tmpdir, name + '.csv')
+        with open(path, 'w', newline='') as f:
+            csv.writer(f).writerow(win_ratios)
+        return path
+
+    def test_trial_of(self):
+        """Check if the name, configuration and seed of a file are parsed"""
+        self.assertEqual(trial_of('./output/n-100_p-0.2-3.csv'), ('n-100_p-0.2-3', 'n-100_p-0.2', 3))
+        self.assertEqual(trial_of('./output/n-100-3.metrics.csv'), ('n-100-3', 'n-100', 3))
+        self.assertEqual(parse_config('n-100_p-0.2'), {'n': 100, 'p': 0.2})
+
+    def test_curves(self):
+        """Check if the win ratios are averaged per configuration and episode"""
+        for name, win_ratios in (('n-10-1', [0.0, 0.5]), ('n-10-2', [1.0, 0.5]), ('n-20-1', [0.2])):
+            self.store.import_file(self.write(name, win_ratios))
+        rows = list(self.store.curves())
+        self.assertEqual([row[:4] for row in rows],
+                         [('n-10', 1, 2, 0.5), ('n-10', 2, 2, 0.5), ('n-20', 1, 1, 0.2)])
+        self.assertAlmostEqual(rows[0][4], 1.959964 * 0.5)
+        self.assertEqual(rows[1][4], 0.0)
+        self.assertEqual([row[:2] for row in self.store.curves(config='n-2*')], [('n-20', 1)])
+
+    def test_best_so_far(self):
+        """Check if the best win ratio up to each episode is averaged"""
+        self.store.import_file(self.write('n-10-1', [0.5, 0.2, 1.0]))
+        self.store.import_file(self.write('n-10-2', [0.1, 0.3, 0.2]))
+        self.assertEqual([row[3] for row in self.store.best_so_far()], [0.3, 0.4, 0.65])
+
+    def test_time_to_solve(self):
+        """Check if the first solved episode is averaged over solved trials"""
+        self.store.import_file(self.write('n-10-1', [0.5, 1.0, 1.0]))
+        self.store.import_file(self.write('n-10-2', [1.0, 0.3]))
+        self.store.import_file(self.write('n-10-3', [0.1, 0.3]))
+        rows = list(self.store.time_to_solve(1.0))
+        self.assertEqual(rows[0][:4], ('n-10', 3, 2, 1.5))
+
+    def test_merge_metrics(self):
+        """Check if a metrics file adds its fields to the imported win ratios"""
+        self.store.import_file(self.write('n-10-1', [0.5]))
+        path = os.path.join(self.tmpdir, 'n-10-1.metrics.csv')
+        writer = MetricsWriter(path)
+        writer.write(make_record(1, [1, 3], [3], 0.5, 0.5, 3, [3, 4]))
+        writer.close()
+        self.store.import_file(path)
+        self.assertEqual([row[3] for row in self.store.curves('mean_reward')], [2.0])
+        self.assertEqual([row[3] for row in self.store.curves()], [0.5])
+
+    def test_agent_writes(self):
+        """Check if a run writes its win ratios, and a rerun replaces them"""
+        path = os.path.join(self.tmpdir, 'results.db')
+        output = os.path.join(self.tmpdir, 'n-10-1')
+        options = parse_options(build_parser(), ['--env', 'sim', '-e', '3', '-n', '10', '-r', '1',
+                                                 '-o', output, '--results', path])
+        win_ratios, _ = run(options)
+        run(options)
+        self.assertEqual([(row[0], row[1], row[2], row[3]) for row in self.store.curves()],
+                         [('n-10', i, 1, w) for i, w in enumerate(win_ratios, 1)])
+
+    def test_agent_resumes_other_trial(self):
+        """Check if a trial resumed from the checkpoint of another one keeps its records"""
+        path = os.path.join(self.tmpdir, 'results.db')
+        checkpoint = os.path.join(self.tmpdir, 'n-10_e-2-1.ckpt')
+        args = ['--env', 'sim', '-n', '10', '-r', '1', '--results', path]
+        run(parse_options(build_parser(), args + ['-e', '2', '-o', os.path.join(self.tmpdir, 'n-10_e-2-1'),
+                                                  '--checkpoint', checkpoint]))
+        win_ratios, _ = run(parse_options(build_parser(), args + [
+            '-e', '4', '-o', os.path.join(self.tmpdir, 'n-10_e-4-1'), '--checkpoint', checkpoint, '--resume']))
+        self.assertEqual([(row[1], row[3]) for row in self.store.curves(config='n-10_e-4')],
+                         list(enumerate(win_ratios, 1)))
+
+    def test_copy_records(self):
+        """Check if the records up to an iteration are copied"""
+        self.store.import_file(self.write('n-10-1', [0.5, 0.2, 1.0]))
+        trial = self.store.add_trial('n-20-1', 'n-20', 1)
+        self.store.copy_records('n-10-1', trial, 2)
+        self.assertEqual([row[1:4] for row in self.store.curves(config='n-20')], [(1, 1, 0.5), (2, 1, 0.2)])
+
+
+if __name__ == '__main__':
+    unittest.main()